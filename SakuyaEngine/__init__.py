@@ -5,6 +5,7 @@ This code is licensed under GNU LESSER GENERAL PUBLIC LICENSE (see LICENSE for d
 from .__version__ import GAME_VERSION
 from .ai import *
 from .animation import *
+from .atlas import *
 from .bar import *
 from .bullets import *
 from .button import *
@@ -14,6 +15,7 @@ from .clock import *
 from .controllers import *
 from .draw import *
 from .effect_circle import *
+from .effect_particles import *
 from .effect_rain import *
 from .effects import *
 from .entity import *
@@ -23,10 +25,15 @@ from .exe_helper import *
 from .lights import *
 from .locals import *
 from .math import *
+from .profiler import *
+from .raycast_world import *
 from .scene import *
 from .sounds import *
+from .spatial_hash import *
+from .sprite_cache import *
 from .text import *
 from .tile import *
+from .tilemap_file import *
 
 from pygame import __version__ as pg_ver
 
@@ -6,11 +6,31 @@ from typing import List
 
 import pygame
 
+from .atlas import TextureAtlas
+
 __all__ = ["Animation"]
 
 
 class Animation:
-    def __init__(self, name: str, sprites: List[pygame.Surface], fps: int = 16):
+    def __init__(
+        self,
+        name: str,
+        sprites: List[pygame.Surface],
+        fps: int = 16,
+        atlas: TextureAtlas = None,
+    ):
+        """A list of sprites played in a loop.
+
+        Parameters:
+            name: The animation's name.
+            sprites: The frames.
+            fps: The frames shown per second.
+            atlas: If set, the frames are copied into this atlas.
+
+        """
+        if atlas is not None:
+            sprites = atlas.add_many(sprites)
+
         self.name = name
         self.sprites = sprites
         self.fps = fps
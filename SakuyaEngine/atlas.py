@@ -0,0 +1,143 @@
+"""
+SakuyaEngine (c) 2020-2021 Andrew Hong
+This code is licensed under GNU LESSER GENERAL PUBLIC LICENSE (see LICENSE for details)
+"""
+from typing import Hashable, List, Tuple
+
+import pygame
+
+__all__ = ["TextureAtlas"]
+
+
+class TextureAtlas:
+    def __init__(
+        self, page_size: Tuple[int, int] = (1024, 1024), padding: int = 1
+    ) -> None:
+        """Packs many images into a few large surfaces.
+
+        Every image added is copied into a page and returned as a
+        subsurface of it, so the images share one source surface and
+        are only converted once. Pages are converted with
+        convert_alpha() if the display has been set.
+
+        Parameters:
+            page_size: The size of every page in pixels. Larger images
+                get a page of their own.
+            padding: The distance between images in pixels.
+
+        """
+        self.page_size = page_size
+        self.padding = padding
+        self.pages = []  # List[pygame.Surface]
+        self.regions = {}  # Dict[Hashable, Tuple[int, pygame.Rect]]
+        self._shelves = []  # List[List[List[int]]], [y, height, x] per shelf
+
+    def __len__(self) -> int:
+        return len(self.regions)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self.regions
+
+    def _add_page(self, width: int, height: int) -> int:
+        page = pygame.Surface(
+            (max(width, self.page_size[0]), max(height, self.page_size[1])),
+            pygame.SRCALPHA,
+        )
+        if pygame.display.get_surface() is not None:
+            page = page.convert_alpha()
+
+        self.pages.append(page)
+        self._shelves.append([])
+        return len(self.pages) - 1
+
+    def _allocate(self, width: int, height: int) -> Tuple[int, pygame.Rect]:
+        padded_width = width + self.padding
+        padded_height = height + self.padding
+        for i, page in enumerate(self.pages):
+            page_width, page_height = page.get_size()
+            shelves = self._shelves[i]
+            for shelf in shelves:
+                y, shelf_height, x = shelf
+                if padded_height <= shelf_height and x + width <= page_width:
+                    shelf[2] += padded_width
+                    return i, pygame.Rect(x, y, width, height)
+
+            y = shelves[-1][0] + shelves[-1][1] if shelves else 0
+            if y + height <= page_height and width <= page_width:
+                shelves.append([y, padded_height, padded_width])
+                return i, pygame.Rect(0, y, width, height)
+
+        i = self._add_page(width, height)
+        self._shelves[i].append([0, padded_height, padded_width])
+        return i, pygame.Rect(0, 0, width, height)
+
+    def add(self, surface: pygame.Surface, key: Hashable = None) -> pygame.Surface:
+        """Copies an image into the atlas.
+
+        Parameters:
+            surface: The image.
+            key: If set, the image's region can be found with get()
+                and get_region().
+
+        Returns:
+            The image's subsurface in the atlas.
+
+        """
+        i, rect = self._allocate(*surface.get_size())
+        page = self.pages[i]
+        if surface.get_flags() & pygame.SRCALPHA:
+            # Copies the pixels as they are instead of blending them
+            page.blit(surface, rect, special_flags=pygame.BLEND_RGBA_MAX)
+        else:
+            page.blit(surface, rect)
+
+        if key is not None:
+            self.regions[key] = (i, rect)
+        return page.subsurface(rect)
+
+    def add_many(
+        self, surfaces: List[pygame.Surface], keys: List[Hashable] = None
+    ) -> List[pygame.Surface]:
+        """Copies many images into the atlas, tallest first.
+
+        Parameters:
+            surfaces: The images.
+            keys: The images' keys.
+
+        Returns:
+            The images' subsurfaces in the atlas in the same order.
+
+        """
+        if keys is None:
+            keys = [None] * len(surfaces)
+
+        out = [None] * len(surfaces)
+        order = sorted(
+            range(len(surfaces)),
+            key=lambda i: (surfaces[i].get_height(), surfaces[i].get_width()),
+            reverse=True,
+        )
+        for i in order:
+            out[i] = self.add(surfaces[i], keys[i])
+        return out
+
+    def get(self, key: Hashable) -> pygame.Surface:
+        """Returns an image's subsurface in the atlas.
+
+        Parameters:
+            key: The image's key.
+
+        """
+        i, rect = self.regions[key]
+        return self.pages[i].subsurface(rect)
+
+    def get_region(self, key: Hashable) -> Tuple[pygame.Surface, pygame.Rect]:
+        """Returns the page an image is in and its area, which can be
+        passed to pygame.Surface.blit() or .blits().
+
+        Parameters:
+            key: The image's key.
+
+        """
+        i, rect = self.regions[key]
+        return self.pages[i], rect
@@ -0,0 +1,372 @@
+"""
+SakuyaEngine (c) 2020-2021 Andrew Hong
+This code is licensed under GNU LESSER GENERAL PUBLIC LICENSE (see LICENSE for details)
+"""
+from collections import deque
+from typing import Dict, List, Type
+
+import argparse
+import math
+import random
+import pygame
+import numpy as np
+
+from .bullets import Bullet, BulletPool, BulletSpawner
+from .client import Client
+from .effect_circle import EnlargingCircle
+from .effect_particles import Particles, ParticleField
+from .lights import LightRoom
+from .math import rect_to_lines
+from .scene import Scene, SceneManager
+from .tile import TileSet, TileMap
+
+__all__ = ["benchmark", "format_benchmark", "BENCHMARK_SCENARIOS"]
+
+BENCHMARK_WINDOW_SIZE = pygame.Vector2(256, 224)
+
+
+class _BenchmarkScene(Scene):
+    def on_awake(self, **kwargs) -> None:
+        random.seed(0)
+        self.screen_rect = self.screen.get_rect()
+
+    def update(self, **kwargs) -> None:
+        self.screen.fill((0, 0, 0))
+        self.draw()
+        self.advance_frame()
+
+    def draw(self) -> None:
+        pass
+
+
+class BulletStressScene(_BenchmarkScene):
+    """Spinning BulletSpawners firing Bullet objects into Scene.bullets."""
+
+    use_pool = False
+
+    def on_awake(self, **kwargs) -> None:
+        super().on_awake(**kwargs)
+        sprite = pygame.Surface((6, 6), pygame.SRCALPHA)
+        pygame.draw.circle(sprite, (255, 64, 64), (3, 3), 3)
+        bullet = Bullet(static_sprite=sprite, custom_hitbox_size=pygame.Vector2(2, 2))
+
+        if self.use_pool:
+            self.bullet_pool = BulletPool(clock=self.clock, capacity=8192)
+
+        center = pygame.Vector2(self.screen_rect.center)
+        self.spawners = []
+        for i in range(4):
+            self.spawners.append(
+                BulletSpawner(
+                    bullet,
+                    clock=self.clock,
+                    position=center,
+                    iterations=0,
+                    total_bullet_arrays=6,
+                    bullets_per_array=3,
+                    spread_between_bullet_arrays=60,
+                    spread_within_bullet_arrays=30,
+                    starting_angle=i * 15,
+                    spin_rate=2 + i,
+                    bullet_speed=1 + i * 0.25,
+                    bullet_lifetime=60000,
+                    is_active=True,
+                    pool=self.bullet_pool,
+                )
+            )
+
+    def draw(self) -> None:
+        for spawner in self.spawners:
+            self.bullets.extend(spawner.update(self.client.delta_time))
+
+        if self.bullet_pool is not None:
+            pool = self.bullet_pool
+            n = len(pool)
+            offscreen = (
+                (pool.x[:n] < -8)
+                | (pool.x[:n] > self.screen_rect.width)
+                | (pool.y[:n] < -8)
+                | (pool.y[:n] > self.screen_rect.height)
+            )
+            pool.destroy(np.flatnonzero(offscreen))
+            pool.draw(self.screen)
+        else:
+            screen_rect = self.screen_rect
+            self.bullets = [
+                b for b in self.bullets if screen_rect.collidepoint(b.position)
+            ]
+            for b in self.bullets:
+                self.screen.blit(b.sprite, b.abs_position)
+
+
+class BulletPoolStressScene(BulletStressScene):
+    """BulletStressScene using a BulletPool."""
+
+    use_pool = True
+
+
+class ParticleStormScene(_BenchmarkScene):
+    """Particles emitters spawning on every frame."""
+
+    use_field = False
+
+    def on_awake(self, **kwargs) -> None:
+        super().on_awake(**kwargs)
+        colors = [(255, 200, 0), (255, 120, 0), (255, 40, 0)]
+        field = None
+        if self.use_field:
+            field = ParticleField(capacity=16384)
+        for i in range(16):
+            angle = math.radians(i * 360 / 16)
+            self.particle_systems.append(
+                Particles(
+                    pygame.Vector2(math.cos(angle), math.sin(angle)),
+                    spread=1,
+                    particles_num=40,
+                    lifetime=750,
+                    colors=colors,
+                    position=pygame.Vector2(self.screen_rect.center),
+                    field=field,
+                )
+            )
+        if field is not None:
+            self.particle_systems.append(field)
+
+    def draw(self) -> None:
+        for p in self.particle_systems:
+            p.render(self.screen)
+
+
+class ParticleFieldStormScene(ParticleStormScene):
+    """ParticleStormScene emitting into a ParticleField."""
+
+    use_field = True
+
+
+class HitSparkScene(_BenchmarkScene):
+    """EnlargingCircle effects created on every frame."""
+
+    use_pool = False
+
+    def on_awake(self, **kwargs) -> None:
+        super().on_awake(**kwargs)
+        self.colors = [(255, 255, 255), (255, 220, 120), (120, 200, 255)]
+
+    def draw(self) -> None:
+        for i in range(60):
+            args = (
+                pygame.Vector2(
+                    random.randint(0, self.screen_rect.width),
+                    random.randint(0, self.screen_rect.height),
+                ),
+                random.choice(self.colors),
+                2,
+                random.randint(6, 16),
+                random.uniform(0.5, 1.5),
+            )
+            if self.use_pool:
+                self.spawn_effect(EnlargingCircle, *args)
+            else:
+                self.effects.append(EnlargingCircle(*args))
+
+        for ef in self.effects:
+            ef.draw(self.screen)
+
+
+class HitSparkPoolScene(HitSparkScene):
+    """HitSparkScene recycling effects with Scene.spawn_effect()."""
+
+    use_pool = True
+
+
+class LightRoomScene(_BenchmarkScene):
+    """A LightRoom with 20 point lights and a few walls."""
+
+    def on_awake(self, **kwargs) -> None:
+        super().on_awake(**kwargs)
+        self.light_room = LightRoom(self)
+        self.walls = []
+        for i in range(6):
+            rect = pygame.Rect(20 + i * 38, 90 + (i % 2) * 30, 16, 16)
+            self.walls.extend(rect_to_lines(rect))
+        self.lights = [
+            pygame.Vector2(
+                random.randint(0, self.screen_rect.width),
+                random.randint(0, self.screen_rect.height),
+            )
+            for i in range(20)
+        ]
+
+    def draw(self) -> None:
+        self.screen.fill((40, 40, 80))
+        for position in self.lights:
+            self.light_room.draw_point_light(position, 48, collisions=self.walls)
+        self.screen.blit(self.light_room.surface, (0, 0))
+
+
+class TileMapScene(_BenchmarkScene):
+    """A 2000x500 TileMap scrolled by the camera."""
+
+    def on_awake(self, **kwargs) -> None:
+        super().on_awake(**kwargs)
+        image = pygame.Surface((32, 32))
+        for i in range(16):
+            pygame.draw.rect(
+                image, (i * 16, 255 - i * 16, 128), ((i % 4) * 8, (i // 4) * 8, 8, 8)
+            )
+        self.tile_set = TileSet(image, 8, 8)
+        self.tile_map = TileMap(2000, 500, self.tile_set)
+        rng = np.random.default_rng(0)
+        self.tile_map.set_tiles(
+            0, (0, 0), rng.integers(len(self.tile_set.tiles), size=(500, 2000))
+        )
+        self.camera.scroll = pygame.Vector2(-1.5, -0.5)
+
+    def draw(self) -> None:
+        self.tile_map.draw(self.screen, self.camera.position)
+
+
+BENCHMARK_SCENARIOS = {
+    "bullets": BulletStressScene,
+    "bullet_pool": BulletPoolStressScene,
+    "particles": ParticleStormScene,
+    "particle_field": ParticleFieldStormScene,
+    "effects": HitSparkScene,
+    "effect_pool": HitSparkPoolScene,
+    "lights": LightRoomScene,
+    "tilemap": TileMapScene,
+}
+
+
+def _count_objects(client: Client) -> Dict[str, int]:
+    objects = {"entities": 0, "bullets": 0, "effects": 0, "particles": 0}
+    for s in client.running_scenes.values():
+        scene = s["scene"]
+        objects["entities"] += len(scene.entities)
+        objects["bullets"] += len(scene.bullets)
+        if scene.bullet_pool is not None:
+            objects["bullets"] += len(scene.bullet_pool)
+        objects["effects"] += len(scene.effects)
+        for p in scene.particle_systems:
+            objects["particles"] += len(p)
+    return objects
+
+
+def benchmark(
+    scene: Type[Scene],
+    frames: int = 600,
+    delta_time: float = 1,
+    warmup_frames: int = 60,
+    window_size: pygame.Vector2 = BENCHMARK_WINDOW_SIZE,
+    **kwargs,
+) -> dict:
+    """Runs a scene headlessly for a fixed amount of frames.
+
+    Parameters:
+        scene: The scene to run.
+        frames: The amount of frames to measure.
+        delta_time: The fixed delta time of every frame.
+        warmup_frames: The amount of frames to run before measuring.
+        window_size: The client's window size.
+        kwargs: Kwargs to pass onto the scene.
+
+    Returns:
+        A dict with the frame time percentiles ("frame_time"), the
+        average time of each phase ("phases") in milliseconds, and the
+        amount of objects alive at the end ("objects").
+
+    """
+    client = Client(
+        f"SakuyaEngine Benchmark {scene.__name__}",
+        window_size,
+        debug_caption=False,
+        headless=True,
+    )
+    scene_manager = SceneManager(client)
+    scene_manager.register_scene(scene)
+    client.add_scene(scene.__name__, **kwargs)
+
+    for i in range(warmup_frames):
+        client.step(delta_time)
+
+    profiler = client.profiler
+    profiler.history = deque(maxlen=frames)
+    profiler.enabled = True
+    for i in range(frames):
+        client.step(delta_time)
+    profiler.enabled = False
+
+    frame_times = np.array(profiler.get_phase_history("frame")) * 1000
+    phases = {
+        name: duration * 1000
+        for name, duration in profiler.get_phase_averages().items()
+    }
+
+    return {
+        "scene": scene.__name__,
+        "frames": frames,
+        "frame_time": {
+            "mean": float(frame_times.mean()),
+            "p50": float(np.percentile(frame_times, 50)),
+            "p90": float(np.percentile(frame_times, 90)),
+            "p99": float(np.percentile(frame_times, 99)),
+            "max": float(frame_times.max()),
+        },
+        "phases": phases,
+        "objects": _count_objects(client),
+    }
+
+
+def format_benchmark(results: dict) -> str:
+    """Formats the results of benchmark() into a readable string.
+
+    Parameters:
+        results: The results of benchmark().
+
+    """
+    frame_time = results["frame_time"]
+    lines = [
+        f"{results['scene']} ({results['frames']} frames)",
+        "  frame time (ms): "
+        + ", ".join(f"{key} {value:.3f}" for key, value in frame_time.items()),
+        "  phases (ms):",
+    ]
+    for name, duration in sorted(results["phases"].items(), key=lambda p: -p[1]):
+        lines.append(f"    {name:<16} {duration:.3f}")
+    lines.append(
+        "  objects: "
+        + ", ".join(f"{key} {value}" for key, value in results["objects"].items())
+    )
+    return "\n".join(lines)
+
+
+def main(args: List[str] = None) -> None:
+    parser = argparse.ArgumentParser(
+        prog="python -m SakuyaEngine.benchmark",
+        description="Runs SakuyaEngine benchmark scenarios headlessly.",
+    )
+    parser.add_argument(
+        "scenarios",
+        nargs="*",
+        help=f"scenarios to run: {', '.join(BENCHMARK_SCENARIOS)} (default: all)",
+    )
+    parser.add_argument("--frames", type=int, default=600)
+    parser.add_argument("--warmup-frames", type=int, default=60)
+    parser.add_argument("--delta-time", type=float, default=1)
+    args = parser.parse_args(args)
+    for name in args.scenarios:
+        if name not in BENCHMARK_SCENARIOS:
+            parser.error(f'unknown scenario "{name}"')
+
+    for name in args.scenarios or BENCHMARK_SCENARIOS:
+        results = benchmark(
+            BENCHMARK_SCENARIOS[name],
+            frames=args.frames,
+            delta_time=args.delta_time,
+            warmup_frames=args.warmup_frames,
+        )
+        print(format_benchmark(results))
+
+
+if __name__ == "__main__":
+    main()
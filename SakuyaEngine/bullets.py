@@ -2,20 +2,28 @@
 SakuyaEngine (c) 2020-2021 Andrew Hong
 This code is licensed under GNU LESSER GENERAL PUBLIC LICENSE (see LICENSE for details)
 """
-from typing import Tuple, List, TypeVar, Callable
+from typing import Tuple, List, TypeVar, Callable, Union
 from copy import copy
 from .clock import Clock
 
 import pygame
 import math
+import numpy as np
 
-from .entity import Entity
+from .entity import Entity, LightEntity
 from .tile import split_image
 from .math import get_angle
+from .sprite_cache import rotation_cache
 
 pygame_vector2 = TypeVar("pygame_vector2", Callable, pygame.math.Vector2)
 
-__all__ = ["Bullet", "BulletSpawner"]
+__all__ = [
+    "Bullet",
+    "LightBullet",
+    "BulletPool",
+    "BulletSpawner",
+    "collide_hitbox_bounds",
+]
 
 
 class Bullet(Entity):
@@ -79,7 +87,501 @@ class Bullet(Entity):
         self.velocity = pygame.Vector2(
             self.speed * math.cos(angle), self.speed * math.sin(angle)
         )
-        return super().update(delta_time)
+
+    def advance_frame(
+        self, delta_time: float, collision_rects: List[pygame.Rect] = []
+    ) -> None:
+        self.update(delta_time)
+        return super().advance_frame(delta_time, collision_rects=collision_rects)
+
+
+class LightBullet(LightEntity):
+    __slots__ = ("speed", "curve", "damage", "color", "sound_upon_fire")
+
+    def __init__(
+        self,
+        angle: float = 0,
+        speed: float = 4,
+        color: Tuple[int, int, int] = (255, 255, 255),
+        damage: float = 5,
+        position: pygame_vector2 = pygame.math.Vector2(0, 0),
+        custom_hitbox_size: pygame_vector2 = pygame.math.Vector2(0, 0),
+        name: str = None,
+        static_sprite: pygame.Surface = None,
+        curve: float = 0,
+        tags: List[str] = [],
+        sound_upon_fire=None,
+        clock: Clock or None = None,
+    ) -> None:
+        """A compact Bullet that uses __slots__.
+
+        It can be fired by a BulletSpawner and added to Scene.bullets
+        in place of a Bullet.
+
+        """
+        super().__init__(
+            name=name,
+            tags=tags,
+            position=position,
+            custom_hitbox_size=custom_hitbox_size,
+            static_sprite=static_sprite,
+        )
+        self.angle = angle
+        self.speed = speed
+        self.color = color
+        self.damage = damage
+        self.curve = curve
+        self.sound_upon_fire = sound_upon_fire
+        self._clock = clock
+
+    def advance_frame(
+        self, delta_time: float, collision_rects: List[pygame.Rect] = []
+    ) -> None:
+        if self._enable_destroy and self._destroy_val <= self._clock.get_time():
+            self._destroy_queue = True
+
+        angle = math.radians(self.angle)
+        self.angle += self.curve * delta_time
+        self.velocity.x = self.speed * math.cos(angle) + self.acceleration.x
+        self.velocity.y = self.speed * math.sin(angle) + self.acceleration.y
+        self.position.x += self.velocity.x * delta_time
+        self.position.y += self.velocity.y * delta_time
+
+
+def collide_hitbox_bounds(
+    hitboxes: List[pygame.Rect],
+    left: np.ndarray,
+    top: np.ndarray,
+    right: np.ndarray,
+    bottom: np.ndarray,
+    graze_radius: float = None,
+) -> Tuple[np.ndarray, Union[np.ndarray, None]]:
+    """Tests many hitboxes against many bounds at once.
+
+    Parameters:
+        hitboxes: The hitboxes to compare with.
+        left: The left side of every bound.
+        top: The top side of every bound.
+        right: The right side of every bound.
+        bottom: The bottom side of every bound.
+        graze_radius: If set, bounds whose center are within this
+            distance of a hitbox without colliding are also returned.
+
+    Returns:
+        A boolean array of shape (len(hitboxes), len(left)) for hits,
+        and a boolean array of the same shape for grazes (or None).
+
+    """
+    boxes = np.array(
+        [(r.left, r.top, r.right, r.bottom) for r in hitboxes], dtype=np.float64
+    ).reshape(-1, 4)
+    box_left = boxes[:, 0, None]
+    box_top = boxes[:, 1, None]
+    box_right = boxes[:, 2, None]
+    box_bottom = boxes[:, 3, None]
+
+    # pygame.Rect.colliderect() never reports a collision with an empty rect
+    hits = (
+        (box_left < right)
+        & (box_right > left)
+        & (box_top < bottom)
+        & (box_bottom > top)
+        & (right > left)
+        & (bottom > top)
+        & (box_right > box_left)
+        & (box_bottom > box_top)
+    )
+
+    grazes = None
+    if graze_radius is not None:
+        center_x = (left + right) / 2
+        center_y = (top + bottom) / 2
+        dist_x = np.maximum(np.maximum(box_left - center_x, 0), center_x - box_right)
+        dist_y = np.maximum(np.maximum(box_top - center_y, 0), center_y - box_bottom)
+        grazes = (dist_x**2 + dist_y**2 <= graze_radius**2) & ~hits
+
+    return hits, grazes
+
+
+class BulletPool:
+    _FIELDS = (
+        ("x", np.float64),
+        ("y", np.float64),
+        ("angle", np.float64),
+        ("speed", np.float64),
+        ("curve", np.float64),
+        ("acceleration_x", np.float64),
+        ("acceleration_y", np.float64),
+        ("destroy_time", np.float64),
+        ("hitbox_width", np.float64),
+        ("hitbox_height", np.float64),
+        ("sprite_width", np.float64),
+        ("sprite_height", np.float64),
+        ("prototype", np.int32),
+        ("hooked", np.bool_),
+    )
+
+    def __init__(self, clock: Clock = None, capacity: int = 1024) -> None:
+        """A structure-of-arrays container for bullets.
+
+        Every live bullet is a row in a set of contiguous NumPy arrays
+        and the whole pool is advanced in one vectorized step per frame.
+        Bullet-specific data that never changes after firing (sprite,
+        damage, tags, ...) is kept on a shared prototype ``Bullet``.
+
+        Rows spawned with a ``Bullet`` object attached are "hooked" and
+        will have their ``on_update()`` and ``on_destroy()`` methods
+        called every frame, which is slower but allows bullet patterns
+        to be migrated gradually.
+
+        Parameters:
+            clock: The clock used for bullet lifetimes. If None,
+                pygame.time.get_ticks() is used.
+            capacity: The amount of rows allocated upon creation.
+
+        """
+        self.clock = clock
+        self.prototypes = []  # List[Bullet]
+        self._prototype_ids = {}
+        self._prototype_sprites = []
+        self._prototype_scales = []
+        self.rotation_cache = rotation_cache
+        self._capacity = 0
+        self._count = 0
+
+        for name, dtype in self._FIELDS:
+            setattr(self, name, np.zeros(0, dtype=dtype))
+        self.objects = np.empty(0, dtype=object)
+
+        self._grow(capacity)
+
+    def __len__(self) -> int:
+        return self._count
+
+    @property
+    def capacity(self) -> int:
+        return self._capacity
+
+    def _grow(self, capacity: int) -> None:
+        capacity = max(capacity, self._capacity * 2, 1)
+        for name, dtype in self._FIELDS:
+            array = np.zeros(capacity, dtype=dtype)
+            array[: self._count] = getattr(self, name)[: self._count]
+            setattr(self, name, array)
+
+        objects = np.empty(capacity, dtype=object)
+        objects[: self._count] = self.objects[: self._count]
+        self.objects = objects
+        self._capacity = capacity
+
+    def register(self, bullet: Bullet) -> int:
+        """Registers a bullet as a prototype.
+
+        Parameters:
+            bullet: The bullet to register.
+
+        Returns:
+            The prototype's index.
+
+        """
+        key = id(bullet)
+        if key in self._prototype_ids:
+            return self._prototype_ids[key]
+
+        sprite = bullet.static_sprite
+        if bullet.current_anim is not None:
+            sprite = bullet.anim_get(bullet.current_anim).sprite
+
+        index = len(self.prototypes)
+        self.prototypes.append(bullet)
+        self._prototype_sprites.append(sprite)
+        self._prototype_scales.append((bullet.scale.x, bullet.scale.y))
+        self._prototype_ids[key] = index
+        return index
+
+    def get_time(self) -> float:
+        if self.clock is None:
+            return pygame.time.get_ticks()
+        return self.clock.get_time()
+
+    def spawn(
+        self,
+        bullet: Bullet,
+        position: pygame_vector2,
+        angles: Union[float, List[float]],
+        speed: float = None,
+        curve: float = None,
+        acceleration: pygame_vector2 = None,
+        lifetime: float = None,
+        hooks: bool = False,
+    ) -> None:
+        """Appends one row per angle into the pool.
+
+        Parameters:
+            bullet: The prototype bullet.
+            position: The top-left position of the bullets.
+            angles: The bullets' angles in degrees.
+            speed: The bullets' speed. Defaults to the prototype's speed.
+            curve: The bullets' curve. Defaults to the prototype's curve.
+            acceleration: The bullets' acceleration.
+            lifetime: The bullets' lifetime in milliseconds. If None,
+                the bullets will never be destroyed.
+            hooks: If True, a copy of the prototype will be attached to
+                each row and its events will be called.
+
+        """
+        angles = np.atleast_1d(np.asarray(angles, dtype=np.float64))
+        amount = len(angles)
+        if amount == 0:
+            return None
+
+        start = self._count
+        end = start + amount
+        if end > self._capacity:
+            self._grow(end)
+
+        if speed is None:
+            speed = bullet.speed
+        if curve is None:
+            curve = bullet.curve
+        if acceleration is None:
+            acceleration = bullet.acceleration
+        if lifetime is None:
+            destroy_time = np.inf
+        else:
+            destroy_time = self.get_time() + lifetime
+
+        proto = self.register(bullet)
+        sprite = self._prototype_sprites[proto]
+        if sprite is not None:
+            sprite = self.rotation_cache.get(sprite, 0, self._prototype_scales[proto])
+            sprite_width, sprite_height = sprite.get_size()
+        else:
+            sprite_width, sprite_height = 1, 1
+
+        rows = slice(start, end)
+        self.x[rows] = position[0]
+        self.y[rows] = position[1]
+        self.angle[rows] = angles
+        self.speed[rows] = speed
+        self.curve[rows] = curve
+        self.acceleration_x[rows] = acceleration[0]
+        self.acceleration_y[rows] = acceleration[1]
+        self.destroy_time[rows] = destroy_time
+        self.hitbox_width[rows] = bullet.custom_hitbox_size[0]
+        self.hitbox_height[rows] = bullet.custom_hitbox_size[1]
+        self.sprite_width[rows] = sprite_width
+        self.sprite_height[rows] = sprite_height
+        self.prototype[rows] = proto
+        self.hooked[rows] = hooks
+
+        if hooks:
+            for i in range(amount):
+                b = copy(bullet)
+                b.position = pygame.Vector2(position[0], position[1])
+                b.angle = float(angles[i])
+                b.speed = speed
+                b.curve = curve
+                b.clock = self.clock
+                self.objects[start + i] = b
+
+        self._count = end
+
+    def clear(self) -> None:
+        """Removes every bullet without calling any events."""
+        self.objects[: self._count] = None
+        self._count = 0
+
+    def compact(self, keep: np.ndarray) -> None:
+        """Removes every row that is not flagged in keep.
+
+        Parameters:
+            keep: A boolean array with the length of the pool.
+
+        """
+        count = int(np.count_nonzero(keep))
+        if count == self._count:
+            return None
+
+        for name, dtype in self._FIELDS:
+            array = getattr(self, name)
+            array[:count] = array[: self._count][keep]
+
+        self.objects[:count] = self.objects[: self._count][keep]
+        self.objects[count : self._count] = None
+        self._count = count
+
+    def _update_hooked(self, scene, dead: np.ndarray) -> None:
+        for i in np.flatnonzero(self.hooked[: self._count]):
+            b = self.objects[i]
+            b.position.x = self.x[i]
+            b.position.y = self.y[i]
+            b.angle = self.angle[i]
+            b.speed = self.speed[i]
+            b.curve = self.curve[i]
+            b.on_update(scene)
+
+            self.x[i] = b.position.x
+            self.y[i] = b.position.y
+            self.angle[i] = b.angle
+            self.speed[i] = b.speed
+            self.curve[i] = b.curve
+
+            if dead[i]:
+                b._destroy_queue = True
+            if b._destroy_queue:
+                dead[i] = True
+                b.on_destroy(scene)
+
+    def update(self, delta_time: float, scene=None) -> None:
+        """Advances every bullet in the pool by one frame.
+
+        Parameters:
+            delta_time: The frame's delta time.
+            scene: The scene passed onto hooked bullet events.
+
+        """
+        n = self._count
+        if n == 0:
+            return None
+
+        angle = self.angle[:n]
+        radians = np.radians(angle)
+        angle += self.curve[:n] * delta_time
+
+        speed = self.speed[:n]
+        self.x[:n] += (speed * np.cos(radians) + self.acceleration_x[:n]) * delta_time
+        self.y[:n] += (speed * np.sin(radians) + self.acceleration_y[:n]) * delta_time
+
+        dead = self.destroy_time[:n] <= self.get_time()
+
+        self._update_hooked(scene, dead)
+        self.compact(~dead)
+
+    def hitbox_bounds(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """Returns the left, top, right and bottom of every bullet's hitbox.
+
+        These match Bullet.custom_hitbox.
+
+        """
+        n = self._count
+        left = self.x[:n] + self.sprite_width[:n] / 2 - self.hitbox_width[:n]
+        top = self.y[:n] + self.sprite_height[:n] / 2 - self.hitbox_height[:n]
+        right = left + self.hitbox_width[:n] * 2
+        bottom = top + self.hitbox_height[:n] * 2
+        return left, top, right, bottom
+
+    def collide(
+        self,
+        hitboxes: Union[pygame.Rect, List[pygame.Rect]],
+        ignore_tag: str = None,
+        graze_radius: float = None,
+    ) -> Union[dict, List[dict]]:
+        """Tests one or many hitboxes against every bullet at once.
+
+        Parameters:
+            hitboxes: A hitbox or a list of hitboxes to compare with.
+            ignore_tag: Bullets with this tag are ignored.
+            graze_radius: If set, bullets within this distance of a
+                hitbox that did not collide with it are also returned.
+
+        Returns:
+            A dict with the "hit" and "graze" row indices for each
+            hitbox. A single dict is returned if a single hitbox was
+            passed in.
+
+        """
+        single = isinstance(hitboxes, pygame.Rect)
+        if single:
+            hitboxes = [hitboxes]
+
+        hits, grazes = collide_hitbox_bounds(
+            hitboxes, *self.hitbox_bounds(), graze_radius=graze_radius
+        )
+
+        if ignore_tag is not None:
+            ignored = np.array(
+                [ignore_tag in b.tags for b in self.prototypes], dtype=np.bool_
+            )
+            mask = ~ignored[self.prototype[: self._count]]
+            hits &= mask
+            if grazes is not None:
+                grazes &= mask
+
+        empty = np.zeros(0, dtype=np.intp)
+        results = []
+        for i in range(len(hitboxes)):
+            results.append(
+                {
+                    "hit": np.flatnonzero(hits[i]),
+                    "graze": empty if grazes is None else np.flatnonzero(grazes[i]),
+                }
+            )
+
+        if single:
+            return results[0]
+        return results
+
+    def get_bullets(self, indices: np.ndarray) -> List[Bullet]:
+        """Returns the Bullet of every row.
+
+        Hooked rows return their own Bullet, other rows return their
+        shared prototype.
+
+        Parameters:
+            indices: The row indices.
+
+        """
+        bullets = []
+        for i in indices:
+            b = self.objects[i]
+            if b is None:
+                b = self.prototypes[self.prototype[i]]
+            bullets.append(b)
+        return bullets
+
+    def destroy(self, indices: np.ndarray) -> None:
+        """Queues rows to be destroyed upon the next update().
+
+        Parameters:
+            indices: The row indices.
+
+        """
+        self.destroy_time[indices] = -np.inf
+
+    def draw(
+        self, surface: pygame.Surface, offset: pygame_vector2 = pygame.Vector2(0, 0)
+    ) -> None:
+        """Draws every bullet onto a surface.
+
+        Rotated sprites are fetched from BulletPool.rotation_cache.
+
+        Parameters:
+            surface: Surface to draw on.
+            offset: Position offset for every bullet.
+
+        """
+        n = self._count
+        center_x = self.x[:n] + self.sprite_width[:n] / 2 + offset[0]
+        center_y = self.y[:n] + self.sprite_height[:n] / 2 + offset[1]
+
+        sprites = self._prototype_sprites
+        scales = self._prototype_scales
+        get_sprite = self.rotation_cache.get
+        blits = []
+        for proto, angle, cx, cy in zip(
+            self.prototype[:n].tolist(),
+            self.angle[:n].tolist(),
+            center_x.tolist(),
+            center_y.tolist(),
+        ):
+            if sprites[proto] is None:
+                continue
+            sprite = get_sprite(sprites[proto], -angle, scales[proto])
+            width, height = sprite.get_size()
+            blits.append((sprite, (cx - width / 2, cy - height / 2)))
+
+        surface.blits(blits, doreturn=False)
 
 
 class BulletSpawner:
@@ -112,6 +614,8 @@ class BulletSpawner:
         is_active: bool = False,
         repeat: bool = False,
         wait_until_reset: int = 0,
+        pool: BulletPool = None,
+        pool_hooks: bool = False,
     ) -> None:
         """Constructor for BulletSpawner.
 
@@ -170,6 +674,12 @@ class BulletSpawner:
                 the max_bullet_curve_rate
             bullet_lifetime:
                 The bullet's lifetime in milliseconds.
+            pool:
+                If set, fired bullets will be appended into this
+                BulletPool instead of being returned by update().
+            pool_hooks:
+                If True, bullets fired into the pool will still have
+                their on_update() and on_destroy() events called.
 
         """
         self._clock = clock
@@ -212,6 +722,8 @@ class BulletSpawner:
         self.is_active = is_active
         self.repeat = repeat  # wip
         self.wait_until_reset = wait_until_reset  # wip
+        self.pool = pool
+        self.pool_hooks = pool_hooks
 
     @property
     def clock(self) -> Clock:
@@ -263,6 +775,29 @@ class BulletSpawner:
 
         return bullet
 
+    def shoot_into_pool(self, angles: List[float]) -> None:
+        """Shoot bullets into the assigned BulletPool.
+
+        Parameters:
+            angles: Angles to shoot the bullets.
+
+        """
+        bullet = self.bullet
+        self.pool.spawn(
+            bullet,
+            self.position + self.position_offset - bullet.center_offset,
+            angles,
+            speed=self.bullet_speed,
+            curve=self.bullet_curve,
+            acceleration=self.bullet_acceleration,
+            lifetime=self.bullet_lifetime,
+            hooks=self.pool_hooks,
+        )
+
+        soundfx = bullet.sound_upon_fire
+        if soundfx is not None:
+            pygame.mixer.Sound.play(soundfx)
+
     def shoot_with_firerate(self, angle: float) -> Bullet:
         """Shoot a bullet with a fire rate limit.
 
@@ -280,6 +815,7 @@ class BulletSpawner:
     def update(self, delta_time: float) -> List[Bullet]:
         iter_bullet = 0
         bullets = []
+        angles = []
         if self._clock is None:
             pg_ticks = pygame.time.get_ticks()
         else:
@@ -314,10 +850,16 @@ class BulletSpawner:
                             - center_angle
                         )
                         angle += target_angle
-                    bullets.append(self.shoot(angle))
+                    if self.pool is None:
+                        bullets.append(self.shoot(angle))
+                    else:
+                        angles.append(angle)
 
                     iter_bullet += 1
 
+            if angles:
+                self.shoot_into_pool(angles)
+
             self.angle += self.spin_rate * delta_time
             self.spin_rate += self.spin_modificator * delta_time
 
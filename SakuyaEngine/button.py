@@ -38,6 +38,24 @@ class Button:
         else:
             return False
 
+    @property
+    def draw_state(self) -> Tuple[pygame.Rect, tuple]:
+        """The button's rect and a key that changes whenever
+        the button is drawn differently.
+
+        Buttons can be added to Scene.dirty_rect_sources.
+
+        """
+        rect = self.rect
+        return rect, (
+            rect.x,
+            rect.y,
+            rect.width,
+            rect.height,
+            self.rect_color,
+            self.text_surf,
+        )
+
     def collidepoint(self, point: pygame.Vector2) -> bool:
         return self.rect.collidepoint(point)
 
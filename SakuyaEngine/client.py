@@ -3,10 +3,11 @@ SakuyaEngine (c) 2020-2021 Andrew Hong
 This code is licensed under GNU LESSER GENERAL PUBLIC LICENSE (see LICENSE for details)
 """
 from copy import copy
-from typing import TypeVar, Callable, Union
+from typing import Generic, TypeVar, Callable, List, Union
 
 import pygame
 import logging
+import math
 import pathlib
 import os
 import time
@@ -15,6 +16,9 @@ import traceback
 from .clock import Clock
 from .errors import NoActiveSceneError
 from .events import EventSystem
+from .locals import NEAREST_SCALE_MODE, SMOOTH_SCALE_MODE, SCALE2X_SCALE_MODE
+from .math import merge_rects
+from .profiler import Profiler
 from .scene import SceneManager
 
 pygame_vector2 = TypeVar("pygame_vector2", Callable, pygame.Vector2)
@@ -43,8 +47,12 @@ class Client:
         debug_caption: bool = True,
         keep_aspect_ratio: bool = True,
         mouse_image: pygame.Surface = None,
+        scale_mode: Generic[
+            NEAREST_SCALE_MODE, SMOOTH_SCALE_MODE, SCALE2X_SCALE_MODE
+        ] = NEAREST_SCALE_MODE,
         sound_channels: int = 64,
         log_dir: Union[str, None] = None,
+        headless: bool = False,
     ) -> None:
         """The game's main client.
 
@@ -55,7 +63,16 @@ class Client:
         Parameters:
             window_name: the window's name
             window_size: the window size
+            scale_mode: How the screen is scaled onto the window.
+                NEAREST_SCALE_MODE, SMOOTH_SCALE_MODE or
+                SCALE2X_SCALE_MODE.
+            headless: If True, SDL's dummy video and audio drivers
+                will be used so that no window is opened. This must
+                be set before pygame's display is initialized.
         """
+        if headless:
+            os.environ["SDL_VIDEODRIVER"] = "dummy"
+            os.environ["SDL_AUDIODRIVER"] = "dummy"
 
         if log_dir is not None:
             self.local_dir_path = pathlib.Path.home() / log_dir
@@ -73,7 +90,17 @@ class Client:
 
         logging.info("Initializing SakuyaEngine client")
         self.debug_caption = debug_caption
+        self.debug_caption_interval = 250  # milliseconds
+        self._next_caption_ticks = 0
+        self.headless = headless
         self.is_running = True  # bool
+        self.profiler = Profiler()
+        self._profiler_overlay = False
+        self.profiler_overlay_key = None
+        self.profiler_font = None
+        self._video_resize_event = None
+        self._redraw_all = True
+        self._mouse_rect = None
         self.clock = Clock()
         self.event_system = EventSystem(self.clock)
         self._window_name = window_name  # str
@@ -83,6 +110,7 @@ class Client:
         self.original_aspect_ratio = window_size.x / window_size.y  # float
         self.keep_aspect_ratio = keep_aspect_ratio
         self.mouse_image = mouse_image
+        self._scale_mode = scale_mode
 
         self.running_scenes = {}
         self.deleted_scenes_queue = []
@@ -134,6 +162,23 @@ class Client:
 
         logging.info("Successfully initialized SakuyaEngine client")
 
+    @property
+    def profiler_overlay(self) -> bool:
+        """If True, the profiler's graph will be drawn on the screen.
+
+        Enabling the overlay also enables Client.profiler. The overlay
+        can be toggled with Client.profiler_overlay_key, and the phase
+        times will be drawn if Client.profiler_font is set.
+
+        """
+        return self._profiler_overlay
+
+    @profiler_overlay.setter
+    def profiler_overlay(self, value: bool) -> None:
+        self._profiler_overlay = value
+        if value:
+            self.profiler.enabled = True
+
     @property
     def window_name(self) -> str:
         return self._window_name
@@ -152,27 +197,161 @@ class Client:
     def window_size(self, value) -> None:
         logging.info("Setting window_size")
         self.window = pygame.display.set_mode((value.x, value.y), self.pg_flag)
+        self._update_presentation()
 
     @property
     def screen_size(self) -> pygame.Vector2:
-        return pygame.Vector2(
-            self.window_size.y
-            * self.original_window_size.x
-            / self.original_window_size.y,
-            self.window_size.y,
-        )
+        return pygame.Vector2(self._screen_size)
 
     @property
-    def _screen(self) -> pygame.Surface:
-        return pygame.transform.scale(self.screen, self.screen_size)
+    def scale(self) -> pygame.Vector2:
+        return pygame.Vector2(self._scale)
 
     @property
-    def scale(self) -> pygame.Vector2:
-        return pygame.Vector2(
-            (self.window_size.x - self._screen_pos.x * 2) / self.original_window_size.x,
-            (self.window_size.y - self._screen_pos.y * 2) / self.original_window_size.y,
+    def scale_mode(
+        self,
+    ) -> Generic[NEAREST_SCALE_MODE, SMOOTH_SCALE_MODE, SCALE2X_SCALE_MODE]:
+        return self._scale_mode
+
+    @scale_mode.setter
+    def scale_mode(
+        self, value: Generic[NEAREST_SCALE_MODE, SMOOTH_SCALE_MODE, SCALE2X_SCALE_MODE]
+    ) -> None:
+        self._scale_mode = value
+        self._update_presentation()
+
+    def _update_presentation(self) -> None:
+        """Recomputes the screen's size, position and scale in the window.
+
+        Must be called whenever the window is resized.
+
+        """
+        window_width, window_height = self.window.get_size()
+        screen_width = round(
+            window_height * self.original_window_size.x / self.original_window_size.y
+        )
+        screen_height = window_height
+        self._screen_size = (screen_width, screen_height)
+        self._screen_pos = pygame.Vector2(
+            (window_width - screen_width) // 2, (window_height - screen_height) // 2
+        )
+        self._scale = (
+            (window_width - self._screen_pos.x * 2) / self.original_window_size.x,
+            (window_height - self._screen_pos.y * 2) / self.original_window_size.y,
         )
 
+        self._redraw_all = True
+        self._integer_scale = None
+        screen_width, screen_height = self.screen.get_size()
+        if (
+            self._screen_size[0] % screen_width == 0
+            and self._screen_size[1] % screen_height == 0
+        ):
+            self._integer_scale = (
+                self._screen_size[0] // screen_width,
+                self._screen_size[1] // screen_height,
+            )
+
+        # The scaled screen is drawn straight into the window when it fits
+        self._presentation_target = None
+        self._scale2x_buffer = None
+        if self._screen_size == self.screen.get_size():
+            return None
+
+        target_rect = pygame.Rect(self._screen_pos, self._screen_size)
+        if self.window.get_rect().contains(target_rect):
+            self._presentation_target = self.window.subsurface(target_rect)
+        else:
+            self._presentation_target = pygame.Surface(self._screen_size)
+
+        if (
+            self._scale_mode is SCALE2X_SCALE_MODE
+            and self._screen_size[0] > screen_width * 2
+            and self._screen_size[1] > screen_height * 2
+        ):
+            self._scale2x_buffer = pygame.Surface((screen_width * 2, screen_height * 2))
+
+    def _present(
+        self, rects: Union[List[pygame.Rect], None] = None
+    ) -> Union[List[pygame.Rect], None]:
+        """Draws the scaled screen onto the window.
+
+        Parameters:
+            rects: If set, only these regions of the screen changed.
+
+        Returns:
+            The changed regions of the window, or None if the
+            whole window changed.
+
+        """
+        target = self._presentation_target
+        screen_x, screen_y = int(self._screen_pos.x), int(self._screen_pos.y)
+        if rects is not None:
+            screen_rect = self.screen.get_rect()
+            rects = merge_rects(r.clip(screen_rect) for r in rects)
+
+        if target is None:
+            if rects is None:
+                self.window.blit(self.screen, self._screen_pos)
+                return None
+            return [
+                self.window.blit(self.screen, r.move(screen_x, screen_y), r)
+                for r in rects
+            ]
+
+        # Nearest scaling by a whole number can be done one region at a time
+        if (
+            rects is not None
+            and self._scale_mode is NEAREST_SCALE_MODE
+            and self._integer_scale is not None
+            and target.get_parent() is self.window
+        ):
+            scale_x, scale_y = self._integer_scale
+            window_rects = []
+            for r in rects:
+                scaled = pygame.Rect(
+                    r.x * scale_x, r.y * scale_y, r.width * scale_x, r.height * scale_y
+                )
+                pygame.transform.scale(
+                    self.screen.subsurface(r), scaled.size, target.subsurface(scaled)
+                )
+                window_rects.append(scaled.move(screen_x, screen_y))
+            return window_rects
+
+        size = self._screen_size
+        if self._scale_mode is SMOOTH_SCALE_MODE:
+            pygame.transform.smoothscale(self.screen, size, target)
+        elif (
+            self._scale_mode is SCALE2X_SCALE_MODE and self._scale2x_buffer is not None
+        ):
+            pygame.transform.scale2x(self.screen, self._scale2x_buffer)
+            pygame.transform.scale(self._scale2x_buffer, size, target)
+        elif self._scale_mode is SCALE2X_SCALE_MODE and size == tuple(
+            v * 2 for v in self.screen.get_size()
+        ):
+            pygame.transform.scale2x(self.screen, target)
+        else:
+            pygame.transform.scale(self.screen, size, target)
+
+        if target.get_parent() is not self.window:
+            self.window.blit(target, self._screen_pos)
+
+        if rects is None:
+            return None
+
+        # Filtered scale modes may change the pixels around each region
+        scale_x, scale_y = self._scale
+        window_rect = self.window.get_rect()
+        window_rects = []
+        for r in rects:
+            left = int(r.left * scale_x) + screen_x
+            top = int(r.top * scale_y) + screen_y
+            right = math.ceil(r.right * scale_x) + screen_x
+            bottom = math.ceil(r.bottom * scale_y) + screen_y
+            scaled = pygame.Rect(left, top, right - left, bottom - top)
+            window_rects.append(scaled.inflate(4, 4).clip(window_rect))
+        return window_rects
+
     @property
     def mouse_pos(self) -> pygame.Vector2:
         scale = self.scale
@@ -195,89 +374,163 @@ class Client:
     def set_caption(self, val: str) -> None:
         pygame.display.set_caption(val)
 
+    def step(self, delta_time: Union[float, None] = None) -> None:
+        """Runs a single frame.
+
+        Parameters:
+            delta_time: If set, this delta time will be used instead
+                of the measured one (raw_delta_time will still be
+                multiplied by delta_time_modifier).
+
+        """
+        profiler = self.profiler
+        profiler.begin_frame()
+
+        # Delta time
+        if delta_time is None:
+            self.raw_delta_time = self.pg_clock.tick(self.max_fps) / 1000 * 60
+        else:
+            self.pg_clock.tick()
+            self.raw_delta_time = delta_time
+        self.clock.speed = self.delta_time_modifier
+        self.delta_time = self.raw_delta_time * self.delta_time_modifier
+
+        if self.running_scenes == []:
+            raise NoActiveSceneError
+
+        profiler.begin("events")
+        toggle_profiler_overlay = False
+        self.events = pygame.event.get()
+        for event in self.events:
+            if (
+                event.type == pygame.KEYDOWN
+                and self.profiler_overlay_key is not None
+                and event.key == self.profiler_overlay_key
+            ):
+                toggle_profiler_overlay = not toggle_profiler_overlay
+
+            if event.type == pygame.VIDEORESIZE:
+                if self._video_resize_event == event:
+                    continue
+
+                self._video_resize_event = event
+
+                if self.keep_aspect_ratio:
+                    logging.info(f"Resizing window to correct aspect ratio")
+                    new_height = (
+                        event.w
+                        * self.original_window_size.y
+                        / self.original_window_size.x
+                    )
+                    self.window = pygame.display.set_mode(
+                        (event.w, new_height), self.pg_flag
+                    )
+                self._update_presentation()
+        profiler.end("events")
+
+        # Update all scenes, dirty_rects is None if the whole screen changed
+        dirty_rects = []
+        if self._redraw_all or self.profiler_overlay:
+            dirty_rects = None
+        self._redraw_all = False
+
+        for s in copy(self.running_scenes):
+            s = self.running_scenes[s]["scene"]
+            if not s.paused:
+                scene_phase = f"scene_update/{s.name}"
+                profiler.begin("scene_update")
+                profiler.begin(scene_phase)
+                s.invalidate_spatial_hash()
+                s.update()
+                profiler.end(scene_phase)
+                profiler.end("scene_update")
+
+                profiler.begin("blit")
+                s.clock.speed = self.delta_time_modifier
+                scene_rects = s.pop_dirty_rects()
+                if scene_rects is None or dirty_rects is None:
+                    dirty_rects = None
+                    self.screen.fill((191, 64, 191))
+                    self.screen.blit(s.screen, s.screen_pos)
+                else:
+                    scene_x, scene_y = int(s.screen_pos.x), int(s.screen_pos.y)
+                    rects = [r.move(scene_x, scene_y) for r in scene_rects]
+                    if self._mouse_rect is not None:
+                        rects.append(self._mouse_rect)
+                    for r in rects:
+                        self.screen.fill((191, 64, 191), r)
+                        self.screen.blit(s.screen, r, r.move(-scene_x, -scene_y))
+                    dirty_rects.extend(rects)
+                profiler.end("blit")
+
+        # Delete scenes in queue
+        for s in self.deleted_scenes_queue[:]:
+            try:
+                self.deleted_scenes_queue.remove(s)
+                del self.running_scenes[s]
+                self._redraw_all = True
+            except KeyError:
+                print(f'Tried deleting scene that does not exist: "{s}"')
+
+        profiler.begin("blit")
+        if self.profiler_overlay:
+            profiler.draw(self.screen, font=self.profiler_font)
+
+        if self.mouse_image is not None and self.mouse_pos:
+            self._mouse_rect = self.screen.blit(self.mouse_image, self.mouse_pos)
+            if dirty_rects is not None:
+                dirty_rects.append(self._mouse_rect)
+        profiler.end("blit")
+
+        profiler.begin("scaling")
+        window_rects = self._present(dirty_rects)
+        profiler.end("scaling")
+
+        profiler.begin("event_system")
+        self.event_system.update()
+        profiler.end("event_system")
+
+        profiler.begin("display_update")
+        if window_rects is None:
+            pygame.display.update()
+        else:
+            pygame.display.update(window_rects)
+        profiler.end("display_update")
+
+        if self.debug_caption and pygame.time.get_ticks() >= self._next_caption_ticks:
+            self._next_caption_ticks = (
+                pygame.time.get_ticks() + self.debug_caption_interval
+            )
+            fps = round(self.pg_clock.get_fps(), 2)
+            bullets = 0
+            entities = 0
+            effects = 0
+            scene_time = 0
+            client_time = round(self.clock.get_time(), 2)
+            for s in self.running_scenes:
+                s = self.running_scenes[s]["scene"]
+                bullets += len(s.bullets)
+                entities += len(s.entities)
+                effects += len(s.effects)
+                scene_time = round(s.clock.get_time(), 2)
+            scene = ", ".join(self.running_scenes)
+            self.set_caption(
+                f"fps: {fps}, entities: {entities + bullets}, effects: {effects}, scene_time: {scene_time}, client_time: {client_time}, scene: {scene}"
+            )
+
+        profiler.end_frame()
+
+        # Toggled after the frame so the profiler never changes state mid-frame
+        if toggle_profiler_overlay:
+            self.profiler_overlay = not self.profiler_overlay
+
     def main(self) -> None:
         """
         Main game loop
         """
-        video_resize_event = None
-
         while self.is_running:
             try:
-                # Delta time
-                self.raw_delta_time = self.pg_clock.tick(self.max_fps) / 1000 * 60
-                self.clock.speed = self.delta_time_modifier
-                self.delta_time = self.raw_delta_time * self.delta_time_modifier
-
-                if self.running_scenes == []:
-                    raise NoActiveSceneError
-
-                self.events = pygame.event.get()
-                for event in self.events:
-                    if event.type == pygame.VIDEORESIZE:
-                        if video_resize_event == event:
-                            continue
-
-                        video_resize_event = event
-
-                        if self.keep_aspect_ratio:
-                            logging.info(f"Resizing window to correct aspect ratio")
-                            new_height = (
-                                event.w
-                                * self.original_window_size.y
-                                / self.original_window_size.x
-                            )
-                            self.window = pygame.display.set_mode(
-                                (event.w, new_height), self.pg_flag
-                            )
-                        window_rect = self.window.get_rect()
-                        screen_rect = self._screen.get_rect()
-                        self._screen_pos = pygame.Vector2(
-                            window_rect.centerx - screen_rect.centerx,
-                            window_rect.centery - screen_rect.centery,
-                        )
-
-                # Update all scenes
-                for s in copy(self.running_scenes):
-                    s = self.running_scenes[s]["scene"]
-                    if not s.paused:
-                        s.update()
-                        s.clock.speed = self.delta_time_modifier
-                        self.screen.fill((191, 64, 191))
-                        self.screen.blit(s.screen, s.screen_pos)
-
-                # Delete scenes in queue
-                for s in self.deleted_scenes_queue[:]:
-                    try:
-                        self.deleted_scenes_queue.remove(s)
-                        del self.running_scenes[s]
-                    except KeyError:
-                        print(f'Tried deleting scene that does not exist: "{s}"')
-
-                if self.mouse_image is not None and self.mouse_pos:
-                    self.screen.blit(self.mouse_image, self.mouse_pos)
-
-                self.window.blit(self._screen, self._screen_pos)
-
-                self.event_system.update()
-                pygame.display.update()
-
-                if self.debug_caption:
-                    fps = round(self.pg_clock.get_fps(), 2)
-                    bullets = 0
-                    entities = 0
-                    effects = 0
-                    scene_time = 0
-                    client_time = round(self.clock.get_time(), 2)
-                    for s in self.running_scenes:
-                        s = self.running_scenes[s]["scene"]
-                        bullets += len(s.bullets)
-                        entities += len(s.entities)
-                        effects += len(s.effects)
-                        scene_time = round(s.clock.get_time(), 2)
-                    scene = ", ".join(self.running_scenes)
-                    self.set_caption(
-                        f"fps: {fps}, entities: {entities + bullets}, effects: {effects}, scene_time: {scene_time}, client_time: {client_time}, scene: {scene}"
-                    )
+                self.step()
             except SystemExit:
                 logging.info("Closing game")
                 break
@@ -1,9 +1,50 @@
-from typing import Tuple
+from collections import OrderedDict
+from typing import Tuple, List
 
 import pygame
 import math
+import numpy as np
 
-__all__ = ["draw_pie"]
+__all__ = ["draw_pie", "get_arc_segments", "draw_pixels"]
+
+UNIT_ARC_CACHE_SIZE = 512
+
+# Unit arcs keyed by (start_angle, end_angle, segments)
+_unit_arcs = OrderedDict()  # OrderedDict[Tuple[float, float, int], np.ndarray]
+
+
+def get_arc_segments(radius: float, spread: float, max_error: float = 0.25) -> int:
+    """Returns the amount of segments an arc needs to be off by
+    max_error pixels at most, with one segment per degree at most.
+
+    Parameters:
+        radius: The arc's radius.
+        spread: The arc's angle width in degrees.
+        max_error: The largest distance allowed between the arc
+            and its segments in pixels.
+
+    """
+    max_segments = max(math.ceil(abs(spread)), 1)
+    if radius <= max_error:
+        return 1
+
+    step = math.degrees(2 * math.acos(1 - max_error / radius))
+    return min(max(math.ceil(abs(spread) / step), 1), max_segments)
+
+
+def _get_unit_arc(start_angle: float, end_angle: float, segments: int) -> np.ndarray:
+    key = (start_angle, end_angle, segments)
+    arc = _unit_arcs.get(key)
+    if arc is not None:
+        _unit_arcs.move_to_end(key)
+        return arc
+
+    angles = np.radians(np.linspace(start_angle, end_angle, segments + 1))
+    arc = np.stack((np.cos(angles), np.sin(angles)), 1)
+    _unit_arcs[key] = arc
+    if len(_unit_arcs) > UNIT_ARC_CACHE_SIZE:
+        _unit_arcs.popitem(last=False)
+    return arc
 
 
 def draw_pie(
@@ -13,6 +54,7 @@ def draw_pie(
     radius: int,
     start_angle: int,
     end_angle: int,
+    segments: int = None,
 ):
     """Draws a pie on a pygame Surface.
 
@@ -26,16 +68,60 @@ def draw_pie(
         position: Position to be drawn on surface.
         start_angle: Starting angle of the pie in degrees.
         end_angle: Ending angle of the pie in degrees.
+        segments: The amount of segments of the pie's arc. If None,
+            it will be chosen by get_arc_segments().
 
     """
     if start_angle == -180 and end_angle == 180:
         pygame.draw.circle(surface, color, position, radius)
         return None
 
-    points = [position]
-    for angle in range(start_angle, end_angle):
-        angle = math.radians(angle)
-        point = pygame.Vector2(math.cos(angle), math.sin(angle)) * radius
-        points.append(point + position)
+    if segments is None:
+        segments = get_arc_segments(radius, end_angle - start_angle)
+    arc = _get_unit_arc(start_angle, end_angle, segments)
 
+    center = (position[0], position[1])
+    points = (arc * radius + center).tolist()
+    points.append(center)
     pygame.draw.polygon(surface, color, points)
+
+
+def draw_pixels(
+    surface: pygame.Surface,
+    xs: np.ndarray,
+    ys: np.ndarray,
+    colors: List[Tuple[int, int, int]],
+    color_ids: np.ndarray,
+) -> None:
+    """Sets many pixels of a pygame Surface with one pixel array write.
+
+    Pixels outside of the surface's clip area are skipped, and later
+    pixels are drawn over earlier ones.
+
+    Parameters:
+        surface: Surface to draw on.
+        xs: The pixels' x positions as integers.
+        ys: The pixels' y positions as integers.
+        colors: The colors the pixels pick from.
+        color_ids: Each pixel's index in colors.
+
+    """
+    clip = surface.get_clip()
+    visible = (
+        (xs >= clip.left) & (xs < clip.right) & (ys >= clip.top) & (ys < clip.bottom)
+    )
+    xs = xs[visible]
+    ys = ys[visible]
+    color_ids = color_ids[visible]
+    if len(xs) == 0:
+        return None
+
+    if surface.get_bytesize() == 3:
+        pixels = pygame.surfarray.pixels3d(surface)
+        palette = np.array([c[:3] for c in colors], dtype=np.uint8)
+    else:
+        pixels = pygame.surfarray.pixels2d(surface)
+        palette = np.array([surface.map_rgb(c) for c in colors])
+        palette = palette.astype(pixels.dtype)
+    pixels[xs, ys] = palette[color_ids]
+    del pixels
@@ -40,6 +40,21 @@ class EnlargingCircle(BaseEffect):
             surface, self.color, self.position + offset, self.radius, int(self.width)
         )
 
+    @property
+    def draw_state(self) -> Tuple[pygame.Rect, tuple]:
+        radius = int(self.radius) + 1
+        rect = pygame.Rect(
+            self.position.x - radius, self.position.y - radius, radius * 2, radius * 2
+        )
+        return rect, (
+            rect.x,
+            rect.y,
+            rect.width,
+            rect.height,
+            int(self.width),
+            tuple(self.color),
+        )
+
     def update(self, delta_time: float) -> None:
         self.radius += self.speed * delta_time
         self.width = self.starting_width * (1 - self.radius / self.max_radius) + 1
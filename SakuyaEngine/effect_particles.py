@@ -2,20 +2,42 @@
 SakuyaEngine (c) 2020-2021 Andrew Hong
 This code is licensed under GNU LESSER GENERAL PUBLIC LICENSE (see LICENSE for details)
 """
-from typing import Tuple, List, TypeVar, Callable
+from typing import Tuple, List, TypeVar, Callable, Union, Dict
 
-import random
+import json
 import pygame
+import numpy as np
 
-from .physics import gravity
+from .clock import Clock
+from .draw import draw_pixels
 from .effects import BaseEffect
+from .errors import ParticlePresetError
 
 pygame_vector2 = TypeVar("pygame_vector2", Callable, pygame.Vector2)
 
-__all__ = ["Particle", "Particles"]
+gravity = pygame.Vector2(0, 0.1)
+
+__all__ = [
+    "Particle",
+    "Particles",
+    "ParticleField",
+    "ParticlePreset",
+    "ParticlePresets",
+    "particle_presets",
+]
 
 
 class Particle(BaseEffect):
+    __slots__ = (
+        "position",
+        "color",
+        "velocity",
+        "obey_gravity",
+        "_enable_destroy",
+        "_destroy_val",
+        "_destroy_queue",
+    )
+
     def __init__(
         self,
         position: pygame_vector2,
@@ -24,7 +46,6 @@ class Particle(BaseEffect):
         destroy_time: int,
         obey_gravity: bool = False,
     ) -> None:
-
         self.position = position
         self.color = color
         self.velocity = velocity
@@ -37,10 +58,10 @@ class Particle(BaseEffect):
     def draw(
         self, surface: pygame.Surface, offset: pygame.Vector2 = pygame.Vector2(0, 0)
     ) -> None:
-        for p in self.particles:
-            surface.set_at(
-                (int(p.position.x + offset.x), int(p.position.y + offset.y)), p.color
-            )
+        surface.set_at(
+            (int(self.position.x + offset.x), int(self.position.y + offset.y)),
+            self.color,
+        )
 
     def update(self, delta_time: float, current_time: int) -> None:
         if self._enable_destroy and self._destroy_val <= current_time:
@@ -51,6 +72,203 @@ class Particle(BaseEffect):
         self.position += self.velocity * delta_time
 
 
+class ParticleField:
+    _FIELDS = (
+        ("x", np.float64),
+        ("y", np.float64),
+        ("velocity_x", np.float64),
+        ("velocity_y", np.float64),
+        ("destroy_time", np.float64),
+        ("color", np.int32),
+        ("obey_gravity", np.bool_),
+    )
+
+    def __init__(
+        self, clock: Clock = None, capacity: int = 4096, seed: int = None
+    ) -> None:
+        """A structure-of-arrays container for particles.
+
+        Every live particle is a row in a set of contiguous NumPy arrays,
+        dead particles are removed in bulk and every particle is drawn
+        with a single write into the surface's pixels.
+
+        Colors are stored as indices into ParticleField.colors.
+
+        Parameters:
+            clock: The clock used for particle lifetimes. If None,
+                pygame.time.get_ticks() is used.
+            capacity: The amount of rows allocated upon creation.
+            seed: The seed of ParticleField.rng.
+
+        """
+        self.clock = clock
+        self.rng = np.random.default_rng(seed)
+        self.colors = []  # List[Tuple[int, int, int]]
+        self._color_ids = {}
+        self._capacity = 0
+        self._count = 0
+
+        for name, dtype in self._FIELDS:
+            setattr(self, name, np.zeros(0, dtype=dtype))
+
+        self._grow(capacity)
+
+    def __len__(self) -> int:
+        return self._count
+
+    @property
+    def capacity(self) -> int:
+        return self._capacity
+
+    def _grow(self, capacity: int) -> None:
+        capacity = max(capacity, self._capacity * 2, 1)
+        for name, dtype in self._FIELDS:
+            array = np.zeros(capacity, dtype=dtype)
+            array[: self._count] = getattr(self, name)[: self._count]
+            setattr(self, name, array)
+        self._capacity = capacity
+
+    def get_time(self) -> float:
+        if self.clock is None:
+            return pygame.time.get_ticks()
+        return self.clock.get_time()
+
+    def register_color(self, color: Tuple[int, int, int]) -> int:
+        """Returns the index of a color in ParticleField.colors.
+
+        Parameters:
+            color: The color to register.
+
+        """
+        color = tuple(color)
+        if color not in self._color_ids:
+            self._color_ids[color] = len(self.colors)
+            self.colors.append(color)
+        return self._color_ids[color]
+
+    def spawn(
+        self,
+        position: Union[pygame_vector2, np.ndarray],
+        velocities: np.ndarray,
+        colors: List[Tuple[int, int, int]],
+        lifetime: float = None,
+        obey_gravity: bool = False,
+        rng: np.random.Generator = None,
+    ) -> None:
+        """Appends one row per velocity into the field.
+
+        Parameters:
+            position: The particles' position, or an array with the
+                shape (N, 2) for one position per particle.
+            velocities: The particles' velocities with the shape (N, 2).
+            colors: The colors each particle randomly picks from.
+            lifetime: The particles' lifetime in milliseconds. If None,
+                the particles will never be destroyed.
+            obey_gravity: If True, the particles will fall.
+            rng: The generator used to pick colors. Defaults to
+                ParticleField.rng.
+
+        """
+        if len(colors) == 0:
+            raise ValueError("colors must contain at least one color.")
+
+        velocities = np.asarray(velocities, dtype=np.float64).reshape(-1, 2)
+        amount = len(velocities)
+        if amount == 0:
+            return None
+
+        start = self._count
+        end = start + amount
+        if end > self._capacity:
+            self._grow(end)
+
+        if rng is None:
+            rng = self.rng
+        if lifetime is None:
+            destroy_time = np.inf
+        else:
+            destroy_time = self.get_time() + lifetime
+
+        color_ids = np.array([self.register_color(c) for c in colors], dtype=np.int32)
+        if len(color_ids) > 1:
+            color_ids = color_ids[rng.integers(len(color_ids), size=amount)]
+
+        position = np.asarray(position, dtype=np.float64)
+        rows = slice(start, end)
+        self.x[rows] = position[..., 0]
+        self.y[rows] = position[..., 1]
+        self.velocity_x[rows] = velocities[:, 0]
+        self.velocity_y[rows] = velocities[:, 1]
+        self.destroy_time[rows] = destroy_time
+        self.color[rows] = color_ids
+        self.obey_gravity[rows] = obey_gravity
+
+        self._count = end
+
+    def clear(self) -> None:
+        """Removes every particle."""
+        self._count = 0
+
+    def compact(self, keep: np.ndarray) -> None:
+        """Removes every row that is not flagged in keep.
+
+        Parameters:
+            keep: A boolean array with the length of the field.
+
+        """
+        count = int(np.count_nonzero(keep))
+        if count == self._count:
+            return None
+
+        for name, dtype in self._FIELDS:
+            array = getattr(self, name)
+            array[:count] = array[: self._count][keep]
+        self._count = count
+
+    def update(self, delta_time: float) -> None:
+        """Advances every particle in the field by one frame.
+
+        Parameters:
+            delta_time: The frame's delta time.
+
+        """
+        n = self._count
+        if n == 0:
+            return None
+
+        dead = self.destroy_time[:n] <= self.get_time()
+        if dead.any():
+            self.compact(~dead)
+            n = self._count
+
+        falling = self.obey_gravity[:n]
+        self.velocity_x[:n] += gravity.x * falling
+        self.velocity_y[:n] += gravity.y * falling
+        self.x[:n] += self.velocity_x[:n] * delta_time
+        self.y[:n] += self.velocity_y[:n] * delta_time
+
+    def render(
+        self, surface: pygame.Surface, offset: pygame.Vector2 = pygame.Vector2(0, 0)
+    ) -> None:
+        """Draws every particle as a pixel.
+
+        Particles outside of the surface's clip area are skipped, and
+        later particles are drawn over earlier ones.
+
+        Parameters:
+            surface: Surface to draw on.
+            offset: Position offset of every particle.
+
+        """
+        n = self._count
+        if n == 0:
+            return None
+
+        xs = (self.x[:n] + offset[0]).astype(np.intp)
+        ys = (self.y[:n] + offset[1]).astype(np.intp)
+        draw_pixels(surface, xs, ys, self.colors, self.color[:n])
+
+
 class Particles:
     def __init__(
         self,
@@ -62,7 +280,29 @@ class Particles:
         offset: pygame_vector2 = pygame.Vector2(0, 0),
         position: pygame_vector2 = pygame.Vector2(0, 0),
         obey_gravity: bool = False,
+        field: ParticleField = None,
+        seed: Union[int, np.random.SeedSequence, np.random.Generator] = None,
     ) -> None:
+        """Emits particles on every update.
+
+        Parameters:
+            velocity: The particles' base velocity.
+            spread: The largest random offset added to each axis of
+                the particles' velocity.
+            particles_num: The amount of particles emitted per update.
+            lifetime: The particles' lifetime in milliseconds.
+            colors: The colors each particle randomly picks from.
+            offset: Position offset of the emitted particles.
+            position: The emitter's position.
+            obey_gravity: If True, the particles will fall.
+            field: If set, particles are emitted into this field instead
+                of Particles.particles. The field must be updated and
+                rendered separately, for example by adding it to
+                Scene.particle_systems.
+            seed: The seed or generator of Particles.rng, which picks
+                every particle's color and spread.
+
+        """
         self.particles = []
         self.velocity = velocity
         self.colors = colors
@@ -72,6 +312,29 @@ class Particles:
         self.offset = offset
         self.position = position
         self.obey_gravity = obey_gravity
+        self.field = field
+        self.rng = np.random.default_rng(seed)
+
+    def __len__(self) -> int:
+        return len(self.particles)
+
+    def get_velocities(self) -> np.ndarray:
+        """Returns the velocities of the next particles_num particles."""
+        velocities = self.rng.uniform(
+            -self.spread, self.spread, size=(self.particles_num, 2)
+        )
+        velocities += (self.velocity.x, self.velocity.y)
+        return velocities
+
+    def emit_into_field(self) -> None:
+        self.field.spawn(
+            self.position + self.offset,
+            self.get_velocities(),
+            self.colors,
+            lifetime=self.lifetime,
+            obey_gravity=self.obey_gravity,
+            rng=self.rng,
+        )
 
     def render(
         self, surface: pygame.Surface, offset: pygame.Vector2 = pygame.Vector2(0, 0)
@@ -82,38 +345,262 @@ class Particles:
             )
 
     def update(self, delta_time: float) -> None:
+        if self.field is not None:
+            self.emit_into_field()
+            return None
+
         current_time = pygame.time.get_ticks()
 
+        self.particles[:] = [p for p in self.particles if not p._destroy_queue]
         for p in self.particles:
-            if p._destroy_queue:
-                self.particles.remove(p)
             p.update(delta_time, current_time)
 
         destroy_time = self.lifetime + current_time
-        for p in range(self.particles_num):
-            random_color = random.choice(self.colors)
-            random_spread_x = random.uniform(-self.spread, self.spread)
-            random_spread_y = random.uniform(-self.spread, self.spread)
+        velocities = self.get_velocities().tolist()
+        color_ids = self.rng.integers(len(self.colors), size=self.particles_num)
+        for velocity, color_id in zip(velocities, color_ids.tolist()):
             par = Particle(
                 self.position + self.offset,
-                random_color,
-                pygame.Vector2(
-                    self.velocity.x + random_spread_x, self.velocity.y + random_spread_y
-                ),
+                self.colors[color_id],
+                pygame.Vector2(velocity),
                 destroy_time,
                 obey_gravity=self.obey_gravity,
             )
             self.particles.append(par)
 
 
+def _read_vector(data: dict, key: str) -> Tuple[float, float]:
+    try:
+        x, y = data[key]
+        return float(x), float(y)
+    except (TypeError, ValueError):
+        raise ParticlePresetError(f'"{key}" must be a pair of numbers.')
+
+
+def _read_number(data: dict, key: str, minimum: float, integer: bool = False):
+    value = data[key]
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise ParticlePresetError(f'"{key}" must be a number.')
+    if integer and value != int(value):
+        raise ParticlePresetError(f'"{key}" must be an integer.')
+    if value < minimum:
+        raise ParticlePresetError(f'"{key}" must be at least {minimum}.')
+    return int(value) if integer else value
+
+
+def _read_color(color) -> Tuple[int, ...]:
+    try:
+        color = tuple(color)
+    except TypeError:
+        color = ()
+    if len(color) not in (3, 4) or not all(
+        isinstance(c, int) and not isinstance(c, bool) and 0 <= c <= 255 for c in color
+    ):
+        raise ParticlePresetError(
+            f"Particle colors must be RGB or RGBA values from 0 to 255, not {color}."
+        )
+    return color
+
+
+class ParticlePreset:
+    _KEYS = (
+        "velocity",
+        "spread",
+        "particles_num",
+        "lifetime",
+        "colors",
+        "offset",
+        "position",
+        "obey_gravity",
+    )
+
+    def __init__(
+        self, data: dict, seed: Union[int, np.random.SeedSequence] = None
+    ) -> None:
+        """A validated particle definition that creates Particles emitters.
+
+        The definition is parsed once, so creating an emitter from a
+        preset skips reading and validating the dict.
+
+        Parameters:
+            data: A particle definition with the same keys as the
+                Particles arguments. "velocity" and "colors" are required.
+            seed: The seed of the generators given to created emitters.
+
+        """
+        unknown = set(data.keys()) - set(self._KEYS)
+        if unknown:
+            raise ParticlePresetError(
+                f"Unknown particle preset keys: {', '.join(sorted(unknown))}."
+            )
+        for key in ("velocity", "colors"):
+            if key not in data.keys():
+                raise ParticlePresetError(f'Particle presets require "{key}".')
+
+        self.velocity = _read_vector(data, "velocity")
+        self.offset = (0.0, 0.0)
+        self.position = (0.0, 0.0)
+        if "offset" in data.keys():
+            self.offset = _read_vector(data, "offset")
+        if "position" in data.keys():
+            self.position = _read_vector(data, "position")
+
+        self.spread = 3
+        self.particles_num = 2
+        self.lifetime = 1000
+        if "spread" in data.keys():
+            self.spread = _read_number(data, "spread", 0)
+        if "particles_num" in data.keys():
+            self.particles_num = _read_number(data, "particles_num", 0, integer=True)
+        if "lifetime" in data.keys():
+            self.lifetime = _read_number(data, "lifetime", 0)
+
+        if isinstance(data["colors"], (str, bytes)):
+            raise ParticlePresetError('"colors" must be a list of colors.')
+        self.colors = tuple(_read_color(c) for c in data["colors"])
+        if not self.colors:
+            raise ParticlePresetError('"colors" must not be empty.')
+
+        self.obey_gravity = data.get("obey_gravity", False)
+        if not isinstance(self.obey_gravity, bool):
+            raise ParticlePresetError('"obey_gravity" must be true or false.')
+
+        if not isinstance(seed, np.random.SeedSequence):
+            seed = np.random.SeedSequence(seed)
+        self._seed_sequence = seed
+
+    def create(
+        self,
+        position: pygame_vector2 = None,
+        field: ParticleField = None,
+        seed: Union[int, np.random.Generator] = None,
+    ) -> Particles:
+        """Creates an emitter from the preset.
+
+        Parameters:
+            position: The emitter's position. Defaults to the preset's.
+            field: The ParticleField to emit into.
+            seed: The emitter's seed or generator. If None, a generator
+                is derived from the preset's seed.
+
+        """
+        if position is None:
+            position = self.position
+        if seed is None:
+            seed = self._seed_sequence.spawn(1)[0]
+
+        return Particles(
+            pygame.Vector2(self.velocity),
+            spread=self.spread,
+            particles_num=self.particles_num,
+            lifetime=self.lifetime,
+            colors=self.colors,
+            offset=pygame.Vector2(self.offset),
+            position=pygame.Vector2(position),
+            obey_gravity=self.obey_gravity,
+            field=field,
+            seed=seed,
+        )
+
+
+class ParticlePresets:
+    def __init__(self) -> None:
+        """A registry of named ParticlePresets."""
+        self.presets = {}  # Dict[str, ParticlePreset]
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.presets
+
+    def __len__(self) -> int:
+        return len(self.presets)
+
+    def register(self, name: str, data: dict, seed: int = None) -> ParticlePreset:
+        """Validates a particle definition and registers it.
+
+        Parameters:
+            name: The preset's name.
+            data: The particle definition.
+            seed: The preset's seed.
+
+        """
+        preset = ParticlePreset(data, seed=seed)
+        self.presets[name] = preset
+        return preset
+
+    def load(self, path: str, seed: int = None) -> Dict[str, ParticlePreset]:
+        """Registers every particle definition in a JSON file.
+
+        The file must contain an object of names to particle
+        definitions. Every preset is validated before any is registered.
+
+        Parameters:
+            path: Path to the JSON file.
+            seed: The seed every preset's own seed is derived from.
+
+        """
+        with open(path, "r") as f:
+            data = json.load(f)
+
+        if not isinstance(data, dict) or not all(
+            isinstance(d, dict) for d in data.values()
+        ):
+            raise ParticlePresetError(
+                f"{path} must contain an object of particle definitions."
+            )
+
+        presets = {}
+        seeds = np.random.SeedSequence(seed).spawn(len(data))
+        for (name, definition), preset_seed in zip(data.items(), seeds):
+            try:
+                presets[name] = ParticlePreset(definition, seed=preset_seed)
+            except ParticlePresetError as e:
+                raise ParticlePresetError(f'Particle preset "{name}": {e.message}')
+
+        self.presets.update(presets)
+        return presets
+
+    def get(self, name: str) -> ParticlePreset:
+        try:
+            return self.presets[name]
+        except KeyError:
+            raise ParticlePresetError(f'Particle preset "{name}" does not exist.')
+
+    def create(
+        self,
+        name: str,
+        position: pygame_vector2 = None,
+        field: ParticleField = None,
+        seed: Union[int, np.random.Generator] = None,
+    ) -> Particles:
+        """Creates an emitter from a registered preset.
+
+        Parameters:
+            name: The preset's name.
+            position: The emitter's position. Defaults to the preset's.
+            field: The ParticleField to emit into.
+            seed: The emitter's seed or generator.
+
+        """
+        return self.get(name).create(position=position, field=field, seed=seed)
+
+
+particle_presets = ParticlePresets()
+
+
 def load_particles_dict(data: dict) -> Particles:
-    velocity = pygame.Vector2(data["velocity"])
-    del data["velocity"]
+    """Creates a Particles emitter from a dict of its arguments.
+
+    Unlike ParticlePreset, the dict is not validated. Use
+    ParticlePreset for definitions loaded from data files.
 
+    Parameters:
+        data: The Particles arguments.
+
+    """
+    data = dict(data)
+    velocity = pygame.Vector2(data.pop("velocity"))
     if "offset" in data.keys():
         data["offset"] = pygame.Vector2(data["offset"])
-
     if "position" in data.keys():
         data["position"] = pygame.Vector2(data["position"])
-
     return Particles(velocity, **data)
@@ -4,11 +4,13 @@ This code is licensed under GNU LESSER GENERAL PUBLIC LICENSE (see LICENSE for d
 """
 from random import randint
 from typing import TypeVar, Callable, List
-from copy import copy
 
+from .draw import draw_pixels
 from .effects import BaseEffect
 
+import math
 import pygame
+import numpy as np
 
 pygame_vector2 = TypeVar("pygame_vector2", Callable, pygame.Vector2)
 pygame_surface = TypeVar("pygame_surface", Callable, pygame.Surface)
@@ -17,6 +19,15 @@ __all__ = ["RainDrop", "Rain"]
 
 
 class RainDrop(BaseEffect):
+    __slots__ = (
+        "position",
+        "velocity",
+        "velocity_norm",
+        "length",
+        "color",
+        "_destroy_queue",
+    )
+
     def __init__(
         self,
         position: pygame_vector2,
@@ -53,7 +64,9 @@ class RainDrop(BaseEffect):
         self.position += velocity
 
 
-class Rain:
+class Rain(BaseEffect):
+    SHADES = 32
+
     def __init__(
         self,
         drop_count: int,
@@ -63,35 +76,143 @@ class Rain:
         velocity: pygame_vector2 = pygame.Vector2(2, 2),
         length: int = 5,
         color: List[int] = [255, 255, 255],
+        density: float = 1,
+        wind: float = 0,
+        seed: int = None,
     ) -> None:
+        """Rain drawn as lines falling across an area.
+
+        Drops are stored in a ring buffer of drop_count slots, so once
+        it is full, new drops replace the oldest ones and the cost of
+        the rain stays the same.
+
+        Parameters:
+            drop_count: The maximum amount of drops.
+            surface: The surface whose size is the rain's area.
+            effects_list: Unused, kept for compatibility.
+            position: The top-left position of the rain's area.
+            velocity: The drops' velocity without wind.
+            length: The drops' length.
+            color: The drops' base color.
+            density: The amount of drops spawned per frame.
+            wind: Added to the drops' horizontal velocity.
+            seed: The seed of Rain.rng.
+
+        """
         self.drop_count = drop_count
-        self.raindrops = []
         self.effects_list = effects_list
         self.position = position
         self.raindrop_velocity = velocity
         self.raindrop_length = length
         self.raindrop_color = color
+        self.density = density
+        self.wind = wind
         self.surface = surface
         self.surface_width = surface.get_width()
         self.surface_height = surface.get_height()
+        self.rng = np.random.default_rng(seed)
+
+        self.x = np.zeros(drop_count)
+        self.y = np.zeros(drop_count)
+        self.alive = np.zeros(drop_count, dtype=np.bool_)
+        self.shade = self.rng.integers(self.SHADES, size=drop_count)
+        self._shades = self.rng.integers(-15, 16, size=(self.SHADES, 3))
+        self._head = 0
+        self._spawn_remainder = 0.0
+
+        self._destroy_queue = False
+
+    def __len__(self) -> int:
+        return int(np.count_nonzero(self.alive))
+
+    @property
+    def velocity(self) -> pygame.Vector2:
+        """The drops' velocity including wind."""
+        return pygame.Vector2(
+            self.raindrop_velocity.x + self.wind, self.raindrop_velocity.y
+        )
+
+    @property
+    def colors(self) -> List[List[int]]:
+        """Every shade of Rain.raindrop_color a drop can have."""
+        color = np.array(self.raindrop_color[:3])
+        return np.clip(color + self._shades, 0, 255).tolist()
+
+    def spawn(self, amount: int) -> None:
+        """Spawns drops on the edges of the rain's area that they
+        move away from.
+
+        Parameters:
+            amount: The amount of drops to spawn.
+
+        """
+        amount = min(amount, self.drop_count)
+        if amount <= 0:
+            return None
+
+        slots = (self._head + np.arange(amount)) % self.drop_count
+        self._head = (self._head + amount) % self.drop_count
+
+        velocity = self.velocity
+        left = self.position.x
+        top = self.position.y
+        right = left + self.surface_width
+        bottom = top + self.surface_height
+        start_x = left if velocity.x >= 0 else right
+        start_y = top if velocity.y >= 0 else bottom
+
+        on_horizontal_edge = self.rng.integers(2, size=amount).astype(np.bool_)
+        self.x[slots] = np.where(
+            on_horizontal_edge, self.rng.uniform(left, right, size=amount), start_x
+        )
+        self.y[slots] = np.where(
+            on_horizontal_edge, start_y, self.rng.uniform(top, bottom, size=amount)
+        )
+        self.alive[slots] = True
+
+    def update(self, delta_time: float) -> None:
+        self._spawn_remainder += self.density * delta_time
+        amount = int(self._spawn_remainder)
+        self._spawn_remainder -= amount
+        self.spawn(amount)
+
+        velocity = self.velocity
+        self.x += velocity.x * delta_time
+        self.y += velocity.y * delta_time
+
+        left = self.position.x
+        top = self.position.y
+        self.alive &= (
+            (self.x >= left)
+            & (self.x <= left + self.surface_width)
+            & (self.y >= top)
+            & (self.y <= top + self.surface_height)
+        )
 
     def draw(
         self, surface: pygame_surface, offset: pygame_vector2 = pygame.Vector2(0, 0)
     ) -> None:
-        for rd in self.raindrops:
-            rd.draw(surface, offset)
+        slots = np.flatnonzero(self.alive)
+        if len(slots) == 0:
+            return None
 
-    def update(self, delta_time: float) -> None:
-        if randint(0, 1) == 1:
-            offset = pygame.Vector2(randint(0, self.surface_width), 0)
+        velocity = self.velocity
+        length = self.raindrop_length
+        if velocity.length() == 0:
+            length = 0
         else:
-            offset = pygame.Vector2(0, randint(0, self.surface_height))
-
-        pos = self.position + offset
-        r = RainDrop(
-            pos,
-            self.raindrop_velocity,
-            length=copy(self.raindrop_length),
-            color=copy(self.raindrop_color),
+            velocity = velocity.normalize()
+
+        # One point per pixel along the line's longer axis
+        steps = math.ceil(length * max(abs(velocity.x), abs(velocity.y)))
+        distances = np.linspace(0, length, steps + 1)
+        xs = self.x[slots, np.newaxis] + offset[0] + velocity.x * distances
+        ys = self.y[slots, np.newaxis] + offset[1] + velocity.y * distances
+
+        draw_pixels(
+            surface,
+            np.floor(xs).astype(np.intp).ravel(),
+            np.floor(ys).astype(np.intp).ravel(),
+            self.colors,
+            np.repeat(self.shade[slots], steps + 1),
         )
-        self.effects_list.append(r)
@@ -2,17 +2,19 @@
 SakuyaEngine (c) 2020-2021 Andrew Hong
 This code is licensed under GNU LESSER GENERAL PUBLIC LICENSE (see LICENSE for details)
 """
-from typing import TypeVar, Callable
+from typing import TypeVar, Callable, Type
 
 import pygame
 
 pygame_vector2 = TypeVar("pygame_vector2", Callable, pygame.Vector2)
 pygame_surface = TypeVar("pygame_surface", Callable, pygame.Surface)
 
-__all__ = ["BaseEffect"]
+__all__ = ["BaseEffect", "EffectPool"]
 
 
 class BaseEffect:
+    __slots__ = ()
+
     def __init__(self) -> None:
         pass
 
@@ -26,3 +28,89 @@ class BaseEffect:
 
     def update(self, delta_time: float, current_time: int) -> None:
         pass
+
+    @property
+    def draw_state(self) -> None:
+        """The effect's drawn area and a key that changes whenever
+        the effect is drawn differently.
+
+        Used by Scene.dirty_rect_mode. Effects that return None
+        redraw the whole scene.
+
+        """
+        return None
+
+
+class EffectPool:
+    def __init__(self, effect_type: Type[BaseEffect], max_size: int = 1024) -> None:
+        """Recycles effects of one type so that short-lived effects
+        don't have to be allocated every time they are created.
+
+        Recycled effects are reinitialized by calling their __init__()
+        again, so it must set every attribute the effect uses.
+
+        Parameters:
+            effect_type: The type of effect to create.
+            max_size: The maximum amount of unused effects kept.
+
+        """
+        self.effect_type = effect_type
+        self.max_size = max_size
+        self._free = []
+        self._acquired = {}  # Dict[int, BaseEffect]
+        self.reset_stats()
+
+    def __len__(self) -> int:
+        return len(self._free)
+
+    def reset_stats(self) -> None:
+        """Resets the counters in EffectPool.stats.
+
+        stats keys:
+            created: Effects acquired by creating a new effect.
+            discarded: Effects released while the pool was full.
+
+        """
+        self.stats = {"created": 0, "discarded": 0}
+
+    def acquire(self, *args, **kwargs) -> BaseEffect:
+        """Returns an unused effect reset with the arguments, or
+        a new effect if there is none.
+
+        Parameters:
+            args: The effect's constructor arguments.
+            kwargs: The effect's constructor keyword arguments.
+
+        """
+        if self._free:
+            effect = self._free.pop()
+            effect.__init__(*args, **kwargs)
+        else:
+            self.stats["created"] += 1
+            effect = self.effect_type(*args, **kwargs)
+
+        self._acquired[id(effect)] = effect
+        return effect
+
+    def release(self, effect: BaseEffect) -> None:
+        """Returns an effect to the pool.
+
+        The effect must no longer be used. Effects that were not
+        acquired from this pool are ignored.
+
+        Parameters:
+            effect: The effect to recycle.
+
+        """
+        if self._acquired.pop(id(effect), None) is not effect:
+            return None
+
+        if len(self._free) >= self.max_size:
+            self.stats["discarded"] += 1
+            return None
+
+        self._free.append(effect)
+
+    def clear(self) -> None:
+        self._free.clear()
+        self._acquired.clear()
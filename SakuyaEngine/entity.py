@@ -3,18 +3,23 @@ SakuyaEngine (c) 2020-2021 Andrew Hong
 This code is licensed under GNU LESSER GENERAL PUBLIC LICENSE (see LICENSE for details)
 """
 from __future__ import annotations
-from typing import List
+from typing import List, Tuple, Union
 from copy import copy
 
 import pygame
 import math
 
+from . import sprite_cache
 from .animation import Animation
+from .sprite_cache import RotationCache
+from .tile import TileCollisions
 
-__all__ = ["Entity"]
+__all__ = ["Entity", "LightEntity"]
 
 
 class Entity:
+    rotation_cache: RotationCache = sprite_cache.rotation_cache
+
     def __init__(
         self,
         name: str = None,
@@ -59,105 +64,170 @@ class Entity:
         # Rotations & Static Objects
         self._static_rect = pygame.Rect(0, 0, 0, 0)
         self._sprite = None
+        self._sprite_key = None
+        self._sprite_size = (0, 0)
+        self._static_size = (0, 0)
+        self._center_offset = pygame.Vector2(0, 0)
+        self._geometry_key = None
         self.direction = 0
         self.angle = 0
         self.rotation_offset = pygame.Vector2(0, 0)
         self.alpha = 255
 
+    def __copy__(self) -> Entity:
+        cls = self.__class__
+        entity = cls.__new__(cls)
+        entity.__dict__.update(self.__dict__)
+
+        # Cached geometry must not be shared between copies
+        entity.position = pygame.Vector2(self.position)
+        entity.rotation_offset = pygame.Vector2(self.rotation_offset)
+        entity._rect = self._rect.copy()
+        entity._custom_hitbox_rect = self._custom_hitbox_rect.copy()
+        entity._static_rect = self._static_rect.copy()
+        entity._center_offset = pygame.Vector2(self._center_offset)
+        return entity
+
     @property
     def sprite(self) -> pygame.Surface:
-        out_sprite = None
-        sprite = self.anim_get(self.current_anim).sprite
-        if self.scale.x != 1 or self.scale.y != 1:
-            width, height = self._sprite.get_size()
-            scaled_sprite = pygame.transform.scale(
-                sprite, (self.scale.x * width, self.scale.y * height)
-            )
-            out_sprite = scaled_sprite
+        curr_anim = self.anim_get(self.current_anim)
+        if curr_anim is not None:
+            sprite = curr_anim.sprite
         else:
-            out_sprite = sprite
+            sprite = self.static_sprite
+
+        if sprite is None:
+            self._sprite_key = None
+            return None
 
         # Rotate sprite
         direction = -self.angle + 360
-        if self.direction != direction:
-            self._sprite = pygame.transform.rotate(out_sprite, direction)
-            rect_width, rect_height = self.static_rect.size
+        static_sprite = self.static_sprite
+        static_key = None
+        if static_sprite is not None:
+            # static_sprite sets the static size even while an animation plays
+            static_key = (id(static_sprite), static_sprite.get_size())
+        sprite_key = (
+            sprite,
+            self.scale.x,
+            self.scale.y,
+            direction,
+            self.alpha,
+            static_key,
+        )
+        if self._sprite_key != sprite_key:
+            self._sprite = self.rotation_cache.get(sprite, direction, scale=self.scale)
+            if self.alpha != 255:
+                # Cached surfaces are shared, so the alpha is set on a copy
+                self._sprite = self._sprite.copy()
+                self._sprite.set_alpha(self.alpha)
+            if static_sprite is not None:
+                rect_width, rect_height = static_sprite.get_size()
+            else:
+                rect_width, rect_height = sprite.get_size()
             sprite_width, sprite_height = self._sprite.get_size()
             self.rotation_offset.x = rect_width / 2 - sprite_width / 2
             self.rotation_offset.y = rect_height / 2 - sprite_height / 2
             self.direction = direction
+            self._static_size = (rect_width, rect_height)
+            self._sprite_size = (sprite_width, sprite_height)
+            self._sprite_key = sprite_key
 
-        self._sprite.set_alpha(self.alpha)
         return self._sprite
 
     @sprite.setter
     def sprite(self, value: pygame.Surface) -> None:
         self._sprite = value
+        self._geometry_key = None
 
-    @property
-    def rect(self) -> pygame.Rect:
-        if self.sprite is not None:
-            width, height = self.sprite.get_size()
-            self._rect.x = self.position.x
-            self._rect.y = self.position.y
-            self._rect.width = width
-            self._rect.height = height
-        if self.sprite is None:
-            self._rect.x = self.position.x
-            self._rect.y = self.position.y
-            self._rect.width = 1
-            self._rect.height = 1
+    def _update_geometry(self) -> None:
+        """Recomputes rect, custom_hitbox, static_rect and center_offset.
+
+        Nothing is recomputed unless the position, sprite (animation frame,
+        static sprite and its size, angle, scale) or hitbox size changed
+        since the last call. The
+        cached rects are shared and must not be modified.
+
+        """
+        sprite = self.sprite
+        position = self.position
+        hb_size = self.custom_hitbox_size
+        geometry_key = (position.x, position.y, self._sprite_key, hb_size.x, hb_size.y)
+        if self._geometry_key == geometry_key:
+            return None
+
+        if sprite is not None:
+            width, height = self._sprite_size
+            static_width, static_height = self._static_size
+        else:
+            width, height = 1, 1
+            static_width, static_height = self._static_rect.size
+
+        self._rect.x = position.x
+        self._rect.y = position.y
+        self._rect.width = width
+        self._rect.height = height
         self._rect.x += self.rotation_offset.x
         self._rect.y += self.rotation_offset.y
+
+        self._custom_hitbox_rect.x = position.x + width / 2 - hb_size.x
+        self._custom_hitbox_rect.y = position.y + height / 2 - hb_size.y
+        self._custom_hitbox_rect.width = hb_size.x * 2
+        self._custom_hitbox_rect.height = hb_size.y * 2
+
+        self._static_rect.x = position.x
+        self._static_rect.y = position.y
+        self._static_rect.width = static_width
+        self._static_rect.height = static_height
+
+        self._center_offset.x = width / 2 + self.rotation_offset.x
+        self._center_offset.y = height / 2 + self.rotation_offset.y
+
+        self._geometry_key = geometry_key
+
+    @property
+    def rect(self) -> pygame.Rect:
+        self._update_geometry()
         return self._rect
 
     @property
     def custom_hitbox(self) -> pygame.Rect:
-        s = self.sprite
-        if s is not None:
-            width, height = s.get_size()
-        else:
-            r = self.rect
-            width, height = r.width, r.height
-        hb_size = self.custom_hitbox_size
-        self._custom_hitbox_rect.x = self.position.x + width / 2 - hb_size.x
-        self._custom_hitbox_rect.y = self.position.y + height / 2 - hb_size.y
-        self._custom_hitbox_rect.width = hb_size.x * 2
-        self._custom_hitbox_rect.height = hb_size.y * 2
+        self._update_geometry()
         return self._custom_hitbox_rect
 
     @property
     def static_rect(self) -> pygame.Rect:
-        curr_anim = self.anim_get(self.current_anim)
-        if self.static_sprite is not None:
-            width, height = self.static_sprite.get_size()
-            self._static_rect.x = self.position.x
-            self._static_rect.y = self.position.y
-            self._static_rect.width = width
-            self._static_rect.height = height
-        elif curr_anim is not None:
-            width, height = curr_anim.sprite.get_size()
-            self._static_rect.x = self.position.x
-            self._static_rect.y = self.position.y
-            self._static_rect.width = width
-            self._static_rect.height = height
-
+        self._update_geometry()
         return self._static_rect
 
     @property
     def center_offset(self) -> pygame.Vector2:
-        s = self.sprite
-        if s is not None:
-            width, height = s.get_size()
-        else:
-            r = self.rect
-            width, height = r.width, r.height
-        return pygame.Vector2(width / 2, height / 2) + self.rotation_offset
+        self._update_geometry()
+        return self._center_offset.copy()
 
     @property
     def center_position(self) -> pygame.Vector2:
         return self.position + self.center_offset
 
+    @property
+    def draw_state(self) -> Tuple[pygame.Rect, tuple]:
+        """The entity's rect and a key that changes whenever
+        the entity is drawn differently.
+
+        Used by Scene.dirty_rect_mode.
+
+        """
+        rect = self.rect
+        return rect, (rect.x, rect.y, rect.width, rect.height, self._sprite_key)
+
+    @property
+    def clock(self):
+        return self._clock
+
+    @clock.setter
+    def clock(self, value) -> None:
+        self._clock = value
+
     def destroy(self, time: int) -> None:
         """Set the destruction time.
 
@@ -177,8 +247,30 @@ class Entity:
         return self.position + self.rotation_offset + self.center_offset
 
     def move(
-        self, movement: pygame.Vector2, collision_rects: List[pygame.Rect]
+        self,
+        movement: pygame.Vector2,
+        collision_rects: Union[List[pygame.Rect], TileCollisions],
     ) -> bool:
+        """Moves the entity and stops it at collision rects.
+
+        Parameters:
+            movement: The distance to move.
+            collision_rects: The rects to collide with, or an object with
+                a query_rect() method returning the rects near a rect,
+                such as TileCollisions.
+
+        Returns:
+            Whether the top, bottom, left and right sides collided.
+
+        """
+
+        def get_collisions(test_rect: pygame.Rect) -> List[pygame.Rect]:
+            rects = collision_rects
+            query_rect = getattr(rects, "query_rect", None)
+            if query_rect is not None:
+                rects = query_rect(test_rect)
+            return [rects[i] for i in test_rect.collidelistall(rects)]
+
         def special_round(val: float) -> int:
             if val > 0:
                 return math.ceil(val)
@@ -188,13 +280,15 @@ class Entity:
                 return 0
 
         hit = {"top": False, "bottom": False, "left": False, "right": False}
+        if not collision_rects:
+            self.position.x += movement.x
+            self.position.y += movement.y
+            return hit
+
         test_rect = self.static_rect.copy()
         self.position.x += movement.x
         test_rect.x += special_round(movement.x)
-        verified_collisions = []
-        for c in collision_rects:
-            if test_rect.colliderect(c):
-                verified_collisions.append(c)
+        verified_collisions = get_collisions(test_rect)
 
         for c in verified_collisions:
             if movement.x > 0:
@@ -210,10 +304,7 @@ class Entity:
 
         self.position.y += movement.y
         test_rect.y += special_round(movement.y)
-        verified_collisions = []
-        for c in collision_rects:
-            if test_rect.colliderect(c):
-                verified_collisions.append(c)
+        verified_collisions = get_collisions(test_rect)
         for c in verified_collisions:
             if movement.y > 0:
                 test_rect.bottom = c.top
@@ -260,7 +351,9 @@ class Entity:
         raise NotImplementedError
 
     def advance_frame(
-        self, delta_time: float, collision_rects: List[pygame.Rect] = []
+        self,
+        delta_time: float,
+        collision_rects: Union[List[pygame.Rect], TileCollisions] = [],
     ) -> None:
         # Destroy
         if self._enable_destroy and self._destroy_val <= self._clock.get_time():
@@ -314,3 +407,167 @@ class Entity:
 
     def on_update(self, scene) -> None:
         pass
+
+
+class LightEntity:
+    __slots__ = (
+        "name",
+        "tags",
+        "position",
+        "velocity",
+        "acceleration",
+        "angle",
+        "static_sprite",
+        "custom_hitbox_size",
+        "_clock",
+        "_destroy_val",
+        "_enable_destroy",
+        "_destroy_queue",
+    )
+    rotation_cache: RotationCache = sprite_cache.rotation_cache
+
+    def __init__(
+        self,
+        name: str = None,
+        tags: List[str] = None,
+        position: pygame.Vector2 = None,
+        velocity: pygame.Vector2 = pygame.Vector2(0, 0),
+        acceleration: pygame.Vector2 = pygame.Vector2(0, 0),
+        custom_hitbox_size: pygame.Vector2 = pygame.Vector2(0, 0),
+        static_sprite: pygame.Surface = None,
+    ) -> None:
+        """A compact Entity that uses __slots__.
+
+        LightEntity only supports a static sprite, does not obey gravity
+        and ignores Scene.collision_rects. Its rects are built on access
+        instead of being stored on every instance.
+
+        """
+        if tags is None:
+            tags = []
+        if position is None:
+            position = pygame.Vector2(0, 0)
+
+        self.name = name
+        self.tags = tags
+        self.position = position
+        self.velocity = pygame.Vector2(velocity)
+        self.acceleration = acceleration
+        self.angle = 0
+        self.static_sprite = static_sprite
+        self.custom_hitbox_size = custom_hitbox_size
+        self._clock = None
+        self._destroy_val = 0
+        self._enable_destroy = False
+        self._destroy_queue = False
+
+    def __copy__(self) -> LightEntity:
+        cls = self.__class__
+        entity = cls.__new__(cls)
+        for klass in cls.__mro__:
+            for slot in getattr(klass, "__slots__", ()):
+                setattr(entity, slot, getattr(self, slot))
+
+        entity.position = pygame.Vector2(self.position)
+        entity.velocity = pygame.Vector2(self.velocity)
+        return entity
+
+    @property
+    def clock(self):
+        return self._clock
+
+    @clock.setter
+    def clock(self, value) -> None:
+        self._clock = value
+
+    @property
+    def sprite(self) -> pygame.Surface:
+        if self.static_sprite is None:
+            return None
+        return self.rotation_cache.get(self.static_sprite, -self.angle + 360)
+
+    @property
+    def _static_size(self) -> Tuple[int, int]:
+        if self.static_sprite is None:
+            return 1, 1
+        return self.static_sprite.get_size()
+
+    @property
+    def rect(self) -> pygame.Rect:
+        static_width, static_height = self._static_size
+        sprite = self.sprite
+        if sprite is None:
+            width, height = 1, 1
+        else:
+            width, height = sprite.get_size()
+        return pygame.Rect(
+            self.position.x + static_width / 2 - width / 2,
+            self.position.y + static_height / 2 - height / 2,
+            width,
+            height,
+        )
+
+    @property
+    def static_rect(self) -> pygame.Rect:
+        return pygame.Rect(self.position, self._static_size)
+
+    @property
+    def custom_hitbox(self) -> pygame.Rect:
+        width, height = self._static_size
+        hb_size = self.custom_hitbox_size
+        return pygame.Rect(
+            self.position.x + width / 2 - hb_size.x,
+            self.position.y + height / 2 - hb_size.y,
+            hb_size.x * 2,
+            hb_size.y * 2,
+        )
+
+    @property
+    def center_offset(self) -> pygame.Vector2:
+        width, height = self._static_size
+        return pygame.Vector2(width / 2, height / 2)
+
+    @property
+    def center_position(self) -> pygame.Vector2:
+        return self.position + self.center_offset
+
+    @property
+    def draw_state(self) -> Tuple[pygame.Rect, tuple]:
+        rect = self.rect
+        return rect, (
+            rect.x,
+            rect.y,
+            rect.width,
+            rect.height,
+            self.static_sprite,
+            self.angle,
+        )
+
+    def destroy(self, time: int) -> None:
+        """Set the destruction time.
+
+        Parameters:
+            time: milliseconds to destruction
+
+        """
+        self._enable_destroy = True
+        self._destroy_val = time + self._clock.get_time()
+
+    def advance_frame(
+        self, delta_time: float, collision_rects: List[pygame.Rect] = []
+    ) -> None:
+        if self._enable_destroy and self._destroy_val <= self._clock.get_time():
+            self._destroy_queue = True
+
+        self.velocity += self.acceleration
+        self.position.x += self.velocity.x * delta_time
+        self.position.y += self.velocity.y * delta_time
+
+    def on_awake(self, scene) -> None:
+        pass
+
+    def on_destroy(self, scene) -> None:
+        pass
+
+    def on_update(self, scene) -> None:
+        pass
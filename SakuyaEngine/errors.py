@@ -11,6 +11,8 @@ __all__ = [
     "SceneNotActiveError",
     "NotEnoughArgumentsError",
     "LineSegmentLinesError",
+    "ParticlePresetError",
+    "TileMapFormatError",
 ]
 
 
@@ -52,3 +54,15 @@ class LineSegmentLinesError(Error):
     def __init__(self):
         # Coincident means "same line"
         self.message = "Two lines inputted are parallel or coincident"
+
+
+class ParticlePresetError(Error):
+    def __init__(self, message: str = "Particle preset is invalid."):
+        self.message = message
+        super().__init__(message)
+
+
+class TileMapFormatError(Error):
+    def __init__(self, message: str = "Tile map file is invalid."):
+        self.message = message
+        super().__init__(message)
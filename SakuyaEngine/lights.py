@@ -1,13 +1,14 @@
 from typing import Generic, Tuple, List, Union
 
 from .scene import Scene
-from .math import get_angle
 from .draw import draw_pie
 from .locals import HINDERED_VISION_MODE, UNHINDERED_VISION_MODE
+from .locals import QUAD_SHADOW_MODE, VISIBILITY_SHADOW_MODE
+from .locals import NEAREST_SCALE_MODE, SMOOTH_SCALE_MODE
 
 import math
-import copy
 import pygame
+import numpy as np
 
 __all__ = ["LightRoom"]
 
@@ -22,7 +23,45 @@ class LightRoom:
             HINDERED_VISION_MODE, UNHINDERED_VISION_MODE
         ] = HINDERED_VISION_MODE,
         alpha: int = 1,
+        shadow_mode: Generic[
+            QUAD_SHADOW_MODE, VISIBILITY_SHADOW_MODE
+        ] = QUAD_SHADOW_MODE,
+        resolution_scale: float = 1,
+        upscale_mode: Generic[
+            NEAREST_SCALE_MODE, SMOOTH_SCALE_MODE
+        ] = NEAREST_SCALE_MODE,
     ) -> None:
+        """Draws lights and their shadows onto a lightmap.
+
+        Every light is rasterized into a mask only within its own
+        bounds, and the masks are blended into one lightmap with NumPy.
+        LightRoom.surface composites the lightmap once per frame.
+
+        Lights drawn with the draw_*_light() methods only last one
+        frame. Lights added with the add_*_light() methods are baked
+        and reused on every frame until they are changed or removed,
+        the frame's drawn lights are blended on top of them.
+
+        Parameters:
+            scene: The scene the lights belong to.
+            force_size: The lightmap's size, defaults to the scene's screen size.
+            shadow_color: The color of unlit areas.
+            mode: If UNHINDERED_VISION_MODE, areas that were lit once
+                will stay unshaded.
+            shadow_mode: QUAD_SHADOW_MODE draws a shadow for every
+                collision within the light's reach. VISIBILITY_SHADOW_MODE
+                draws a single visibility polygon per point light and
+                spotlight, area lights always use QUAD_SHADOW_MODE.
+            resolution_scale: The lightmap's resolution relative to
+                LightRoom.surface, such as 0.5 or 0.25. Lights are
+                drawn at this resolution and scaled up afterwards.
+            upscale_mode: How the lightmap is scaled up,
+                NEAREST_SCALE_MODE or SMOOTH_SCALE_MODE.
+
+        Collisions can be passed as a list of lines or as a NumPy
+        array with the shape (N, 2, 2).
+
+        """
         self.shadow_color = shadow_color
         self._scene = scene
 
@@ -33,62 +72,573 @@ class LightRoom:
 
         self.mode = mode
         self.alpha = alpha
+        self.upscale_mode = upscale_mode
+        self._shadow_mode = shadow_mode
 
         self._surface.fill(self.shadow_color)
-        self._light_surfs = []
         self._base_light_color = (0, 255, 0)
-        self._crop_color = (255, 0, 0)
+        self._crop_color = (0, 0, 0)
+
+        # Lights are composited onto _lightmap, which is scaled
+        # onto _surface if resolution_scale is not 1
+        self._resolution_scale = resolution_scale
+        self._lightmap = self._surface
+        if resolution_scale != 1:
+            width, height = self._surface.get_size()
+            self._lightmap = pygame.Surface(
+                (
+                    max(math.ceil(width * resolution_scale), 1),
+                    max(math.ceil(height * resolution_scale), 1),
+                ),
+                self._surface.get_flags(),
+                self._surface,
+            )
+            self._lightmap.fill(self.shadow_color)
+
+        # Lights are rasterized into _mask_surface, lit pixels are non-zero.
+        # Arrays are indexed [y, x] to match the surfaces' memory layout.
+        width, height = self._lightmap.get_size()
+        self._mask_surface = pygame.Surface((width, height))
+        self._mask_pixels = pygame.surfarray.pixels2d(self._mask_surface).T
+
+        # The blended light color and the fraction of the shadow left per pixel
+        self._light_color = np.zeros((height, width, 3), dtype=np.float32)
+        self._transmittance = np.ones((height, width), dtype=np.float32)
+        self._revealed = np.zeros((height, width), dtype=bool)
+        self._lit_rect = None
+        self._frame_started = False
+        self._drawn_lights = 0
+
+        # Static lights
+        self._lights = {}  # Dict[int, dict]
+        self._next_light_id = 0
+        self._baked_color = np.zeros((height, width, 3), dtype=np.float32)
+        self._baked_transmittance = np.ones((height, width), dtype=np.float32)
+        self._baked_rect = None
+        self._bake_queued = False
+        self._bake_version = 0
+        self._composite_key = None
 
     @property
     def scene(self) -> Scene:
         return self._scene
 
+    @property
+    def resolution_scale(self) -> float:
+        return self._resolution_scale
+
+    @property
+    def shadow_mode(self) -> Generic[QUAD_SHADOW_MODE, VISIBILITY_SHADOW_MODE]:
+        return self._shadow_mode
+
+    @shadow_mode.setter
+    def shadow_mode(
+        self, value: Generic[QUAD_SHADOW_MODE, VISIBILITY_SHADOW_MODE]
+    ) -> None:
+        self._shadow_mode = value
+        for light in self._lights.values():
+            light["mask_queued"] = True
+        self._bake_queued = True
+
     @property
     def surface(self) -> pygame.Surface:
-        if self.mode is HINDERED_VISION_MODE:
-            self._surface.fill(self.shadow_color)
+        self._begin_frame()
+
+        # Nothing changed since the last frame
+        composite_key = (self._bake_version, tuple(self.shadow_color))
+        if (
+            self._drawn_lights == 0
+            and self.mode is HINDERED_VISION_MODE
+            and self._composite_key == composite_key
+        ):
+            self._frame_started = False
+            return self._surface
+
+        self._composite_key = None
+        if self._drawn_lights == 0:
+            self._composite_key = composite_key
+        self._frame_started = False
+        self._drawn_lights = 0
+        self._composite()
+
+        if self._lightmap is not self._surface:
+            size = self._surface.get_size()
+            if self.upscale_mode is SMOOTH_SCALE_MODE:
+                pygame.transform.smoothscale(self._lightmap, size, self._surface)
+            else:
+                pygame.transform.scale(self._lightmap, size, self._surface)
 
-        for s in self._light_surfs:
-            self._surface.blit(s["crop_surf"], (0, 0))
+        return self._surface
 
-        surf_array = pygame.PixelArray(self._surface)
-        surf_array.replace(self._base_light_color, (0, 0, 255, 0))
-        surf_array.close()
+    def _composite(self) -> None:
+        """Draws the shadows and the frame's lights onto _lightmap."""
+        lightmap = self._lightmap
+        lightmap.fill(self.shadow_color)
+        lit_rect = self._lit_rect
+        if self.mode is not HINDERED_VISION_MODE:
+            alpha = pygame.surfarray.pixels_alpha(lightmap).T
+            alpha[self._revealed] = 0
+            del alpha
+
+        if lit_rect is None:
+            return None
+
+        area = (
+            slice(lit_rect.top, lit_rect.bottom),
+            slice(lit_rect.left, lit_rect.right),
+        )
+        transmittance = self._transmittance[area]
+        light_color = self._light_color[area]
+        lit = transmittance < 1
+
+        rgb = pygame.surfarray.pixels3d(lightmap).transpose(1, 0, 2)[area]
+        np.copyto(rgb, light_color, casting="unsafe", where=lit[:, :, np.newaxis])
+        del rgb
+        alpha = pygame.surfarray.pixels_alpha(lightmap).T[area]
+        np.copyto(alpha, (1 - transmittance) * 255, casting="unsafe", where=lit)
+        del alpha
+
+        if self.mode is not HINDERED_VISION_MODE:
+            self._revealed[area] |= lit
+
+        transmittance.fill(1)
+        light_color.fill(0)
+        self._lit_rect = None
+
+    def _get_light_rect(
+        self, position: pygame.Vector2, length: int
+    ) -> Union[pygame.Rect, None]:
+        """Returns a light's bounds within the lightmap, or None if it
+        is not within the lightmap."""
+        length = math.ceil(length) + 1
+        rect = pygame.Rect(
+            int(position[0]) - length,
+            int(position[1]) - length,
+            length * 2 + 1,
+            length * 2 + 1,
+        ).clip(self._mask_surface.get_rect())
+        if rect.width == 0 or rect.height == 0:
+            return None
+        return rect
+
+    def _begin_frame(self) -> None:
+        """Starts the frame's lightmap from the baked static lights."""
+        if self._frame_started:
+            return None
+
+        if self._bake_queued:
+            self._bake()
+
+        self._lit_rect = None
+        if self._baked_rect is not None:
+            rect = self._baked_rect
+            area = (slice(rect.top, rect.bottom), slice(rect.left, rect.right))
+            self._light_color[area] = self._baked_color[area]
+            self._transmittance[area] = self._baked_transmittance[area]
+            self._lit_rect = rect.copy()
+
+        self._frame_started = True
+
+    def _blend_light(
+        self,
+        light_color: np.ndarray,
+        transmittance: np.ndarray,
+        rect: pygame.Rect,
+        lit: np.ndarray,
+        color: Tuple[int, int, int, int],
+    ) -> None:
+        """Blends a light's mask into a light color and transmittance buffer.
+
+        Parameters:
+            light_color: The light color buffer.
+            transmittance: The transmittance buffer.
+            rect: The light's bounds.
+            lit: The light's mask within rect.
+            color: The light's color.
+
+        """
+        area = (slice(rect.top, rect.bottom), slice(rect.left, rect.right))
+        alpha = np.float32(color[3] / 255 if len(color) > 3 else 1)
+        transmittance = transmittance[area]
+
+        # Same as blitting the lights in order, the first light
+        # on a pixel sets its color
+        weight = np.where(transmittance == 1, np.float32(1), alpha)
+        weight *= lit
+        light_color = light_color[area]
+        light_color += (np.array(color[:3], dtype=np.float32) - light_color) * weight[
+            :, :, np.newaxis
+        ]
+        transmittance *= 1 - lit * alpha
+
+    def _add_light(self, rect: pygame.Rect, color: Tuple[int, int, int, int]) -> None:
+        """Blends the light drawn within rect on _mask_surface into the lightmap."""
+        self._begin_frame()
+        area = (slice(rect.top, rect.bottom), slice(rect.left, rect.right))
+        lit = self._mask_pixels[area] != 0
+        self._blend_light(self._light_color, self._transmittance, rect, lit, color)
+        self._drawn_lights += 1
+
+        if self._lit_rect is None:
+            self._lit_rect = rect.copy()
+        else:
+            self._lit_rect.union_ip(rect)
+
+    def _draw_light_mask(self, light: dict) -> Union[pygame.Rect, None]:
+        kwargs = light["kwargs"]
+        if light["type"] == "point":
+            return self._draw_spot_light_mask(
+                kwargs["position"], kwargs["radius"], 0, 360, kwargs["collisions"]
+            )
+        if light["type"] == "spot":
+            return self._draw_spot_light_mask(
+                kwargs["position"],
+                kwargs["length"],
+                kwargs["direction"],
+                kwargs["spread"],
+                kwargs["collisions"],
+            )
+        return self._draw_area_light_mask(
+            kwargs["position1"],
+            kwargs["position2"],
+            kwargs["length"],
+            kwargs["direction"],
+            kwargs["collisions"],
+        )
 
-        for s in self._light_surfs:
-            self._surface.blit(s["color_surf"], (0, 0))
+    def _bake(self) -> None:
+        """Blends every static light into the baked buffers, masks
+        are only redrawn for lights that changed."""
+        if self._baked_rect is not None:
+            rect = self._baked_rect
+            area = (slice(rect.top, rect.bottom), slice(rect.left, rect.right))
+            self._baked_color[area] = 0
+            self._baked_transmittance[area] = 1
+
+        self._baked_rect = None
+        for light in self._lights.values():
+            if light["mask_queued"]:
+                rect = self._draw_light_mask(light)
+                light["rect"] = rect
+                light["mask"] = None
+                if rect is not None:
+                    area = (slice(rect.top, rect.bottom), slice(rect.left, rect.right))
+                    light["mask"] = self._mask_pixels[area] != 0
+                light["mask_queued"] = False
+
+            rect = light["rect"]
+            if rect is None:
+                continue
+
+            self._blend_light(
+                self._baked_color,
+                self._baked_transmittance,
+                rect,
+                light["mask"],
+                light["kwargs"]["color"],
+            )
+            if self._baked_rect is None:
+                self._baked_rect = rect.copy()
+            else:
+                self._baked_rect.union_ip(rect)
+
+        self._bake_queued = False
+        self._bake_version += 1
+
+    def _add_static_light(self, light_type: str, **kwargs) -> int:
+        kwargs["collisions"] = self._freeze_collisions(kwargs["collisions"])
+        light_id = self._next_light_id
+        self._next_light_id += 1
+        self._lights[light_id] = {
+            "type": light_type,
+            "kwargs": kwargs,
+            "rect": None,
+            "mask": None,
+            "mask_queued": True,
+        }
+        self._bake_queued = True
+        return light_id
+
+    def _freeze_collisions(
+        self, collisions: List[Tuple[Tuple[int, int], Tuple[int, int]]]
+    ) -> Tuple[Tuple[Tuple[float, float], Tuple[float, float]], ...]:
+        return tuple((tuple(line[0]), tuple(line[1])) for line in collisions)
 
-        self._light_surfs = []
+    @property
+    def lights(self) -> List[int]:
+        """The ids of every static light."""
+        return list(self._lights)
 
-        return self._surface
+    def add_spot_light(
+        self,
+        position: pygame.Vector2,
+        length: int,
+        direction: int,
+        spread: int,
+        collisions: List[Tuple[Tuple[int, int], Tuple[int, int]]] = [],
+        color: Tuple[int, int, int, int] = (255, 255, 255, 25),
+    ) -> int:
+        """Adds a static spotlight, see draw_spot_light().
+
+        Returns:
+            The light's id.
+
+        """
+        return self._add_static_light(
+            "spot",
+            position=pygame.Vector2(position),
+            length=length,
+            direction=direction,
+            spread=spread,
+            collisions=collisions,
+            color=color,
+        )
+
+    def add_point_light(
+        self,
+        position: pygame.Vector2,
+        radius: int,
+        collisions: List[Tuple[Tuple[int, int], Tuple[int, int]]] = [],
+        color: Tuple[int, int, int, int] = (255, 255, 255, 25),
+    ) -> int:
+        """Adds a static pointlight, see draw_point_light().
+
+        Returns:
+            The light's id.
+
+        """
+        return self._add_static_light(
+            "point",
+            position=pygame.Vector2(position),
+            radius=radius,
+            collisions=collisions,
+            color=color,
+        )
+
+    def add_area_light(
+        self,
+        position1: pygame.Vector2,
+        position2: pygame.Vector2,
+        length: int,
+        direction: float,
+        collisions: List[Tuple[Tuple[int, int], Tuple[int, int]]] = [],
+        color: Tuple[int, int, int, int] = (255, 255, 255, 25),
+    ) -> int:
+        """Adds a static area light, see draw_area_light().
+
+        Returns:
+            The light's id.
+
+        """
+        return self._add_static_light(
+            "area",
+            position1=pygame.Vector2(position1),
+            position2=pygame.Vector2(position2),
+            length=length,
+            direction=direction,
+            collisions=collisions,
+            color=color,
+        )
+
+    def update_light(self, light_id: int, **kwargs) -> None:
+        """Changes a static light.
+
+        The light's mask is only redrawn if its position, size,
+        direction or collisions changed.
+
+        Parameters:
+            light_id: The light's id.
+            kwargs: The arguments of the light's add_*_light() method to change.
+
+        """
+        light = self._lights[light_id]
+        light_kwargs = light["kwargs"]
+        for key, value in kwargs.items():
+            if key not in light_kwargs:
+                raise TypeError(
+                    f'{light["type"]} light got an unexpected keyword argument "{key}"'
+                )
+            if key == "collisions":
+                value = self._freeze_collisions(value)
+            elif isinstance(light_kwargs[key], pygame.Vector2):
+                value = pygame.Vector2(value)
+
+            if light_kwargs[key] == value:
+                continue
+
+            light_kwargs[key] = value
+            if key != "color":
+                light["mask_queued"] = True
+            self._bake_queued = True
+
+    def remove_light(self, light_id: int) -> None:
+        """Removes a static light.
+
+        Parameters:
+            light_id: The light's id.
+
+        """
+        del self._lights[light_id]
+        self._bake_queued = True
+
+    def _cull_collisions(
+        self,
+        position: pygame.Vector2,
+        length: float,
+        collisions: Union[List[Tuple[Tuple[int, int], Tuple[int, int]]], np.ndarray],
+    ) -> np.ndarray:
+        """Returns the collisions within length of position as an
+        array with the shape (N, 4)."""
+        segments = np.asarray(collisions, dtype=np.float64).reshape(-1, 4)
+        if len(segments) == 0:
+            return segments
+
+        # Distance to the closest point of every segment
+        origin = np.array((position[0], position[1]), dtype=np.float64)
+        start = segments[:, :2]
+        delta = segments[:, 2:] - start
+        length_squared = (delta * delta).sum(axis=1)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            t = ((origin - start) * delta).sum(axis=1) / length_squared
+        t = np.clip(np.nan_to_num(t), 0, 1)
+        closest = start + delta * t[:, np.newaxis] - origin
+        return segments[(closest * closest).sum(axis=1) <= length * length]
 
     def _draw_shadows(
         self,
         surface: pygame.Surface,
         origin_position: pygame.Vector2,
         length: int,
-        collisions: List[Tuple[Tuple[int, int], Tuple[int, int]]] = [],
+        segments: np.ndarray,
     ) -> None:
-        shadow_points = []
-        for line in collisions:
-            points = list(copy.copy(line))
+        if len(segments) == 0:
+            return None
 
-            angle1 = get_angle(origin_position, line[1])
-            point1 = pygame.Vector2(math.cos(angle1), math.sin(angle1))
-            point1 *= length * 2
+        origin = np.array((origin_position[0], origin_position[1]))
+        point1 = segments[:, :2]
+        point2 = segments[:, 2:]
 
-            points.append(pygame.Vector2(line[1]) + point1)
-
-            angle2 = get_angle(origin_position, line[0])
-            point2 = pygame.Vector2(math.cos(angle2), math.sin(angle2))
-            point2 *= length * 2
-            points.append(pygame.Vector2(line[0]) + point2)
-
-            shadow_points.append(points)
+        # Every endpoint is extended away from the origin
+        angle1 = np.arctan2(*(point2 - origin).T[::-1])
+        angle2 = np.arctan2(*(point1 - origin).T[::-1])
+        extended1 = point2 + np.stack((np.cos(angle1), np.sin(angle1)), 1) * length * 2
+        extended2 = point1 + np.stack((np.cos(angle2), np.sin(angle2)), 1) * length * 2
 
+        shadow_points = np.stack((point1, point2, extended1, extended2), 1).tolist()
         for p in shadow_points:
             pygame.draw.polygon(surface, self._crop_color, p)
 
+    def _cast_rays(
+        self,
+        rays: np.ndarray,
+        offsets: np.ndarray,
+        start: float,
+        segments: np.ndarray,
+    ) -> np.ndarray:
+        """Returns the distance to the closest segment of every ray
+        as a fraction of the ray's length.
+
+        Every ray starts at (0, 0) and is only tested against the
+        segments whose angular extent contains the ray.
+
+        Parameters:
+            rays: The rays with the shape (M, 2).
+            offsets: The sorted angle of every ray relative to start.
+            start: The angle the offsets are relative to in radians.
+            segments: The segments relative to the rays' start
+                with the shape (N, 4).
+
+        """
+        count = len(rays)
+        fractions = np.ones(count)
+        if len(segments) == 0 or count == 0:
+            return fractions
+
+        # The angles each segment covers, starting at low
+        angle1 = np.arctan2(segments[:, 1], segments[:, 0])
+        angle2 = np.arctan2(segments[:, 3], segments[:, 2])
+        width = (angle2 - angle1 + math.pi) % math.tau - math.pi
+        low = (np.where(width >= 0, angle1, angle2) - start) % math.tau
+        width = np.abs(width)
+
+        # Every pair of a segment and a ray within its angles
+        wrapped_offsets = np.concatenate((offsets, offsets + math.tau))
+        first = np.searchsorted(wrapped_offsets, low - 1e-9)
+        last = np.searchsorted(wrapped_offsets, low + width + 1e-9, side="right")
+        counts = last - first
+        segment_index = np.repeat(np.arange(len(segments)), counts)
+        ray_index = np.arange(counts.sum()) - np.repeat(
+            np.cumsum(counts) - counts, counts
+        )
+        ray_index = (ray_index + np.repeat(first, counts)) % count
+
+        ray = rays[ray_index]
+        segment = segments[segment_index]
+        wall_x = segment[:, 2] - segment[:, 0]
+        wall_y = segment[:, 3] - segment[:, 1]
+        denominator = ray[:, 0] * wall_y - ray[:, 1] * wall_x
+        with np.errstate(divide="ignore", invalid="ignore"):
+            t = (segment[:, 0] * wall_y - segment[:, 1] * wall_x) / denominator
+            u = (segment[:, 0] * ray[:, 1] - segment[:, 1] * ray[:, 0]) / denominator
+        hit = (denominator != 0) & (t >= 0) & (t <= 1) & (u >= 0) & (u <= 1)
+        np.minimum.at(fractions, ray_index[hit], t[hit])
+        return fractions
+
+    def _get_visibility_polygon(
+        self,
+        position: pygame.Vector2,
+        length: int,
+        start_angle: int,
+        end_angle: int,
+        segments: np.ndarray,
+    ) -> List[Tuple[float, float]]:
+        """Returns the area lit by a point light or spotlight as a polygon.
+
+        Rays are cast along the light's arc, at both sides of every
+        segment endpoint and where segments cross the light's radius.
+
+        """
+        origin = np.array((position[0], position[1]), dtype=np.float64)
+        start = math.radians(start_angle)
+        span = math.radians(end_angle - start_angle)
+
+        # The arc's rays are spaced so that it is off by a quarter pixel at most
+        step = 2 * math.acos(max(1 - 0.25 / max(length, 1), -1))
+        steps = max(math.ceil(span / step), 1)
+        angles = [np.linspace(start, start + span, steps + 1)]
+
+        if len(segments):
+            points = np.unique(segments.reshape(-1, 2), axis=0) - origin
+            point_angles = np.arctan2(points[:, 1], points[:, 0])
+            angles.extend((point_angles - 0.0001, point_angles + 0.0001))
+
+            # Where segments cross the light's radius
+            start_points = segments[:, :2] - origin
+            delta = segments[:, 2:] - segments[:, :2]
+            a = (delta * delta).sum(axis=1)
+            b = 2 * (start_points * delta).sum(axis=1)
+            c = (start_points * start_points).sum(axis=1) - length * length
+            discriminant = b * b - 4 * a * c
+            crosses = (discriminant >= 0) & (a > 0)
+            root = np.sqrt(np.where(crosses, discriminant, 0))
+            for sign in (-1, 1):
+                t = (-b + sign * root) / np.where(a > 0, 2 * a, 1)
+                crossed = crosses & (t >= 0) & (t <= 1)
+                crossings = start_points[crossed] + delta[crossed] * t[crossed, None]
+                angles.append(np.arctan2(crossings[:, 1], crossings[:, 0]))
+
+        offsets = np.sort((np.concatenate(angles) - start) % math.tau)
+        if span < math.tau:
+            offsets = offsets[offsets <= span]
+        angles = offsets + start
+
+        rays = np.stack((np.cos(angles), np.sin(angles)), 1) * length
+        fractions = self._cast_rays(rays, offsets, start, segments - np.tile(origin, 2))
+        polygon = (origin + rays * fractions[:, np.newaxis]).tolist()
+        if span < math.tau:
+            polygon.insert(0, origin.tolist())
+        return polygon
+
     def draw_spot_light(
         self,
         position: pygame.Vector2,
@@ -109,31 +659,57 @@ class LightRoom:
             color: The light's color.
 
         """
-        start_angle = int(direction - spread / 2)
-        end_angle = int(direction + spread / 2)
-        light_pos = position
-
-        color_surf = self._surface.copy().convert_alpha()
-        color_surf.fill((0, 0, 0, 0))
-        draw_pie(
-            color_surf,
-            self._base_light_color,
-            light_pos,
-            length,
-            start_angle,
-            end_angle,
+        rect = self._draw_spot_light_mask(
+            position, length, direction, spread, collisions
         )
-        self._draw_shadows(color_surf, light_pos, length, collisions=collisions)
+        if rect is not None:
+            self._add_light(rect, color)
 
-        surf_array = pygame.PixelArray(color_surf)
-        surf_array.replace(self._crop_color, (0, 0, 0, 0))
-
-        crop_surf = color_surf.copy()
+    def _draw_spot_light_mask(
+        self,
+        position: pygame.Vector2,
+        length: int,
+        direction: int,
+        spread: int,
+        collisions: List[Tuple[Tuple[int, int], Tuple[int, int]]],
+    ) -> Union[pygame.Rect, None]:
+        """Draws a spotlight's mask on _mask_surface and returns its bounds."""
+        scale = self._resolution_scale
+        if scale != 1:
+            position = pygame.Vector2(position) * scale
+            length *= scale
+            collisions = np.asarray(collisions, dtype=np.float64) * scale
 
-        surf_array.replace(self._base_light_color, color)
-        surf_array.close()
+        start_angle = int(direction - spread / 2)
+        end_angle = int(direction + spread / 2)
+        light_pos = position
 
-        self._light_surfs.append({"color_surf": color_surf, "crop_surf": crop_surf})
+        rect = self._get_light_rect(light_pos, length)
+        if rect is None:
+            return None
+
+        segments = self._cull_collisions(light_pos, length, collisions)
+        surface = self._mask_surface
+        surface.set_clip(rect)
+        surface.fill(self._crop_color, rect)
+        if self._shadow_mode is VISIBILITY_SHADOW_MODE:
+            polygon = self._get_visibility_polygon(
+                light_pos, length, start_angle, end_angle, segments
+            )
+            if len(polygon) > 2:
+                pygame.draw.polygon(surface, self._base_light_color, polygon)
+        else:
+            draw_pie(
+                surface,
+                self._base_light_color,
+                light_pos,
+                length,
+                start_angle,
+                end_angle,
+            )
+            self._draw_shadows(surface, light_pos, length, segments)
+        surface.set_clip(None)
+        return rect
 
     def draw_point_light(
         self,
@@ -164,7 +740,8 @@ class LightRoom:
         collisions: List[Tuple[Tuple[int, int], Tuple[int, int]]] = [],
         color: Tuple[int, int, int, int] = (255, 255, 255, 25),
     ):
-        """Draws a pointlight.
+        """Draws an area light that shines from the line between two
+        positions.
 
         Parameters:
             position1: The first position.
@@ -175,6 +752,28 @@ class LightRoom:
             color: The light's color.
 
         """
+        rect = self._draw_area_light_mask(
+            position1, position2, length, direction, collisions
+        )
+        if rect is not None:
+            self._add_light(rect, color)
+
+    def _draw_area_light_mask(
+        self,
+        position1: pygame.Vector2,
+        position2: pygame.Vector2,
+        length: int,
+        direction: float,
+        collisions: List[Tuple[Tuple[int, int], Tuple[int, int]]],
+    ) -> Union[pygame.Rect, None]:
+        """Draws an area light's mask on _mask_surface and returns its bounds."""
+        scale = self._resolution_scale
+        if scale != 1:
+            position1 = pygame.Vector2(position1) * scale
+            position2 = pygame.Vector2(position2) * scale
+            length *= scale
+            collisions = np.asarray(collisions, dtype=np.float64) * scale
+
         direction = math.radians(direction)
         position_offset = (
             pygame.Vector2(math.cos(direction), math.sin(direction)) * length
@@ -186,18 +785,20 @@ class LightRoom:
             position1 + position_offset,
         ]
 
-        color_surf = self._surface.copy().convert_alpha()
-        color_surf.fill((0, 0, 0, 0))
-        pygame.draw.polygon(color_surf, self._base_light_color, points1)
+        rect = pygame.Rect(position1, (0, 0))
+        for point in points1[1:]:
+            rect.union_ip(pygame.Rect(point, (0, 0)))
+        rect = rect.inflate(4, 4).clip(self._mask_surface.get_rect())
+        if rect.width == 0 or rect.height == 0:
+            return None
+
+        surface = self._mask_surface
+        surface.set_clip(rect)
+        surface.fill(self._crop_color, rect)
+        pygame.draw.polygon(surface, self._base_light_color, points1)
         pos = (position1 + position2) / 2
-        self._draw_shadows(color_surf, pos, length, collisions=collisions)
-
-        surf_array = pygame.PixelArray(color_surf)
-        surf_array.replace(self._crop_color, (0, 0, 0, 0))
-
-        crop_surf = color_surf.copy()
-
-        surf_array.replace(self._base_light_color, color)
-        surf_array.close()
-
-        self._light_surfs.append({"color_surf": color_surf, "crop_surf": crop_surf})
+        reach = position1.distance_to(position2) / 2 + length
+        segments = self._cull_collisions(pos, reach, collisions)
+        self._draw_shadows(surface, pos, length, segments)
+        surface.set_clip(None)
+        return rect
@@ -1,6 +1,19 @@
 from typing import TypeVar
 
-__all__ = ["HINDERED_VISION_MODE", "UNHINDERED_VISION_MODE"]
+__all__ = [
+    "HINDERED_VISION_MODE",
+    "UNHINDERED_VISION_MODE",
+    "NEAREST_SCALE_MODE",
+    "SMOOTH_SCALE_MODE",
+    "SCALE2X_SCALE_MODE",
+    "QUAD_SHADOW_MODE",
+    "VISIBILITY_SHADOW_MODE",
+]
 
 HINDERED_VISION_MODE = TypeVar("HINDERED_VISION_MODE")
 UNHINDERED_VISION_MODE = TypeVar("UNHINDERED_VISION_MODE")
+NEAREST_SCALE_MODE = TypeVar("NEAREST_SCALE_MODE")
+SMOOTH_SCALE_MODE = TypeVar("SMOOTH_SCALE_MODE")
+SCALE2X_SCALE_MODE = TypeVar("SCALE2X_SCALE_MODE")
+QUAD_SHADOW_MODE = TypeVar("QUAD_SHADOW_MODE")
+VISIBILITY_SHADOW_MODE = TypeVar("VISIBILITY_SHADOW_MODE")
@@ -7,6 +7,7 @@ from typing import Tuple, List, Union
 
 import math
 import pygame
+import numpy as np
 
 from .errors import NegativeSpeedError
 
@@ -16,8 +17,11 @@ __all__ = [
     "get_angle",
     "move_toward",
     "raycast",
+    "raycast_batch",
+    "get_ray_fractions",
     "collide_segments",
     "rect_to_lines",
+    "merge_rects",
 ]
 
 vector2 = Union[pygame.Vector2, Tuple[float, float]]
@@ -133,6 +137,75 @@ def raycast(
     return pygame.Vector2(highest_point)
 
 
+def get_ray_fractions(
+    origins: np.ndarray, rays: np.ndarray, walls: np.ndarray
+) -> np.ndarray:
+    """Returns where rays hit walls as a fraction of each ray's length.
+
+    The arrays are broadcast against each other, so a (M, 1, 2) and
+    a (1, N, 4) array test every ray against every wall.
+
+    Parameters:
+        origins: The rays' starting positions with a last axis of (x, y).
+        rays: The rays' directions and lengths with a last axis of (x, y).
+        walls: The walls with a last axis of (x1, y1, x2, y2).
+
+    Returns:
+        The fractions, numpy.inf where the ray misses the wall.
+
+    """
+    ray_x = rays[..., 0]
+    ray_y = rays[..., 1]
+    wall_x = walls[..., 2] - walls[..., 0]
+    wall_y = walls[..., 3] - walls[..., 1]
+    offset_x = walls[..., 0] - origins[..., 0]
+    offset_y = walls[..., 1] - origins[..., 1]
+
+    denominator = ray_x * wall_y - ray_y * wall_x
+    with np.errstate(divide="ignore", invalid="ignore"):
+        t = (offset_x * wall_y - offset_y * wall_x) / denominator
+        u = (offset_x * ray_y - offset_y * ray_x) / denominator
+    hit = (denominator != 0) & (t >= 0) & (t <= 1) & (u >= 0) & (u <= 1)
+    return np.where(hit, t, np.inf)
+
+
+def raycast_batch(
+    origins: Union[vector2, np.ndarray],
+    targets: np.ndarray,
+    walls: Union[List[Tuple[vector2, vector2]], np.ndarray],
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Casts many rays against every wall at once.
+
+    See RaycastWorld for casting rays against many walls.
+
+    Parameters:
+        origins: The starting position of every ray with the shape
+            (M, 2), or a single starting position.
+        targets: The end position of every ray with the shape (M, 2).
+        walls: List of walls, or an array with the shape (N, 2, 2).
+
+    Returns:
+        The hit points with the shape (M, 2) (the target if no collision
+        was detected) and the distance to each hit point with the
+        shape (M,).
+
+    """
+    targets = np.asarray(targets, dtype=np.float64).reshape(-1, 2)
+    origins = np.broadcast_to(np.asarray(origins, dtype=np.float64), targets.shape)
+    walls = np.asarray(walls, dtype=np.float64).reshape(-1, 4)
+    rays = targets - origins
+
+    fractions = np.ones(len(targets))
+    if len(walls) and len(targets):
+        fractions = get_ray_fractions(
+            origins[:, np.newaxis], rays[:, np.newaxis], walls[np.newaxis]
+        ).min(axis=1)
+        fractions = np.minimum(fractions, 1)
+
+    distances = np.hypot(rays[:, 0], rays[:, 1]) * fractions
+    return origins + rays * fractions[:, np.newaxis], distances
+
+
 def collide_segments(
     point1,
     point2,
@@ -156,3 +229,27 @@ def rect_to_lines(
         (rect.bottomright, rect.topright),
         (rect.topleft, rect.topright),
     ]
+
+
+def merge_rects(rects: List[pygame.Rect]) -> List[pygame.Rect]:
+    """Merges overlapping rects into their unions.
+
+    Rects without an area are dropped.
+
+    Parameters:
+        rects: The rects to merge.
+
+    """
+    merged = []
+    for rect in rects:
+        rect = pygame.Rect(rect)
+        if rect.width <= 0 or rect.height <= 0:
+            continue
+
+        i = rect.collidelist(merged)
+        while i != -1:
+            rect.union_ip(merged.pop(i))
+            i = rect.collidelist(merged)
+        merged.append(rect)
+
+    return merged
@@ -0,0 +1,201 @@
+"""
+SakuyaEngine (c) 2020-2021 Andrew Hong
+This code is licensed under GNU LESSER GENERAL PUBLIC LICENSE (see LICENSE for details)
+"""
+from collections import deque
+from typing import Dict, List, Tuple
+
+import json
+import time
+import pygame
+
+__all__ = ["Profiler"]
+
+
+class Profiler:
+    def __init__(self, enabled: bool = False, history_size: int = 600) -> None:
+        """Times each phase of a frame.
+
+        Phases may be nested, a phase's time includes every phase
+        that began within it. Nested phases are named with a "/",
+        such as "advance_frame/bullets".
+
+        Parameters:
+            enabled: If False, begin() and end() do nothing.
+            history_size: The amount of frames kept in Profiler.history.
+
+        """
+        self.enabled = enabled
+        self.history = deque(maxlen=history_size)  # Deque[Dict[str, float]]
+        self.phases = {}  # Dict[str, float]
+        self.tracing = False
+        self.trace_events = []  # List[dict]
+        self._starts = {}
+        self._frame_start = None
+        self._trace_start = time.perf_counter()
+
+    def begin(self, name: str) -> None:
+        """Starts timing a phase.
+
+        Parameters:
+            name: The phase's name.
+
+        """
+        if self.enabled:
+            self._starts[name] = time.perf_counter()
+
+    def end(self, name: str) -> None:
+        """Stops timing a phase.
+
+        Phases that never began, such as when the profiler was enabled
+        after begin() was called, are ignored.
+
+        Parameters:
+            name: The phase's name.
+
+        """
+        if self.enabled:
+            end = time.perf_counter()
+            start = self._starts.pop(name, None)
+            if start is None:
+                return None
+
+            duration = end - start
+            self.phases[name] = self.phases.get(name, 0) + duration
+            if self.tracing:
+                self._add_trace_event(name, start, duration)
+
+    def begin_frame(self) -> None:
+        if self.enabled:
+            self.phases = {}
+            self._frame_start = time.perf_counter()
+
+    def end_frame(self) -> None:
+        """Stores the frame's phase times (in seconds) in Profiler.history."""
+        if self.enabled and self._frame_start is not None:
+            duration = time.perf_counter() - self._frame_start
+            self.phases["frame"] = duration
+            self.history.append(self.phases)
+            if self.tracing:
+                self._add_trace_event("frame", self._frame_start, duration)
+            self._frame_start = None
+
+    def clear(self) -> None:
+        self.history.clear()
+        self.phases = {}
+
+    def get_phase_history(self, name: str) -> List[float]:
+        """Returns a phase's time (in seconds) for every frame in the history.
+
+        Parameters:
+            name: The phase's name.
+
+        """
+        return [frame.get(name, 0) for frame in self.history]
+
+    def get_phase_averages(self, frames: int = None) -> Dict[str, float]:
+        """Returns the average time (in seconds) of every phase in the history.
+
+        Parameters:
+            frames: If set, only the latest frames will be averaged.
+
+        """
+        history = list(self.history)
+        if frames is not None:
+            history = history[-frames:]
+
+        totals = {}
+        for frame in history:
+            for name, duration in frame.items():
+                totals[name] = totals.get(name, 0) + duration
+
+        count = max(len(history), 1)
+        return {name: total / count for name, total in totals.items()}
+
+    def _add_trace_event(self, name: str, start: float, duration: float) -> None:
+        self.trace_events.append(
+            {
+                "name": name,
+                "ph": "X",
+                "ts": (start - self._trace_start) * 1000000,
+                "dur": duration * 1000000,
+                "pid": 0,
+                "tid": 0,
+            }
+        )
+
+    def start_trace(self) -> None:
+        """Starts recording every phase into Profiler.trace_events."""
+        self.enabled = True
+        self.tracing = True
+        self.trace_events = []
+        self._trace_start = time.perf_counter()
+
+    def stop_trace(self) -> None:
+        self.tracing = False
+
+    def export_chrome_trace(self, path: str) -> None:
+        """Writes the recorded trace events into a JSON file.
+
+        The file can be opened with chrome://tracing or Perfetto.
+
+        Parameters:
+            path: The file's path.
+
+        """
+        with open(path, "w") as f:
+            json.dump({"traceEvents": self.trace_events, "displayTimeUnit": "ms"}, f)
+
+    def draw(
+        self,
+        surface: pygame.Surface,
+        font=None,
+        position: Tuple[int, int] = (0, 0),
+        size: Tuple[int, int] = (120, 32),
+        target_fps: float = 60,
+        color: Tuple[int, int, int] = (255, 255, 255),
+    ) -> None:
+        """Draws a frame time graph and the average phase times.
+
+        Each column of the graph is a frame from the history, the
+        horizontal line is the frame budget of target_fps.
+
+        Parameters:
+            surface: Surface to draw on.
+            font: The Font used for the phase times. If None, only
+                the graph will be drawn.
+            position: The overlay's top-left position.
+            size: The graph's width and height.
+            target_fps: The frame rate used for the budget line.
+            color: The graph and text color.
+
+        """
+        x, y = position
+        width, height = size
+        budget = 1 / target_fps
+
+        graph = pygame.Surface(size, pygame.SRCALPHA)
+        graph.fill((0, 0, 0, 160))
+        frames = list(self.history)[-width:]
+        for column, frame in enumerate(frames):
+            duration = frame.get("frame", 0)
+            bar_height = min(duration / budget / 2, 1) * height
+            bar_color = color if duration <= budget else (255, 64, 64)
+            pygame.draw.line(
+                graph,
+                bar_color,
+                (column, height - 1),
+                (column, height - bar_height),
+            )
+        pygame.draw.line(graph, (64, 255, 64), (0, height / 2), (width, height / 2))
+        surface.blit(graph, position)
+
+        if font is None:
+            return None
+
+        y += height + 2
+        averages = self.get_phase_averages(frames=width)
+        for name, duration in sorted(averages.items(), key=lambda p: -p[1]):
+            text = f"{name} {duration * 1000:.2f}".upper().replace("_", "-")
+            text = "".join(c for c in text if c == " " or c in font.database)
+            y += font.render_into(surface, (x, y), text, color=color).height + 1
@@ -0,0 +1,264 @@
+"""
+SakuyaEngine (c) 2020-2021 Andrew Hong
+This code is licensed under GNU LESSER GENERAL PUBLIC LICENSE (see LICENSE for details)
+"""
+from typing import List, Tuple, Union
+
+import math
+import numpy as np
+
+from .math import get_ray_fractions
+
+__all__ = ["RaycastWorld"]
+
+walls_type = Union[List[Tuple[Tuple[float, float], Tuple[float, float]]], np.ndarray]
+
+
+class RaycastWorld:
+    def __init__(self, walls: walls_type = [], cell_size: int = 32) -> None:
+        """Casts batches of rays against static walls.
+
+        Walls are stored in a uniform grid, each ray is only tested
+        against the walls in the cells it passes through.
+
+        Parameters:
+            walls: List of walls, or an array with the shape (N, 2, 2).
+            cell_size: The width and height of each cell in pixels.
+
+        """
+        self._cell_size = cell_size
+        self.walls = walls
+
+    @property
+    def cell_size(self) -> int:
+        return self._cell_size
+
+    @cell_size.setter
+    def cell_size(self, value: int) -> None:
+        self._cell_size = value
+        self._build()
+
+    @property
+    def walls(self) -> np.ndarray:
+        """The walls as an array with the shape (N, 4)."""
+        return self._walls
+
+    @walls.setter
+    def walls(self, value: walls_type) -> None:
+        self._walls = np.array(value, dtype=np.float64).reshape(-1, 4)
+        self._build()
+
+    def add_walls(self, walls: walls_type) -> None:
+        """Adds walls and rebuilds the grid.
+
+        Parameters:
+            walls: List of walls, or an array with the shape (N, 2, 2).
+
+        """
+        walls = np.asarray(walls, dtype=np.float64).reshape(-1, 4)
+        self.walls = np.concatenate((self._walls, walls))
+
+    def __len__(self) -> int:
+        return len(self._walls)
+
+    def _build(self) -> None:
+        """Stores every wall in each cell its bounds overlap."""
+        walls = self._walls
+        if len(walls) == 0:
+            self._grid_position = (0, 0)
+            self._grid_size = (0, 0)
+            self._cell_starts = np.zeros(1, dtype=np.intp)
+            self._cell_walls = np.zeros(0, dtype=np.intp)
+            return None
+
+        cell_size = self._cell_size
+        left = np.floor(np.minimum(walls[:, 0], walls[:, 2]) / cell_size)
+        right = np.floor(np.maximum(walls[:, 0], walls[:, 2]) / cell_size)
+        top = np.floor(np.minimum(walls[:, 1], walls[:, 3]) / cell_size)
+        bottom = np.floor(np.maximum(walls[:, 1], walls[:, 3]) / cell_size)
+        left, right, top, bottom = (
+            a.astype(np.intp) for a in (left, right, top, bottom)
+        )
+
+        grid_x = int(left.min())
+        grid_y = int(top.min())
+        grid_width = int(right.max()) - grid_x + 1
+        grid_height = int(bottom.max()) - grid_y + 1
+
+        # Every (wall, cell) pair
+        widths = right - left + 1
+        counts = widths * (bottom - top + 1)
+        wall_index = np.repeat(np.arange(len(walls)), counts)
+        local = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        widths = np.repeat(widths, counts)
+        cell_x = np.repeat(left, counts) + local % widths - grid_x
+        cell_y = np.repeat(top, counts) + local // widths - grid_y
+        cells = cell_x + cell_y * grid_width
+
+        order = np.argsort(cells, kind="stable")
+        self._grid_position = (grid_x, grid_y)
+        self._grid_size = (grid_width, grid_height)
+        self._cell_walls = wall_index[order]
+        self._cell_starts = np.concatenate(
+            ([0], np.cumsum(np.bincount(cells, minlength=grid_width * grid_height)))
+        )
+
+    def _get_ray_cells(
+        self, origins: np.ndarray, rays: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Returns every (ray, cell) pair a ray passes through."""
+        cell_size = self._cell_size
+        grid_x, grid_y = self._grid_position
+        grid_width, grid_height = self._grid_size
+        bounds = (
+            (grid_x * cell_size, (grid_x + grid_width) * cell_size),
+            (grid_y * cell_size, (grid_y + grid_height) * cell_size),
+        )
+
+        # Clip every ray to the grid's bounds
+        enter = np.zeros(len(rays))
+        exit = np.ones(len(rays))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            for axis, (low, high) in enumerate(bounds):
+                origin = origins[:, axis]
+                ray = rays[:, axis]
+                t1 = (low - origin) / ray
+                t2 = (high - origin) / ray
+                inside = (origin >= low) & (origin <= high)
+                t_min = np.where(ray == 0, np.where(inside, -np.inf, np.inf), t1)
+                t_max = np.where(ray == 0, np.where(inside, np.inf, -np.inf), t2)
+                t_min, t_max = np.minimum(t_min, t_max), np.maximum(t_min, t_max)
+                enter = np.maximum(enter, t_min)
+                exit = np.minimum(exit, t_max)
+
+        # Where every ray crosses a grid line between entering and exiting
+        ray_index = [np.flatnonzero(enter <= exit)]
+        t = [enter[ray_index[0]], exit[ray_index[0]]]
+        ray_index.append(ray_index[0])
+        for axis in range(2):
+            origin = origins[:, axis]
+            ray = rays[:, axis]
+            start = origin + ray * enter
+            end = origin + ray * exit
+            first = np.ceil(np.minimum(start, end) / cell_size)
+            last = np.floor(np.maximum(start, end) / cell_size)
+            counts = np.where((enter <= exit) & (ray != 0), last - first + 1, 0)
+            counts = np.maximum(counts, 0).astype(np.intp)
+            crossing_index = np.repeat(np.arange(len(rays)), counts)
+            local = np.arange(counts.sum()) - np.repeat(
+                np.cumsum(counts) - counts, counts
+            )
+            lines = (first[crossing_index] + local) * cell_size
+            t.append((lines - origin[crossing_index]) / ray[crossing_index])
+            ray_index.append(crossing_index)
+
+        # The cells are found at the middle of each pair of crossings
+        t = np.concatenate(t)
+        ray_index = np.concatenate(ray_index)
+        order = np.lexsort((t, ray_index))
+        t = t[order]
+        ray_index = ray_index[order]
+        same_ray = ray_index[1:] == ray_index[:-1]
+        ray_index = ray_index[1:][same_ray]
+        middle = (t[1:][same_ray] + t[:-1][same_ray]) / 2
+        points = origins[ray_index] + rays[ray_index] * middle[:, np.newaxis]
+
+        cell_x = np.floor(points[:, 0] / cell_size).astype(np.intp) - grid_x
+        cell_y = np.floor(points[:, 1] / cell_size).astype(np.intp) - grid_y
+        np.clip(cell_x, 0, grid_width - 1, out=cell_x)
+        np.clip(cell_y, 0, grid_height - 1, out=cell_y)
+        return ray_index, cell_x + cell_y * grid_width
+
+    def cast(
+        self,
+        origins: Union[Tuple[float, float], np.ndarray],
+        targets: np.ndarray,
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Casts rays from origins to targets.
+
+        Parameters:
+            origins: The starting position of every ray with the shape
+                (M, 2), or a single starting position.
+            targets: The end position of every ray with the shape (M, 2).
+
+        Returns:
+            The hit points with the shape (M, 2) (the target if no
+            collision was detected), the distance to each hit point
+            and the index of the wall each ray hit (-1 if none).
+
+        """
+        targets = np.asarray(targets, dtype=np.float64).reshape(-1, 2)
+        origins = np.broadcast_to(np.asarray(origins, dtype=np.float64), targets.shape)
+        rays = targets - origins
+        fractions = np.ones(len(rays))
+        hit_walls = np.full(len(rays), -1, dtype=np.intp)
+
+        if len(self._walls) and len(rays):
+            ray_index, cells = self._get_ray_cells(origins, rays)
+
+            # Every (ray, wall) pair of the cells each ray passes through
+            starts = self._cell_starts[cells]
+            counts = self._cell_starts[cells + 1] - starts
+            pair_ray = np.repeat(ray_index, counts)
+            local = np.arange(counts.sum()) - np.repeat(
+                np.cumsum(counts) - counts, counts
+            )
+            pair_wall = self._cell_walls[np.repeat(starts, counts) + local]
+
+            pair_fractions = get_ray_fractions(
+                origins[pair_ray], rays[pair_ray], self._walls[pair_wall]
+            )
+            hit = pair_fractions <= 1
+            pair_ray = pair_ray[hit]
+            pair_wall = pair_wall[hit]
+            pair_fractions = pair_fractions[hit]
+            np.minimum.at(fractions, pair_ray, pair_fractions)
+
+            closest = pair_fractions == fractions[pair_ray]
+            hit_walls[pair_ray[closest]] = pair_wall[closest]
+
+        distances = np.hypot(rays[:, 0], rays[:, 1]) * fractions
+        return origins + rays * fractions[:, np.newaxis], distances, hit_walls
+
+    def cast_fan(
+        self,
+        origin: Tuple[float, float],
+        length: float,
+        rays: int = 360,
+        direction: float = 0,
+        spread: float = 360,
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Casts rays spread evenly around an origin, such as for line of sight.
+
+        Parameters:
+            origin: The starting position of every ray.
+            length: The length of every ray.
+            rays: The amount of rays.
+            direction: The fan's direction in degrees.
+            spread: The fan's angle width in degrees.
+
+        Returns:
+            The same as RaycastWorld.cast().
+
+        """
+        start = math.radians(direction - spread / 2)
+        end = math.radians(direction + spread / 2)
+        angles = np.linspace(start, end, rays, endpoint=spread < 360)
+        origin = np.asarray(origin, dtype=np.float64)
+        targets = origin + np.stack((np.cos(angles), np.sin(angles)), 1) * length
+        return self.cast(origin, targets)
+
+    def has_line_of_sight(
+        self,
+        origins: Union[Tuple[float, float], np.ndarray],
+        targets: np.ndarray,
+    ) -> np.ndarray:
+        """Returns whether no wall is between each origin and target.
+
+        Parameters:
+            origins: The starting position of every ray with the shape
+                (M, 2), or a single starting position.
+            targets: The end position of every ray with the shape (M, 2).
+
+        """
+        return self.cast(origins, targets)[2] == -1
@@ -2,20 +2,25 @@
 SakuyaEngine (c) 2020-2021 Andrew Hong
 This code is licensed under GNU LESSER GENERAL PUBLIC LICENSE (see LICENSE for details)
 """
-from typing import List
+from typing import List, Type, Union
 
 import pygame
+import numpy as np
 import os
 import sys
 import inspect
 import importlib
 import logging
 
+from .bullets import collide_hitbox_bounds
 from .camera import Camera
-from .entity import Entity
+from .entity import Entity, LightEntity
 from .errors import EntityNotInScene
 from .events import EventSystem
 from .clock import Clock
+from .effects import BaseEffect, EffectPool
+from .math import merge_rects
+from .spatial_hash import SpatialHash
 
 __all__ = ["Scene"]
 
@@ -35,10 +40,21 @@ class Scene:
         self.client = client
         self.entities = []
         self.bullets = []
+        self.bullet_pool = None
         self.particle_systems = []
         self.effects = []
+        self.effect_pools = {}  # Dict[Type[BaseEffect], EffectPool]
         self.scroll_bgs = []
         self.collision_rects = []
+        self.spatial_hash = SpatialHash()
+        self._spatial_hash_dirty = True
+        self.dirty_rect_mode = False
+        self.dirty_rects = []  # List[pygame.Rect]
+        self.dirty_rect_sources = []
+        self._redraw_all = True
+        self._draw_states = {}
+        self._dirty_camera_position = None
+        self._dirty_animated = False
         self.kwargs = kwargs
         logging.info("Creating clock")
         self.clock = Clock()
@@ -102,6 +118,39 @@ class Scene:
         """
         pass
 
+    def spawn_effect(
+        self, effect_type: Type[BaseEffect], *args, **kwargs
+    ) -> BaseEffect:
+        """Adds an effect recycled from Scene.effect_pools to Scene.effects.
+
+        The effect is returned to its pool once it is destroyed, so
+        references to it must not be kept. Effects appended to
+        Scene.effects directly are never recycled.
+
+        Parameters:
+            effect_type: The type of effect.
+            args: The effect's constructor arguments.
+            kwargs: The effect's constructor keyword arguments.
+
+        """
+        pool = self.effect_pools.get(effect_type)
+        if pool is None:
+            pool = EffectPool(effect_type)
+            self.effect_pools[effect_type] = pool
+
+        effect = pool.acquire(*args, **kwargs)
+        self.effects.append(effect)
+        return effect
+
+    def _remove_objects(self, objects: list, removed: list) -> None:
+        # Compacts the list in one pass. Objects added or removed by
+        # events during the frame are left alone.
+        if not removed:
+            return None
+
+        removed_ids = {id(obj) for obj in removed}
+        objects[:] = [obj for obj in objects if id(obj) not in removed_ids]
+
     def find_entities_by_name(self, name: str) -> List[Entity]:
         """Finds all registered entities in this scene
 
@@ -116,29 +165,79 @@ class Scene:
 
         return entities
 
+    def _get_spatial_hash_rect(self, entity: Entity) -> pygame.Rect:
+        # Covers both the hitbox and the center point used by test_collisions_point()
+        return entity.custom_hitbox.union(entity.rect)
+
+    def update_spatial_hash(self) -> None:
+        """Updates Scene.spatial_hash with every entity and bullet.
+
+        This is called by the first collision query after the
+        entities may have moved, so it rarely has to be called manually.
+
+        """
+        objects = self.entities[:]
+        objects.extend(self.bullets)
+        self.spatial_hash.sync(objects, self._get_spatial_hash_rect)
+        self._spatial_hash_dirty = False
+
+    def invalidate_spatial_hash(self) -> None:
+        """Makes the next collision query update Scene.spatial_hash.
+
+        This is called at the start of every frame and by
+        advance_frame(). Call it after moving entities mid-frame
+        outside of advance_frame().
+
+        """
+        self._spatial_hash_dirty = True
+
+    def _remove_from_spatial_hash(self, objects: List[Entity]) -> None:
+        if not self._spatial_hash_dirty:
+            for obj in objects:
+                self.spatial_hash.remove(obj)
+
+    def _get_spatial_hash(self) -> SpatialHash:
+        spatial_hash = self.spatial_hash
+        count = len(self.entities) + len(self.bullets)
+        if self._spatial_hash_dirty or len(spatial_hash) != count:
+            self.update_spatial_hash()
+
+        return spatial_hash
+
+    def _get_collision_candidates(
+        self, entity: Entity, rect: pygame.Rect
+    ) -> List[Entity]:
+        spatial_hash = self._get_spatial_hash()
+        if entity not in spatial_hash:
+            # Entities may have been swapped without changing the count
+            self.update_spatial_hash()
+            if entity not in spatial_hash:
+                raise EntityNotInScene
+
+        candidates = spatial_hash.query_rect(rect)
+        candidates.remove(entity)
+        return candidates
+
     def test_collisions_rect(
         self, entity: Entity, ignore_tag: str = None
     ) -> List[Entity]:
         """Returns a list of entities that collides with an entity using pygame.Rect(s).
 
+        Only entities in nearby Scene.spatial_hash cells are tested.
+        Bullets in Scene.bullet_pool are not tested, use
+        test_collisions_bullets() for them.
+
         Parameters:
             entity: The entity to compare with.
             ignore_tag: Tag to ignore.
 
         """
-        entities = self.entities[:]
-        entities.extend(self.bullets[:])
-        try:
-            entities.remove(entity)
-        except:
-            raise EntityNotInScene
+        hitbox = entity.custom_hitbox
+        candidates = self._get_collision_candidates(entity, hitbox)
 
         collided = []
-        for e in entities:
-            if (
-                entity.custom_hitbox.colliderect(e.custom_hitbox)
-                and ignore_tag not in e.tags
-            ):
+        for e in candidates:
+            if hitbox.colliderect(e.custom_hitbox) and ignore_tag not in e.tags:
                 collided.append(e)
 
         return collided
@@ -150,28 +249,242 @@ class Scene:
         an entity using points. The entity's hitbox will
         still be a pygame.Rect.
 
+        Only entities in nearby Scene.spatial_hash cells are tested.
+        Bullets in Scene.bullet_pool are not tested, use
+        test_collisions_bullets() for them.
+
         Parameters:
             entity: The entity to compare with.
             ignore_tag: Tag to ignore.
 
         """
-        entities = self.entities[:]
-        entities.extend(self.bullets[:])
-        try:
-            entities.remove(entity)
-        except:
-            raise EntityNotInScene
+        hitbox = entity.custom_hitbox
+        candidates = self._get_collision_candidates(entity, hitbox)
 
         collided = []
-        for e in entities:
+        for e in candidates:
             if (
-                entity.custom_hitbox.collidepoint(e.position + e.center_offset)
+                hitbox.collidepoint(e.position + e.center_offset)
                 and ignore_tag not in e.tags
             ):
                 collided.append(e)
 
         return collided
 
+    def query_rect(self, rect: pygame.Rect, ignore_tag: str = None) -> List[Entity]:
+        """Returns a list of entities whose hitbox collides with a pygame.Rect.
+
+        Bullets in Scene.bullet_pool are not included, use
+        test_collisions_bullets() for them.
+
+        Parameters:
+            rect: The area to search.
+            ignore_tag: Tag to ignore.
+
+        """
+        collided = []
+        for e in self._get_spatial_hash().query_rect(rect):
+            if rect.colliderect(e.custom_hitbox) and ignore_tag not in e.tags:
+                collided.append(e)
+
+        return collided
+
+    def query_radius(
+        self, position: pygame.Vector2, radius: float, ignore_tag: str = None
+    ) -> List[Entity]:
+        """Returns a list of entities whose hitbox collides with a circle.
+
+        Bullets in Scene.bullet_pool are not included, use
+        test_collisions_bullets() for them.
+
+        Parameters:
+            position: The circle's center.
+            radius: The circle's radius.
+            ignore_tag: Tag to ignore.
+
+        """
+        x, y = position
+        radius_squared = radius**2
+        collided = []
+        for e in self._get_spatial_hash().query_radius(position, radius):
+            if ignore_tag in e.tags:
+                continue
+
+            hitbox = e.custom_hitbox
+            dist_x = max(hitbox.left - x, 0, x - hitbox.right)
+            dist_y = max(hitbox.top - y, 0, y - hitbox.bottom)
+            if dist_x**2 + dist_y**2 <= radius_squared:
+                collided.append(e)
+
+        return collided
+
+    def test_collisions_bullets(
+        self,
+        entities: Union[Entity, LightEntity, List[Union[Entity, LightEntity]]],
+        ignore_tag: str = None,
+        graze_radius: float = None,
+    ) -> Union[dict, List[dict]]:
+        """Tests one or many entities against every bullet at once
+        using pygame.Rect(s).
+
+        Both Scene.bullets and Scene.bullet_pool are tested.
+
+        Parameters:
+            entities: The entity or entities to compare with.
+            ignore_tag: Tag to ignore.
+            graze_radius: If set, bullets within this distance of an
+                entity's hitbox that did not collide with it are
+                returned as grazes.
+
+        Returns:
+            A dict for each entity with the keys "bullets" and
+            "grazed" (lists of Bullet) along with "pool_hit" and
+            "pool_graze" (Scene.bullet_pool row indices). A single dict
+            is returned if a single entity was passed in.
+
+        """
+        # Any object with a hitbox, such as a LightEntity, is a single entity
+        single = hasattr(entities, "custom_hitbox")
+        if single:
+            entities = [entities]
+
+        hitboxes = [e.custom_hitbox for e in entities]
+
+        bullets = [b for b in self.bullets if ignore_tag not in b.tags]
+        bounds = np.array(
+            [
+                (h.left, h.top, h.right, h.bottom)
+                for h in (b.custom_hitbox for b in bullets)
+            ],
+            dtype=np.float64,
+        ).reshape(-1, 4)
+        hits, grazes = collide_hitbox_bounds(
+            hitboxes, *bounds.T, graze_radius=graze_radius
+        )
+
+        pool_results = None
+        if self.bullet_pool is not None:
+            pool_results = self.bullet_pool.collide(
+                hitboxes, ignore_tag=ignore_tag, graze_radius=graze_radius
+            )
+
+        empty = np.zeros(0, dtype=np.intp)
+        results = []
+        for i, entity in enumerate(entities):
+            result = {
+                "entity": entity,
+                "bullets": [bullets[b] for b in np.flatnonzero(hits[i])],
+                "grazed": [],
+                "pool_hit": empty,
+                "pool_graze": empty,
+            }
+            if grazes is not None:
+                result["grazed"] = [bullets[b] for b in np.flatnonzero(grazes[i])]
+
+            if pool_results is not None:
+                pool_result = pool_results[i]
+                result["pool_hit"] = pool_result["hit"]
+                result["pool_graze"] = pool_result["graze"]
+                result["bullets"].extend(
+                    self.bullet_pool.get_bullets(pool_result["hit"])
+                )
+                result["grazed"].extend(
+                    self.bullet_pool.get_bullets(pool_result["graze"])
+                )
+
+            results.append(result)
+
+        if single:
+            return results[0]
+        return results
+
+    def mark_dirty(self, *rects: pygame.Rect) -> None:
+        """Marks regions of Scene.screen as changed.
+
+        Only used if Scene.dirty_rect_mode is True.
+
+        Parameters:
+            rects: The changed regions. If none are passed, the
+                whole screen will be redrawn.
+
+        """
+        if not rects:
+            self._redraw_all = True
+        self.dirty_rects.extend(pygame.Rect(r) for r in rects)
+
+    def update_dirty_rects(self) -> None:
+        """Marks the regions of every entity, bullet, effect and
+        dirty rect source that moved or changed since the last call.
+
+        This is called by advance_frame() if Scene.dirty_rect_mode is
+        True, and must be called after everything has been drawn.
+        Objects without a draw_state, particle systems, the bullet pool,
+        scrolling backgrounds and camera movement redraw the whole screen.
+
+        """
+        camera_position = (int(self.camera.position.x), int(self.camera.position.y))
+        if camera_position != self._dirty_camera_position:
+            self._dirty_camera_position = camera_position
+            self._redraw_all = True
+
+        # Redrawn for one more frame to erase what was last drawn
+        animated = bool(
+            self.scroll_bgs
+            or any(not hasattr(p, "__len__") or len(p) for p in self.particle_systems)
+            or (self.bullet_pool is not None and len(self.bullet_pool))
+        )
+        if animated or self._dirty_animated:
+            self._redraw_all = True
+        self._dirty_animated = animated
+
+        draw_states = {}
+        for objects, offset in (
+            (self.entities, camera_position),
+            (self.bullets, camera_position),
+            (self.effects, camera_position),
+            (self.dirty_rect_sources, (0, 0)),
+        ):
+            for obj in objects:
+                draw_state = getattr(obj, "draw_state", None)
+                if draw_state is None:
+                    self._redraw_all = True
+                    continue
+
+                rect, key = draw_state
+                rect = rect.move(offset).inflate(2, 2)
+                key = (offset, key)
+                draw_states[id(obj)] = (obj, rect, key)
+
+                previous = self._draw_states.pop(id(obj), None)
+                if previous is None:
+                    self.dirty_rects.append(rect)
+                elif previous[2] != key:
+                    self.dirty_rects.append(previous[1])
+                    self.dirty_rects.append(rect)
+
+        # Objects that are no longer drawn
+        for obj, rect, key in self._draw_states.values():
+            self.dirty_rects.append(rect)
+
+        self._draw_states = draw_states
+
+    def pop_dirty_rects(self) -> Union[List[pygame.Rect], None]:
+        """Returns and clears the merged regions of Scene.screen that changed.
+
+        Returns:
+            None if Scene.dirty_rect_mode is False or the whole screen
+            must be redrawn.
+
+        """
+        rects = None
+        if self.dirty_rect_mode and not self._redraw_all:
+            screen_rect = self.screen.get_rect()
+            rects = merge_rects(r.clip(screen_rect) for r in self.dirty_rects)
+
+        self.dirty_rects = []
+        self._redraw_all = False
+        return rects
+
     def draw_scroll_bg(self) -> None:
         for bg in self.scroll_bgs:
             bg_rect = bg.sprite.get_rect()
@@ -201,11 +514,18 @@ class Scene:
 
         """
         delta_time = self.client.delta_time
+        profiler = self.client.profiler
+        profiler.begin("advance_frame")
+
+        if self.dirty_rect_mode:
+            self.update_dirty_rects()
 
         self.camera.update(delta_time)
 
+        profiler.begin("advance_frame/particles")
         for p in self.particle_systems:
             p.update(delta_time)
+        profiler.end("advance_frame/particles")
 
         for bg in self.scroll_bgs:
             bg_rect = bg.sprite.get_rect()
@@ -219,24 +539,57 @@ class Scene:
             if bg.position.y < 0:
                 bg.position.y = bg_rect.height
 
+        profiler.begin("advance_frame/entities")
+        # Once a query from on_update() has synced the hash, every object
+        # is moved in it right after it moves so later queries stay exact
+        self._spatial_hash_dirty = True
+        spatial_hash = self.spatial_hash
+        get_rect = self._get_spatial_hash_rect
+        destroyed = []
         for entity in self.entities[:]:
             entity.advance_frame(delta_time, collision_rects=self.collision_rects)
+            if not self._spatial_hash_dirty:
+                spatial_hash.insert(entity, get_rect(entity))
             entity.on_update(self)
             if entity._destroy_queue:
                 entity.on_destroy(self)
-                self.entities.remove(entity)
+                destroyed.append(entity)
+        self._remove_objects(self.entities, destroyed)
+        self._remove_from_spatial_hash(destroyed)
+        profiler.end("advance_frame/entities")
 
+        profiler.begin("advance_frame/bullets")
+        destroyed = []
         for bullet in self.bullets[:]:
             bullet.advance_frame(delta_time)
-            bullet.on_update()
+            if not self._spatial_hash_dirty:
+                spatial_hash.insert(bullet, get_rect(bullet))
+            bullet.on_update(self)
             if bullet._destroy_queue:
-                bullet.on_destroy()
-                self.bullets.remove(bullet)
+                bullet.on_destroy(self)
+                destroyed.append(bullet)
+        self._remove_objects(self.bullets, destroyed)
+        self._remove_from_spatial_hash(destroyed)
+
+        if self.bullet_pool is not None:
+            self.bullet_pool.update(delta_time, scene=self)
+        profiler.end("advance_frame/bullets")
 
+        profiler.begin("advance_frame/effects")
+        destroyed = []
         for ef in self.effects[:]:
             ef.update(delta_time)
             if ef._destroy_queue:
-                self.effects.remove(ef)
+                destroyed.append(ef)
+        self._remove_objects(self.effects, destroyed)
+
+        for ef in destroyed:
+            pool = self.effect_pools.get(type(ef))
+            if pool is not None:
+                pool.release(ef)
+        profiler.end("advance_frame/effects")
+
+        profiler.end("advance_frame")
 
 
 class SceneManager:
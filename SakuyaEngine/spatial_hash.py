@@ -0,0 +1,180 @@
+"""
+SakuyaEngine (c) 2020-2021 Andrew Hong
+This code is licensed under GNU LESSER GENERAL PUBLIC LICENSE (see LICENSE for details)
+"""
+from typing import Any, Callable, Iterable, List, Tuple
+
+import pygame
+
+__all__ = ["SpatialHash"]
+
+
+class SpatialHash:
+    def __init__(self, cell_size: int = 32) -> None:
+        """A uniform grid used as a broadphase for collision queries.
+
+        Objects are stored in every cell their rect overlaps. Moving an
+        object only touches the hash if it has moved into different cells.
+
+        Parameters:
+            cell_size: The width and height of each cell in pixels.
+
+        """
+        self._cell_size = cell_size
+        self._cells = {}  # Dict[Tuple[int, int], Dict[Any, None]]
+        self._objects = {}  # Dict[Any, Tuple[int, int, int, int]]
+        self.reset_stats()
+
+    @property
+    def cell_size(self) -> int:
+        return self._cell_size
+
+    @cell_size.setter
+    def cell_size(self, value: int) -> None:
+        self._cell_size = value
+        self.clear()
+
+    def __len__(self) -> int:
+        return len(self._objects)
+
+    def __contains__(self, obj: Any) -> bool:
+        return obj in self._objects
+
+    def reset_stats(self) -> None:
+        """Resets the query counters in SpatialHash.stats.
+
+        stats keys:
+            queries: Total amount of queries.
+            cells_touched: Total amount of cells looked up by queries.
+            candidates: Total amount of objects returned by queries.
+            last_cells_touched: Cells looked up by the last query.
+            last_candidates: Objects returned by the last query.
+
+        """
+        self.stats = {
+            "queries": 0,
+            "cells_touched": 0,
+            "candidates": 0,
+            "last_cells_touched": 0,
+            "last_candidates": 0,
+        }
+
+    def _cell_range(self, rect: pygame.Rect) -> Tuple[int, int, int, int]:
+        size = self._cell_size
+        left = rect.left // size
+        top = rect.top // size
+        right = max(left, (rect.right - 1) // size)
+        bottom = max(top, (rect.bottom - 1) // size)
+        return left, top, right, bottom
+
+    def clear(self) -> None:
+        self._cells = {}
+        self._objects = {}
+
+    def insert(self, obj: Any, rect: pygame.Rect) -> None:
+        """Inserts or moves an object.
+
+        Parameters:
+            obj: The object to store.
+            rect: The object's bounds.
+
+        """
+        cell_range = self._cell_range(rect)
+        old_range = self._objects.get(obj)
+        if old_range == cell_range:
+            return None
+
+        if old_range is not None:
+            self._remove_from_cells(obj, old_range)
+
+        left, top, right, bottom = cell_range
+        cells = self._cells
+        for x in range(left, right + 1):
+            for y in range(top, bottom + 1):
+                cell = cells.get((x, y))
+                if cell is None:
+                    cell = cells[(x, y)] = {}
+                cell[obj] = None
+
+        self._objects[obj] = cell_range
+
+    def remove(self, obj: Any) -> None:
+        """Removes an object.
+
+        Parameters:
+            obj: The object to remove.
+
+        """
+        cell_range = self._objects.pop(obj, None)
+        if cell_range is not None:
+            self._remove_from_cells(obj, cell_range)
+
+    def _remove_from_cells(self, obj: Any, cell_range: Tuple[int, int, int, int]):
+        left, top, right, bottom = cell_range
+        cells = self._cells
+        for x in range(left, right + 1):
+            for y in range(top, bottom + 1):
+                cell = cells[(x, y)]
+                del cell[obj]
+                if not cell:
+                    del cells[(x, y)]
+
+    def sync(self, objects: Iterable[Any], get_rect: Callable[[Any], pygame.Rect]):
+        """Updates every object and removes objects that are no longer present.
+
+        Parameters:
+            objects: Every object that should be stored.
+            get_rect: Returns the bounds of an object.
+
+        """
+        present = {}
+        for obj in objects:
+            self.insert(obj, get_rect(obj))
+            present[obj] = None
+
+        for obj in [o for o in self._objects if o not in present]:
+            self.remove(obj)
+
+    def query_rect(self, rect: pygame.Rect) -> List[Any]:
+        """Returns every object stored in the cells overlapping a rect.
+
+        This is a broadphase, the returned objects may not collide.
+
+        Parameters:
+            rect: The area to search.
+
+        """
+        left, top, right, bottom = self._cell_range(rect)
+        cells = self._cells
+        found = {}
+        cells_touched = 0
+        for x in range(left, right + 1):
+            for y in range(top, bottom + 1):
+                cells_touched += 1
+                cell = cells.get((x, y))
+                if cell is not None:
+                    found.update(cell)
+
+        stats = self.stats
+        stats["queries"] += 1
+        stats["cells_touched"] += cells_touched
+        stats["candidates"] += len(found)
+        stats["last_cells_touched"] = cells_touched
+        stats["last_candidates"] = len(found)
+
+        return list(found)
+
+    def query_radius(self, position: pygame.Vector2, radius: float) -> List[Any]:
+        """Returns every object stored in the cells overlapping a circle's bounds.
+
+        This is a broadphase, the returned objects may not collide.
+
+        Parameters:
+            position: The circle's center.
+            radius: The circle's radius.
+
+        """
+        rect = pygame.Rect(
+            position[0] - radius, position[1] - radius, radius * 2 + 1, radius * 2 + 1
+        )
+        return self.query_rect(rect)
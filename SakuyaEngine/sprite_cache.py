@@ -0,0 +1,141 @@
+"""
+SakuyaEngine (c) 2020-2021 Andrew Hong
+This code is licensed under GNU LESSER GENERAL PUBLIC LICENSE (see LICENSE for details)
+"""
+from collections import OrderedDict
+from typing import Tuple
+
+import weakref
+import pygame
+
+__all__ = ["RotationCache", "rotation_cache"]
+
+
+class RotationCache:
+    def __init__(self, max_size: int = 4096, angle_step: float = 1) -> None:
+        """A bounded LRU cache of rotated and scaled surfaces.
+
+        Angles are quantized to angle_step so that many sprites sharing
+        one source surface reuse the same rotated surfaces.
+
+        Source surfaces are only weakly referenced, their cached
+        surfaces are removed once they are garbage collected or passed
+        to discard().
+
+        Parameters:
+            max_size: The maximum amount of cached surfaces.
+            angle_step: The angle quantization step in degrees.
+
+        """
+        self.max_size = max_size
+        self._angle_step = angle_step
+        self._surfaces = OrderedDict()
+        self._sources = {}  # Dict[int, Tuple[weakref.ref, Set[tuple]]]
+        self.reset_stats()
+
+    @property
+    def angle_step(self) -> float:
+        return self._angle_step
+
+    @angle_step.setter
+    def angle_step(self, value: float) -> None:
+        self._angle_step = value
+        self.clear()
+
+    def __len__(self) -> int:
+        return len(self._surfaces)
+
+    def reset_stats(self) -> None:
+        """Resets the counters in RotationCache.stats.
+
+        stats keys:
+            hits: Lookups that returned a cached surface.
+            misses: Lookups that had to transform a surface.
+            evictions: Surfaces removed to stay within max_size.
+
+        """
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def clear(self) -> None:
+        self._surfaces.clear()
+        self._sources.clear()
+
+    def _discard_id(self, source_id: int) -> None:
+        source = self._sources.pop(source_id, None)
+        if source is not None:
+            for key in source[1]:
+                del self._surfaces[key]
+
+    def discard(self, surface: pygame.Surface) -> None:
+        """Removes every cached version of a source surface, such as
+        when its sprite sheet is unloaded.
+
+        Parameters:
+            surface: The source surface.
+
+        """
+        self._discard_id(id(surface))
+
+    def quantize(self, angle: float) -> float:
+        """Returns the cached angle closest to an angle.
+
+        Parameters:
+            angle: Angle in degrees.
+
+        """
+        step = self._angle_step
+        return round(angle / step) * step % 360
+
+    def get(
+        self,
+        surface: pygame.Surface,
+        angle: float,
+        scale: Tuple[float, float] = (1, 1),
+    ) -> pygame.Surface:
+        """Returns a scaled and rotated version of a surface.
+
+        The returned surface is shared and must not be modified.
+
+        Parameters:
+            surface: The source surface.
+            angle: Counterclockwise angle in degrees.
+            scale: The horizontal and vertical scale.
+
+        """
+        angle = self.quantize(angle)
+        source_id = id(surface)
+        key = (source_id, angle, scale[0], scale[1])
+        surfaces = self._surfaces
+
+        out = surfaces.get(key)
+        if out is not None:
+            surfaces.move_to_end(key)
+            self.stats["hits"] += 1
+            return out
+
+        self.stats["misses"] += 1
+        out = surface
+        if scale[0] != 1 or scale[1] != 1:
+            width, height = surface.get_size()
+            out = pygame.transform.scale(out, (scale[0] * width, scale[1] * height))
+        out = pygame.transform.rotate(out, angle)
+
+        source = self._sources.get(source_id)
+        if source is None:
+            ref = weakref.ref(surface, lambda r: self._discard_id(source_id))
+            source = self._sources[source_id] = (ref, set())
+        source[1].add(key)
+
+        surfaces[key] = out
+        if len(surfaces) > self.max_size:
+            old_key, _ = surfaces.popitem(last=False)
+            old_keys = self._sources[old_key[0]][1]
+            old_keys.discard(old_key)
+            if not old_keys:
+                del self._sources[old_key[0]]
+            self.stats["evictions"] += 1
+
+        return out
+
+
+rotation_cache = RotationCache()
@@ -2,9 +2,12 @@
 SakuyaEngine // GameDen // GameDen Rewrite (c) 2020-2021 Andrew Hong
 This code is licensed under GNU LESSER GENERAL PUBLIC LICENSE (see LICENSE for details)
 """
-from typing import Tuple
+from collections import OrderedDict
+from typing import Dict, List, Tuple
 import pygame
 
+from .atlas import TextureAtlas
+
 ALPHABET_CHARS = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
 NUMBER_CHARS = "1234567890"
 SPECIAL_CHARS = ",./;'[]\\-=<>?:\"{}|!@#$%^&*()"
@@ -22,13 +25,28 @@ class Font:
         alphabet_path: str = None,
         numbers_path: str = None,
         special_path: str = None,
+        atlas: TextureAtlas = None,
+        cache_size: int = 256,
     ) -> None:
         """Initialize Font object.
 
         Warning: The height for each image should all be the same.
 
+        Parameters:
+            alphabet_path: Path to the image of the letters.
+            numbers_path: Path to the image of the numbers.
+            special_path: Path to the image of the special characters.
+            atlas: If set, the glyphs are copied into this atlas.
+            cache_size: The maximum amount of texts cached by text(),
+                and of colors whose tinted glyphs are cached.
+
         """
         self.database = {}
+        self.atlas = atlas
+        self.cache_size = cache_size
+        self._texts = OrderedDict()
+        self._tinted_glyphs = OrderedDict()  # OrderedDict[color, Dict[str, Surface]]
+        self.reset_stats()
         self.alphabet_path = alphabet_path
         self.numbers_path = numbers_path
         self.special_path = special_path
@@ -45,6 +63,11 @@ class Font:
             self._special_surface = pygame.image.load(self.special_path)
             self._iterate_font_surf(self._special_surface, SPECIAL_CHARS)
 
+        if atlas is not None:
+            chars = list(self.database.keys())
+            glyphs = atlas.add_many(list(self.database.values()))
+            self.database = dict(zip(chars, glyphs))
+
     def _iterate_font_surf(self, surface: pygame.Surface, chars: str) -> None:
         start = 0
         width = 0
@@ -65,40 +88,179 @@ class Font:
             if char == len(chars):
                 break
 
-    def text(
-        self,
-        text,
-        dist: int = 1,
-        space_dist: int = 2,
-        color: Tuple[int, int, int] = (255, 255, 255),
+    def reset_stats(self) -> None:
+        """Resets the counters in Font.stats.
+
+        stats keys:
+            hits: text() calls that returned a cached surface.
+            misses: text() calls that had to render the text.
+            evictions: Texts removed to stay within cache_size.
+            glyph_evictions: Colors whose tinted glyphs were removed
+                to stay within cache_size.
+
+        """
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0, "glyph_evictions": 0}
+
+    def clear(self) -> None:
+        """Clears the cached texts and tinted glyphs."""
+        self._texts.clear()
+        self._tinted_glyphs.clear()
+
+    def _get_tinted_glyphs(
+        self, color: Tuple[int, int, int]
+    ) -> Dict[str, pygame.Surface]:
+        tinted_glyphs = self._tinted_glyphs
+        glyphs = tinted_glyphs.get(color)
+        if glyphs is not None:
+            tinted_glyphs.move_to_end(color)
+            return glyphs
+
+        glyphs = tinted_glyphs[color] = {}
+        if len(tinted_glyphs) > self.cache_size:
+            tinted_glyphs.popitem(last=False)
+            self.stats["glyph_evictions"] += 1
+        return glyphs
+
+    def get_glyph(
+        self, char: str, color: Tuple[int, int, int] = (255, 255, 255)
     ) -> pygame.Surface:
+        """Returns a character's image with its black pixels replaced
+        by a color.
+
+        The returned surface is shared and must not be modified.
+
+        Parameters:
+            char: The character.
+            color: The character's color.
+
+        """
+        color = tuple(color)
+        glyphs = self._get_tinted_glyphs(color)
+        glyph = glyphs.get(char)
+        if glyph is None:
+            glyph = self.database[char].copy()
+            pixel_array = pygame.PixelArray(glyph)  # lgtm [py/call/wrong-arguments]
+            pixel_array.replace((0, 0, 0), color)
+            pixel_array.close()
+            glyphs[char] = glyph
+
+        return glyph
+
+    def get_size(
+        self, text: str, dist: int = 1, space_dist: int = 2
+    ) -> Tuple[int, int]:
+        """Returns the size of the surface text() would return.
+
+        Parameters:
+            text: The text.
+            dist: The distance between characters in pixels.
+            space_dist: The width of a space in pixels.
+
+        """
+        database = self.database
         width = 0
-        height = []
-        for char in list(text):
+        height = 0
+        for char in text:
             if char == " ":
                 width += space_dist
                 continue
 
-            height.append(self.database[char].get_height())
-            width += self.database[char].get_width() + dist
+            glyph = database[char]
+            height = max(height, glyph.get_height())
+            width += glyph.get_width() + dist
         width -= dist
 
-        self.database[" "] = pygame.Surface(
-            (space_dist, max(height)), pygame.SRCALPHA, 32
-        )
-        surf = pygame.Surface((width, max(height)), pygame.SRCALPHA, 32)
+        return max(width, 0), height
 
-        current_width = 0
-        for char in list(text):
-            surf.blit(self.database[char], (current_width, 0))
+    def _get_blits(
+        self,
+        text: str,
+        position: Tuple[int, int],
+        dist: int,
+        space_dist: int,
+        color: Tuple[int, int, int],
+    ) -> List[Tuple[pygame.Surface, Tuple[int, int]]]:
+        x, y = position
+        glyphs = self._get_tinted_glyphs(tuple(color))
+        blits = []
+        for char in text:
             if char == " ":
-                char_dist = 0
-            elif char != " ":
-                char_dist = dist
+                x += space_dist
+                continue
+
+            glyph = glyphs.get(char)
+            if glyph is None:
+                glyph = self.get_glyph(char, color)
+            blits.append((glyph, (x, y)))
+            x += glyph.get_width() + dist
+
+        return blits
+
+    def render_into(
+        self,
+        surface: pygame.Surface,
+        position: Tuple[int, int],
+        text: str,
+        dist: int = 1,
+        space_dist: int = 2,
+        color: Tuple[int, int, int] = (255, 255, 255),
+    ) -> pygame.Rect:
+        """Draws text directly onto a surface without creating
+        a surface for the text.
+
+        Parameters:
+            surface: The surface to draw on.
+            position: The text's top left corner.
+            text: The text.
+            dist: The distance between characters in pixels.
+            space_dist: The width of a space in pixels.
+            color: The color replacing the characters' black pixels.
+
+        Returns:
+            The area of the text.
+
+        """
+        surface.blits(self._get_blits(text, position, dist, space_dist, color), False)
+        return pygame.Rect(position, self.get_size(text, dist, space_dist))
+
+    def text(
+        self,
+        text,
+        dist: int = 1,
+        space_dist: int = 2,
+        color: Tuple[int, int, int] = (255, 255, 255),
+    ) -> pygame.Surface:
+        """Returns a surface with text drawn on it.
 
-            current_width += self.database[char].get_width() + char_dist
+        Surfaces are cached by their text, spacing and color, and a
+        copy of the cached surface is returned. render_into() avoids
+        the copy.
+
+        Parameters:
+            text: The text.
+            dist: The distance between characters in pixels.
+            space_dist: The width of a space in pixels.
+            color: The color replacing the characters' black pixels.
+
+        """
+        key = (text, dist, space_dist, tuple(color))
+        texts = self._texts
+
+        surf = texts.get(key)
+        if surf is not None:
+            texts.move_to_end(key)
+            self.stats["hits"] += 1
+            return surf.copy()
+
+        self.stats["misses"] += 1
+        surf = pygame.Surface(
+            self.get_size(text, dist, space_dist), pygame.SRCALPHA, 32
+        )
+        surf.blits(self._get_blits(text, (0, 0), dist, space_dist, color), False)
 
-        pixel_array = pygame.PixelArray(surf)  # lgtm [py/call/wrong-arguments]
-        pixel_array.replace((0, 0, 0), color)
+        texts[key] = surf
+        if len(texts) > self.cache_size:
+            texts.popitem(last=False)
+            self.stats["evictions"] += 1
 
-        return surf
+        return surf.copy()
@@ -2,11 +2,25 @@
 SakuyaEngine (c) 2020-2021 Andrew Hong
 This code is licensed under GNU LESSER GENERAL PUBLIC LICENSE (see LICENSE for details)
 """
+from collections import OrderedDict
+
+import math
 import pygame
+import numpy as np
+
+from typing import Callable, List, Tuple, Union, Iterable
 
-from typing import List
+from .atlas import TextureAtlas
 
-__all__ = ["split_image", "TileSet", "TileMap"]
+__all__ = [
+    "split_image",
+    "premultiply_alpha",
+    "TileSet",
+    "ChunkedLayer",
+    "TileMap",
+    "TileCollisions",
+    "merge_tiles",
+]
 
 
 def crop_tile_image(
@@ -29,7 +43,10 @@ def crop_tile_image(
 
 
 def split_image(
-    image: pygame.Surface, px_width: int, px_height: int
+    image: pygame.Surface,
+    px_width: int,
+    px_height: int,
+    atlas: TextureAtlas = None,
 ) -> List[pygame.Surface]:
     """Split an image into a tileset.
 
@@ -38,6 +55,7 @@ def split_image(
         px_width: The tile's width in pixels.
         px_height: The tile's height in pixels.
         px_distance: The distance between every tile (WIP).
+        atlas: If set, the tiles are copied into this atlas.
 
     """
     rect = image.get_rect()
@@ -50,36 +68,606 @@ def split_image(
             tile_sprite = crop_tile_image(image, c, r, px_width, px_height)
             tiles.append(tile_sprite)
 
+    if atlas is not None:
+        tiles = atlas.add_many(tiles)
     return tiles
 
 
 class TileSet:
-    def __init__(self, image: pygame.Surface, px_width: int, px_height: int):
+    def __init__(
+        self,
+        image: pygame.Surface,
+        px_width: int,
+        px_height: int,
+        atlas: TextureAtlas = None,
+    ):
         self.image = image
         self.px_width = px_width
         self.px_height = px_height
 
-        self.tiles = split_image(self.image, self.px_width, self.px_height)
+        self.tiles = split_image(self.image, self.px_width, self.px_height, atlas=atlas)
+
+
+def premultiply_alpha(surface: pygame.Surface) -> pygame.Surface:
+    """Returns a copy of a surface with per-pixel alpha and its colors
+    multiplied by their alpha.
+
+    Premultiplied surfaces must be drawn with pygame.BLEND_PREMULTIPLIED.
+
+    Parameters:
+        surface: The surface to copy.
+
+    """
+    if surface.get_flags() & pygame.SRCALPHA:
+        out = surface.copy()
+    else:
+        out = pygame.Surface(surface.get_size(), pygame.SRCALPHA)
+        out.blit(surface, (0, 0))
+
+    colors = pygame.surfarray.pixels3d(out)
+    alpha = pygame.surfarray.pixels_alpha(out)
+    colors[...] = (colors + np.uint16(1)) * alpha[..., np.newaxis] >> 8
+    del colors, alpha
+    return out
+
+
+class ChunkedLayer:
+    dtype = np.int32
+    ndim = 2
+
+    def __init__(
+        self,
+        rows: int,
+        columns: int,
+        chunk_size: int = 16,
+        fill: int = -1,
+        read_chunk: Callable[[int, int], np.ndarray] = None,
+    ) -> None:
+        """A TileMap layer stored in chunks that are only allocated
+        once they are read from read_chunk() or changed.
+
+        Supports the indexing TileMap uses on its layers, a tile with
+        layer[row, column] and a block with layer[rows, columns] where
+        both are slices without steps. np.asarray(layer) returns every
+        tile as one array.
+
+        Parameters:
+            rows: The amount of tiles per column.
+            columns: The amount of tiles per row.
+            chunk_size: The width and height of a chunk in tiles.
+            fill: The tile of chunks that were never read or changed.
+            read_chunk: Returns the tiles of a chunk from its column and
+                row as a new (chunk_size, chunk_size) array. If None,
+                chunks are filled with fill.
+
+        """
+        self.shape = (rows, columns)
+        self.chunk_size = chunk_size
+        self.fill = fill
+        self.read_chunk = read_chunk
+        self.chunks = {}  # Dict[Tuple[int, int], np.ndarray]
+        self._fill_chunk = np.full((chunk_size, chunk_size), fill, dtype=np.int32)
+        self._fill_chunk.flags.writeable = False
+
+    def __array__(self, dtype=None) -> np.ndarray:
+        tiles = self[:, :]
+        if dtype is not None:
+            tiles = tiles.astype(dtype)
+        return tiles
+
+    def get_chunk(self, chunk_x: int, chunk_y: int) -> np.ndarray:
+        """Returns a chunk's tiles, allocating it if needed.
+
+        Parameters:
+            chunk_x: The chunk's column.
+            chunk_y: The chunk's row.
+
+        """
+        key = (chunk_x, chunk_y)
+        chunk = self.chunks.get(key)
+        if chunk is None:
+            if self.read_chunk is None:
+                chunk = self._fill_chunk.copy()
+            else:
+                chunk = np.asarray(self.read_chunk(chunk_x, chunk_y), dtype=np.int32)
+            self.chunks[key] = chunk
+        return chunk
+
+    def _peek_chunk(self, chunk_x: int, chunk_y: int) -> np.ndarray:
+        # Reading an empty chunk doesn't need to allocate it
+        chunk = self.chunks.get((chunk_x, chunk_y))
+        if chunk is None:
+            if self.read_chunk is None:
+                return self._fill_chunk
+            chunk = self.get_chunk(chunk_x, chunk_y)
+        return chunk
+
+    def _get_range(self, index: Union[int, slice], length: int) -> Tuple[int, int]:
+        if isinstance(index, slice):
+            start, stop, step = index.indices(length)
+            if step != 1:
+                raise IndexError("ChunkedLayer does not support slices with steps.")
+            return start, max(start, stop)
+
+        index = int(index)
+        if index < 0:
+            index += length
+        if not 0 <= index < length:
+            raise IndexError(f"Index {index} is out of bounds for size {length}.")
+        return index, index + 1
+
+    def _get_blocks(
+        self, first_row: int, last_row: int, first_column: int, last_column: int
+    ):
+        size = self.chunk_size
+        for chunk_y in range(first_row // size, (last_row - 1) // size + 1):
+            top = max(first_row, chunk_y * size)
+            bottom = min(last_row, (chunk_y + 1) * size)
+            for chunk_x in range(first_column // size, (last_column - 1) // size + 1):
+                left = max(first_column, chunk_x * size)
+                right = min(last_column, (chunk_x + 1) * size)
+                yield chunk_x, chunk_y, top, bottom, left, right
+
+    def __getitem__(self, key: Tuple[Union[int, slice], Union[int, slice]]):
+        row, column = key
+        rows, columns = self.shape
+        size = self.chunk_size
+        if not isinstance(row, slice) and not isinstance(column, slice):
+            row, _ = self._get_range(row, rows)
+            column, _ = self._get_range(column, columns)
+            chunk = self._peek_chunk(column // size, row // size)
+            return chunk[row % size, column % size]
+
+        first_row, last_row = self._get_range(row, rows)
+        first_column, last_column = self._get_range(column, columns)
+        out = np.empty((last_row - first_row, last_column - first_column), np.int32)
+        for chunk_x, chunk_y, top, bottom, left, right in self._get_blocks(
+            first_row, last_row, first_column, last_column
+        ):
+            chunk = self._peek_chunk(chunk_x, chunk_y)
+            out[
+                top - first_row : bottom - first_row,
+                left - first_column : right - first_column,
+            ] = chunk[
+                top - chunk_y * size : bottom - chunk_y * size,
+                left - chunk_x * size : right - chunk_x * size,
+            ]
+
+        if not isinstance(row, slice):
+            return out[0]
+        if not isinstance(column, slice):
+            return out[:, 0]
+        return out
+
+    def __setitem__(
+        self, key: Tuple[Union[int, slice], Union[int, slice]], value
+    ) -> None:
+        row, column = key
+        rows, columns = self.shape
+        size = self.chunk_size
+        first_row, last_row = self._get_range(row, rows)
+        first_column, last_column = self._get_range(column, columns)
+        value = np.broadcast_to(
+            np.asarray(value, dtype=np.int32),
+            (last_row - first_row, last_column - first_column),
+        )
+        for chunk_x, chunk_y, top, bottom, left, right in self._get_blocks(
+            first_row, last_row, first_column, last_column
+        ):
+            chunk = self.get_chunk(chunk_x, chunk_y)
+            chunk[
+                top - chunk_y * size : bottom - chunk_y * size,
+                left - chunk_x * size : right - chunk_x * size,
+            ] = value[
+                top - first_row : bottom - first_row,
+                left - first_column : right - first_column,
+            ]
 
 
 class TileMap:
-    def __init__(self, columns: int, rows: int, tile_set: TileSet) -> None:
+    EMPTY_TILE = -1
+
+    def __init__(
+        self,
+        columns: int,
+        rows: int,
+        tile_set: TileSet,
+        chunk_size: int = 16,
+        max_chunks: int = 256,
+        fill: int = 0,
+        layers: int = 1,
+    ) -> None:
+        """A grid of tiles with any amount of layers.
+
+        Every layer is a NumPy array with the shape (rows, columns)
+        of indices into TileSet.tiles. Tiles below 0, such as
+        TileMap.EMPTY_TILE, are not drawn.
+
+        The map is drawn in chunks of chunk_size by chunk_size tiles,
+        which are rendered once and reused until one of their tiles
+        changes. Tiles must be changed with set_tile() or set_tiles(),
+        or invalidate() must be called after editing a layer directly
+        or changing TileMap.tile_set.
+
+        Chunks store premultiplied alpha so that translucent tiles on
+        different layers blend as if they were drawn one by one.
+
+        Layers may also be ChunkedLayers, which only store the chunks
+        that were read or changed. Maps opened from a TileMapFile use
+        them to read their tiles from the file as they are needed.
+
+        Parameters:
+            columns: The amount of tiles per row.
+            rows: The amount of tiles per column.
+            tile_set: The tiles drawn.
+            chunk_size: The width and height of a chunk in tiles.
+            max_chunks: The maximum amount of rendered chunks kept.
+            fill: The tile that the first layer is filled with.
+            layers: The amount of layers created. Every layer after the
+                first is empty.
+
+        """
         self.columns = columns
         self.rows = rows
-        self.map_layers = []
+        self.map_layers = []  # List[np.ndarray]
         self.tile_set = tile_set
-        self._surface = pygame.Surface(  # lgtm [py/call/wrong-arguments]
-            columns * tile_set.px_width, rows * tile_set.px_height
+        self.chunk_size = chunk_size
+        self.max_chunks = max_chunks
+        self._chunks = OrderedDict()  # OrderedDict[Tuple[int, int], pygame.Surface]
+        self._tiles = None  # List[pygame.Surface]
+        self.collisions = []  # List[TileCollisions]
+        for i in range(layers):
+            self.add_layer(fill=fill if i == 0 else None)
+
+    @property
+    def tile_size(self) -> Tuple[int, int]:
+        return self.tile_set.px_width, self.tile_set.px_height
+
+    @property
+    def chunk_pixel_size(self) -> Tuple[int, int]:
+        return (
+            self.chunk_size * self.tile_set.px_width,
+            self.chunk_size * self.tile_set.px_height,
         )
-        self.add_layer()
-
-    def add_layer(self) -> None:
-        layer = []
-        for r in range(self.rows):
-            layer.append([])
-            for c in range(self.columns):
-                layer[r][c] = 0
+
+    def add_layer(
+        self,
+        tiles: Union[np.ndarray, ChunkedLayer, List[List[int]]] = None,
+        fill: int = None,
+    ) -> int:
+        """Adds a layer drawn above every other layer.
+
+        Parameters:
+            tiles: The layer's tiles with the shape (rows, columns).
+                ChunkedLayers are used as they are.
+            fill: The tile that the layer is filled with if tiles is
+                None. Defaults to TileMap.EMPTY_TILE.
+
+        Returns:
+            The layer's index.
+
+        """
+        if tiles is None:
+            if fill is None:
+                fill = self.EMPTY_TILE
+            layer = np.full((self.rows, self.columns), fill, dtype=np.int32)
+        else:
+            if isinstance(tiles, ChunkedLayer):
+                layer = tiles
+            else:
+                layer = np.array(tiles, dtype=np.int32)
+            if layer.shape != (self.rows, self.columns):
+                raise ValueError(
+                    f"Layer shape {layer.shape} does not match the map's shape {(self.rows, self.columns)}."
+                )
+
         self.map_layers.append(layer)
+        self.invalidate()
+        return len(self.map_layers) - 1
 
     def get_tile(self, layer: int, pos: pygame.Vector2) -> int:
-        return self.map_layers[layer][pos.y][pos.x]
+        column, row = int(pos[0]), int(pos[1])
+        return int(self.map_layers[layer][row, column])
+
+    def set_tile(self, layer: int, pos: pygame.Vector2, tile: int) -> None:
+        """Sets a tile and rerenders its chunk when it's drawn next.
+
+        Parameters:
+            layer: The layer's index.
+            pos: The tile's column and row.
+            tile: The tile's index in TileSet.tiles.
+
+        """
+        rect = pygame.Rect(int(pos[0]), int(pos[1]), 1, 1)
+        self.map_layers[layer][rect.y, rect.x] = tile
+        self.invalidate(rect)
+
+    def set_tiles(
+        self,
+        layer: int,
+        pos: pygame.Vector2,
+        tiles: Union[np.ndarray, List[List[int]]],
+    ) -> None:
+        """Sets a block of tiles.
+
+        Parameters:
+            layer: The layer's index.
+            pos: The column and row of the block's top-left tile.
+            tiles: The tiles with the shape (rows, columns).
+
+        """
+        tiles = np.asarray(tiles, dtype=np.int32)
+        column, row = int(pos[0]), int(pos[1])
+        rows, columns = tiles.shape
+        rect = pygame.Rect(column, row, columns, rows)
+        self.map_layers[layer][row : row + rows, column : column + columns] = tiles
+        self.invalidate(rect)
+
+    def invalidate(self, rect: pygame.Rect = None) -> None:
+        """Rerenders the chunks overlapping an area when they're drawn next,
+        and rebuilds the TileMap.collisions overlapping it.
+
+        Parameters:
+            rect: The area in tiles. If None, every chunk is rerendered.
+
+        """
+        for collisions in self.collisions:
+            collisions.invalidate(rect)
+
+        if rect is None:
+            self._chunks.clear()
+            self._tiles = None
+            return None
+
+        size = self.chunk_size
+        for chunk_y in range(rect.top // size, (rect.bottom - 1) // size + 1):
+            for chunk_x in range(rect.left // size, (rect.right - 1) // size + 1):
+                self._chunks.pop((chunk_x, chunk_y), None)
+
+    def _render_chunk(self, chunk_x: int, chunk_y: int) -> pygame.Surface:
+        if self._tiles is None:
+            self._tiles = [premultiply_alpha(t) for t in self.tile_set.tiles]
+        tiles = self._tiles
+        blend = pygame.BLEND_PREMULTIPLIED
+        tile_width, tile_height = self.tile_size
+        size = self.chunk_size
+        column = chunk_x * size
+        row = chunk_y * size
+
+        chunk = pygame.Surface(self.chunk_pixel_size, pygame.SRCALPHA)
+        for layer in self.map_layers:
+            block = layer[row : row + size, column : column + size]
+            rows, columns = np.nonzero(block >= 0)
+            chunk.blits(
+                [
+                    (tiles[tile], (c * tile_width, r * tile_height), None, blend)
+                    for tile, r, c in zip(
+                        block[rows, columns].tolist(), rows.tolist(), columns.tolist()
+                    )
+                ],
+                doreturn=False,
+            )
+
+        if pygame.display.get_surface() is not None:
+            chunk = chunk.convert_alpha()
+        return chunk
+
+    def get_chunk(self, chunk_x: int, chunk_y: int) -> pygame.Surface:
+        """Returns a chunk's rendered surface.
+
+        Parameters:
+            chunk_x: The chunk's column.
+            chunk_y: The chunk's row.
+
+        """
+        key = (chunk_x, chunk_y)
+        chunk = self._chunks.get(key)
+        if chunk is not None:
+            self._chunks.move_to_end(key)
+            return chunk
+
+        chunk = self._render_chunk(chunk_x, chunk_y)
+        self._chunks[key] = chunk
+        if len(self._chunks) > self.max_chunks:
+            self._chunks.popitem(last=False)
+        return chunk
+
+    def draw(
+        self, surface: pygame.Surface, offset: pygame.Vector2 = pygame.Vector2(0, 0)
+    ) -> None:
+        """Draws the chunks that are visible on a surface.
+
+        Parameters:
+            surface: Surface to draw on.
+            offset: Position of the map's top-left corner on the surface,
+                such as Camera.position.
+
+        """
+        chunk_width, chunk_height = self.chunk_pixel_size
+        offset_x = int(offset[0])
+        offset_y = int(offset[1])
+        clip = surface.get_clip()
+        columns = math.ceil(self.columns / self.chunk_size)
+        rows = math.ceil(self.rows / self.chunk_size)
+
+        first_x = max((clip.left - offset_x) // chunk_width, 0)
+        first_y = max((clip.top - offset_y) // chunk_height, 0)
+        last_x = min((clip.right - 1 - offset_x) // chunk_width, columns - 1)
+        last_y = min((clip.bottom - 1 - offset_y) // chunk_height, rows - 1)
+
+        surface.blits(
+            [
+                (
+                    self.get_chunk(x, y),
+                    (x * chunk_width + offset_x, y * chunk_height + offset_y),
+                    None,
+                    pygame.BLEND_PREMULTIPLIED,
+                )
+                for y in range(first_y, last_y + 1)
+                for x in range(first_x, last_x + 1)
+            ],
+            doreturn=False,
+        )
+
+
+def merge_tiles(solid: np.ndarray) -> List[Tuple[int, int, int, int]]:
+    """Greedily merges solid tiles into rectangles.
+
+    Each row's runs of solid tiles are extended downwards for as long
+    as the rows below are solid along the whole run.
+
+    Parameters:
+        solid: A boolean array with the shape (rows, columns).
+
+    Returns:
+        The column, row, width and height of every rectangle in tiles.
+
+    """
+    solid = np.array(solid, dtype=np.bool_)
+    rows, columns = solid.shape
+    rects = []
+    for r in range(rows):
+        if not solid[r].any():
+            continue
+
+        edges = np.flatnonzero(np.diff(solid[r].astype(np.int8), prepend=0, append=0))
+        for start, end in zip(edges[::2].tolist(), edges[1::2].tolist()):
+            height = 1
+            while r + height < rows and solid[r + height, start:end].all():
+                height += 1
+            solid[r : r + height, start:end] = False
+            rects.append((start, r, end - start, height))
+
+    return rects
+
+
+class TileCollisions:
+    def __init__(
+        self,
+        tile_map: TileMap,
+        layer: int = 0,
+        solid_tiles: Iterable[int] = None,
+        region_size: int = 32,
+    ) -> None:
+        """Collision rects of a TileMap layer's solid tiles.
+
+        Solid tiles are merged into as few rects as possible within
+        regions of region_size by region_size tiles. Regions are built
+        when they are first queried and rebuilt after their tiles
+        change through TileMap.invalidate().
+
+        Can be used as Scene.collision_rects, in which case
+        Entity.move() only tests the rects near the entity.
+
+        Parameters:
+            tile_map: The tile map. The collisions are added to
+                TileMap.collisions.
+            layer: The layer's index.
+            solid_tiles: The solid tiles' indices. If None, every tile
+                that is not empty is solid.
+            region_size: The width and height of a region in tiles.
+
+        """
+        self.tile_map = tile_map
+        self.layer = layer
+        self.solid_tiles = None
+        if solid_tiles is not None:
+            self.solid_tiles = np.array(sorted(set(solid_tiles)), dtype=np.int32)
+        self.region_size = region_size
+
+        self._rects = {}  # Dict[int, pygame.Rect]
+        self._region_rects = {}  # Dict[Tuple[int, int], List[int]]
+        self._rect_ids = np.full((tile_map.rows, tile_map.columns), -1, np.int32)
+        self._next_id = 0
+        tile_map.collisions.append(self)
+
+    @property
+    def rects(self) -> List[pygame.Rect]:
+        """Every merged rect in the map."""
+        size = self.region_size
+        for region_y in range(math.ceil(self.tile_map.rows / size)):
+            for region_x in range(math.ceil(self.tile_map.columns / size)):
+                if (region_x, region_y) not in self._region_rects:
+                    self._build_region(region_x, region_y)
+        return list(self._rects.values())
+
+    def invalidate(self, rect: pygame.Rect = None) -> None:
+        """Rebuilds the regions overlapping an area when they're queried next.
+
+        Parameters:
+            rect: The area in tiles. If None, every region is rebuilt.
+
+        """
+        if rect is None:
+            regions = list(self._region_rects.keys())
+        else:
+            size = self.region_size
+            regions = [
+                (x, y)
+                for y in range(rect.top // size, (rect.bottom - 1) // size + 1)
+                for x in range(rect.left // size, (rect.right - 1) // size + 1)
+            ]
+
+        for region in regions:
+            for i in self._region_rects.pop(region, []):
+                del self._rects[i]
+
+    def _build_region(self, region_x: int, region_y: int) -> None:
+        tile_width, tile_height = self.tile_map.tile_size
+        size = self.region_size
+        column = region_x * size
+        row = region_y * size
+
+        block = self.tile_map.map_layers[self.layer][
+            row : row + size, column : column + size
+        ]
+        if self.solid_tiles is None:
+            solid = block >= 0
+        else:
+            solid = np.isin(block, self.solid_tiles)
+
+        rect_ids = self._rect_ids[row : row + size, column : column + size]
+        rect_ids[...] = -1
+        region_rects = []
+        for c, r, width, height in merge_tiles(solid):
+            i = self._next_id
+            self._next_id += 1
+            self._rects[i] = pygame.Rect(
+                (column + c) * tile_width,
+                (row + r) * tile_height,
+                width * tile_width,
+                height * tile_height,
+            )
+            rect_ids[r : r + height, c : c + width] = i
+            region_rects.append(i)
+
+        self._region_rects[(region_x, region_y)] = region_rects
+
+    def query_rect(self, rect: pygame.Rect) -> List[pygame.Rect]:
+        """Returns the merged rects of the solid tiles overlapping a rect.
+
+        Parameters:
+            rect: The area in pixels.
+
+        """
+        tile_width, tile_height = self.tile_map.tile_size
+        first_column = max(rect.left // tile_width, 0)
+        first_row = max(rect.top // tile_height, 0)
+        last_column = min((rect.right - 1) // tile_width, self.tile_map.columns - 1)
+        last_row = min((rect.bottom - 1) // tile_height, self.tile_map.rows - 1)
+        if first_column > last_column or first_row > last_row:
+            return []
+
+        size = self.region_size
+        for region_y in range(first_row // size, last_row // size + 1):
+            for region_x in range(first_column // size, last_column // size + 1):
+                if (region_x, region_y) not in self._region_rects:
+                    self._build_region(region_x, region_y)
+
+        ids = set(
+            self._rect_ids[first_row : last_row + 1, first_column : last_column + 1]
+            .ravel()
+            .tolist()
+        )
+        ids.discard(-1)
+        return [self._rects[i] for i in sorted(ids)]
@@ -0,0 +1,274 @@
+"""
+SakuyaEngine (c) 2020-2021 Andrew Hong
+This code is licensed under GNU LESSER GENERAL PUBLIC LICENSE (see LICENSE for details)
+"""
+from functools import partial
+from typing import List, Tuple
+
+import base64
+import gzip
+import json
+import struct
+import zlib
+import pygame
+import numpy as np
+
+from .errors import TileMapFormatError
+from .tile import ChunkedLayer, TileSet, TileMap
+
+__all__ = [
+    "TileMapFile",
+    "save_tilemap",
+    "load_tilemap",
+    "read_tiled_json",
+    "convert_tiled_json",
+]
+
+TILEMAP_MAGIC = b"SKTM"
+TILEMAP_VERSION = 1
+
+# magic, version, chunk size, columns, rows, layers, tile width, tile height
+_HEADER = struct.Struct("<4sHHIIHHH2x")
+
+# Flip and rotation flags stored in the upper bits of Tiled's tile ids
+_TILED_FLAGS = 0xF0000000
+
+
+def _get_chunk_counts(columns: int, rows: int, chunk_size: int) -> Tuple[int, int]:
+    return -(-columns // chunk_size), -(-rows // chunk_size)
+
+
+def _write_tilemap(
+    path: str,
+    layers: List[np.ndarray],
+    tile_size: Tuple[int, int],
+    chunk_size: int,
+) -> None:
+    rows, columns = layers[0].shape
+    chunk_columns, chunk_rows = _get_chunk_counts(columns, rows, chunk_size)
+
+    index = np.zeros((len(layers), chunk_rows, chunk_columns), dtype="<u4")
+    chunks = []
+    count = 0
+    for i, layer in enumerate(layers):
+        if layer.max(initial=-1) > 0xFFFE:
+            raise TileMapFormatError("Tile indices must be below 65535.")
+
+        # Tiles are stored as index + 1 so that 0 is an empty tile
+        padded = np.zeros((chunk_rows * chunk_size, chunk_columns * chunk_size), "<u2")
+        padded[:rows, :columns] = np.maximum(layer, -1) + 1
+        blocks = padded.reshape(chunk_rows, chunk_size, chunk_columns, chunk_size)
+        blocks = blocks.transpose(0, 2, 1, 3)
+
+        stored = blocks.any(axis=(2, 3))
+        amount = int(np.count_nonzero(stored))
+        index[i][stored] = np.arange(count + 1, count + amount + 1)
+        chunks.append(blocks[stored])
+        count += amount
+
+    with open(path, "wb") as f:
+        f.write(
+            _HEADER.pack(
+                TILEMAP_MAGIC,
+                TILEMAP_VERSION,
+                chunk_size,
+                columns,
+                rows,
+                len(layers),
+                tile_size[0],
+                tile_size[1],
+            )
+        )
+        f.write(index.tobytes())
+        for c in chunks:
+            f.write(np.ascontiguousarray(c).tobytes())
+
+
+class TileMapFile:
+    def __init__(self, path: str) -> None:
+        """A binary tile map opened with numpy.memmap.
+
+        The file starts with a header, followed by an index of every
+        layer's chunks and the tiles of every chunk that isn't empty as
+        uint16 values, where 0 is an empty tile. Chunks are only read
+        from the file once a TileMap created by create_tilemap() needs
+        them. Any amount of TileMaps can be created from one file.
+
+        Parameters:
+            path: Path to the file.
+
+        """
+        self.path = path
+        try:
+            header = np.fromfile(path, dtype=np.uint8, count=_HEADER.size).tobytes()
+            (
+                magic,
+                version,
+                self.chunk_size,
+                self.columns,
+                self.rows,
+                self.layers,
+                tile_width,
+                tile_height,
+            ) = _HEADER.unpack(header)
+        except struct.error:
+            raise TileMapFormatError(f"{path} is not a tile map file.")
+        if magic != TILEMAP_MAGIC:
+            raise TileMapFormatError(f"{path} is not a tile map file.")
+        if version != TILEMAP_VERSION:
+            raise TileMapFormatError(
+                f"{path} has version {version}, expected {TILEMAP_VERSION}."
+            )
+        self.tile_size = (tile_width, tile_height)
+
+        chunk_columns, chunk_rows = _get_chunk_counts(
+            self.columns, self.rows, self.chunk_size
+        )
+        index_shape = (self.layers, chunk_rows, chunk_columns)
+        self.index = np.memmap(
+            path, dtype="<u4", mode="r", offset=_HEADER.size, shape=index_shape
+        )
+
+        count = int(self.index.max(initial=0))
+        self.chunks = np.zeros((0, self.chunk_size, self.chunk_size), "<u2")
+        if count:
+            self.chunks = np.memmap(
+                path,
+                dtype="<u2",
+                mode="r",
+                offset=_HEADER.size + self.index.nbytes,
+                shape=(count, self.chunk_size, self.chunk_size),
+            )
+
+    def read_chunk(self, layer: int, chunk_x: int, chunk_y: int) -> np.ndarray:
+        """Returns a new array of a chunk's tiles in the format of
+        TileMap.map_layers.
+
+        Parameters:
+            layer: The layer's index.
+            chunk_x: The chunk's column.
+            chunk_y: The chunk's row.
+
+        """
+        i = int(self.index[layer, chunk_y, chunk_x])
+        if i == 0:
+            return np.full((self.chunk_size, self.chunk_size), -1, dtype=np.int32)
+        return self.chunks[i - 1].astype(np.int32) - 1
+
+    def create_tilemap(self, tile_set: TileSet, **kwargs) -> TileMap:
+        """Creates a TileMap whose layers are ChunkedLayers that read
+        their chunks from the file as they are drawn, queried or
+        changed. Only the chunks read are kept in memory.
+
+        Parameters:
+            tile_set: The tiles drawn.
+            kwargs: TileMap's keyword arguments.
+
+        """
+        tile_map = TileMap(self.columns, self.rows, tile_set, layers=0, **kwargs)
+        for i in range(self.layers):
+            tile_map.add_layer(
+                ChunkedLayer(
+                    self.rows,
+                    self.columns,
+                    self.chunk_size,
+                    fill=TileMap.EMPTY_TILE,
+                    read_chunk=partial(self.read_chunk, i),
+                )
+            )
+        return tile_map
+
+
+def save_tilemap(tile_map: TileMap, path: str, chunk_size: int = 16) -> None:
+    """Saves a tile map in the format read by TileMapFile.
+
+    Parameters:
+        tile_map: The tile map to save.
+        path: Path to the file.
+        chunk_size: The width and height of a chunk in tiles.
+
+    """
+    layers = [np.asarray(layer) for layer in tile_map.map_layers]
+    _write_tilemap(path, layers, tile_map.tile_size, chunk_size)
+
+
+def load_tilemap(path: str, tile_set: TileSet, **kwargs) -> TileMap:
+    """Opens a tile map file and creates a TileMap that reads its
+    tiles from the file as they are needed.
+
+    Parameters:
+        path: Path to the file.
+        tile_set: The tiles drawn.
+        kwargs: TileMap's keyword arguments.
+
+    """
+    return TileMapFile(path).create_tilemap(tile_set, **kwargs)
+
+
+def _read_tiled_layer(layer: dict, columns: int, rows: int) -> np.ndarray:
+    data = layer["data"]
+    if layer.get("encoding") == "base64":
+        data = base64.b64decode(data)
+        compression = layer.get("compression", "")
+        if compression == "zlib":
+            data = zlib.decompress(data)
+        elif compression == "gzip":
+            data = gzip.decompress(data)
+        elif compression:
+            raise TileMapFormatError(f'Unsupported compression "{compression}".')
+        tiles = np.frombuffer(data, dtype="<u4")
+    else:
+        tiles = np.array(data, dtype=np.uint32)
+
+    if tiles.size != columns * rows:
+        raise TileMapFormatError(f'Layer "{layer.get("name")}" has the wrong size.')
+    return tiles.reshape(rows, columns)
+
+
+def read_tiled_json(path: str) -> Tuple[List[np.ndarray], Tuple[int, int]]:
+    """Reads the tile layers of a Tiled map saved as JSON.
+
+    Tile ids are converted to indices into a TileSet made from the
+    map's tilesets in order. Flipped tiles are not supported and are
+    read as unflipped.
+
+    Parameters:
+        path: Path to the JSON file.
+
+    Returns:
+        The layers in the format of TileMap.map_layers and the tile size.
+
+    """
+    with open(path, "r") as f:
+        data = json.load(f)
+
+    if data.get("infinite", False):
+        raise TileMapFormatError("Infinite Tiled maps are not supported.")
+
+    columns = data["width"]
+    rows = data["height"]
+    first_id = min((t["firstgid"] for t in data.get("tilesets", [])), default=1)
+
+    layers = []
+    for layer in data["layers"]:
+        if layer.get("type", "tilelayer") != "tilelayer":
+            continue
+        tiles = _read_tiled_layer(layer, columns, rows) & ~np.uint32(_TILED_FLAGS)
+        layers.append(np.where(tiles == 0, -1, tiles.astype(np.int64) - first_id))
+
+    if not layers:
+        raise TileMapFormatError(f"{path} has no tile layers.")
+    return [l.astype(np.int32) for l in layers], (data["tilewidth"], data["tileheight"])
+
+
+def convert_tiled_json(json_path: str, path: str, chunk_size: int = 16) -> None:
+    """Converts a Tiled map saved as JSON into a tile map file.
+
+    Parameters:
+        json_path: Path to the Tiled JSON file.
+        path: Path to the tile map file.
+        chunk_size: The width and height of a chunk in tiles.
+
+    """
+    layers, tile_size = read_tiled_json(json_path)
+    _write_tilemap(path, layers, tile_size, chunk_size)
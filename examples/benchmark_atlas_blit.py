@@ -0,0 +1,71 @@
+import os
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import io
+import random
+import timeit
+import pygame
+import SakuyaEngine as engine
+
+SPRITES = 256
+BLITS = 5000
+
+screen = pygame.display.set_mode((256, 224))
+rng = random.Random(0)
+
+
+def create_sheet() -> pygame.Surface:
+    """Returns a sprite sheet loaded from a PNG the way games load it."""
+    sheet = pygame.Surface((16 * 16, 16 * (SPRITES // 16)), pygame.SRCALPHA)
+    for i in range(SPRITES):
+        color = (rng.randrange(256), rng.randrange(256), rng.randrange(256))
+        center = ((i % 16) * 16 + 8, (i // 16) * 16 + 8)
+        pygame.draw.circle(sheet, color, center, rng.randint(4, 8))
+
+    file = io.BytesIO()
+    pygame.image.save(sheet, file, "sheet.png")
+    file.seek(0)
+    return pygame.image.load(file, "sheet.png")
+
+
+sheet = create_sheet()
+split_sprites = engine.split_image(sheet, 16, 16)
+converted_sprites = [s.convert_alpha() for s in split_sprites]
+atlas = engine.TextureAtlas()
+atlas_sprites = atlas.add_many(split_sprites, keys=list(range(SPRITES)))
+regions = [atlas.get_region(i) for i in range(SPRITES)]
+
+positions = [(rng.randrange(-8, 248), rng.randrange(-8, 216)) for i in range(BLITS)]
+indices = [rng.randrange(SPRITES) for i in range(BLITS)]
+
+
+def measure(blits: list, number: int = 20) -> float:
+    """Returns the amount of milliseconds per frame."""
+    seconds = min(
+        timeit.repeat(lambda: screen.blits(blits, False), number=number, repeat=5)
+    )
+    return seconds / number * 1000
+
+
+if __name__ == "__main__":
+    print(f"{SPRITES} sprites in {len(atlas.pages)} atlas page(s), {BLITS} blits")
+    times = {}
+    for name, sprites in (
+        ("split_image()", split_sprites),
+        ("Converted surfaces", converted_sprites),
+        ("Atlas subsurfaces", atlas_sprites),
+    ):
+        blits = [(sprites[i], p) for i, p in zip(indices, positions)]
+        times[name] = measure(blits)
+
+    blits = [(regions[i][0], p, regions[i][1]) for i, p in zip(indices, positions)]
+    times["Atlas page regions"] = measure(blits)
+
+    # Separately converted surfaces are the baseline the atlas must match
+    baseline = times["Converted surfaces"]
+    for name, duration in times.items():
+        print(
+            f"{name + ':':20}{duration:6.2f} ms per frame, "
+            f"{duration / baseline:4.2f}x converted surfaces"
+        )
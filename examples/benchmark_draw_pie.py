@@ -0,0 +1,43 @@
+import os
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import math
+import timeit
+import pygame
+import SakuyaEngine as engine
+
+surface = pygame.Surface((256, 224))
+position = pygame.Vector2(128, 112)
+
+
+def draw_pie_per_degree(surface, color, position, radius, start_angle, end_angle):
+    """draw_pie() before the unit arc cache."""
+    points = [position]
+    for angle in range(start_angle, end_angle):
+        angle = math.radians(angle)
+        point = pygame.Vector2(math.cos(angle), math.sin(angle)) * radius
+        points.append(point + position)
+
+    pygame.draw.polygon(surface, (255, 255, 255), points)
+
+
+def measure(draw, radius: int, spread: int, number: int = 2000) -> float:
+    """Returns the amount of microseconds per pie."""
+    start_angle = 90 - spread // 2
+    end_angle = 90 + spread // 2
+    seconds = timeit.timeit(
+        lambda: draw(
+            surface, (255, 255, 255), position, radius, start_angle, end_angle
+        ),
+        number=number,
+    )
+    return seconds / number * 1000000
+
+
+if __name__ == "__main__":
+    print("radius spread  per degree (us)  draw_pie (us)")
+    for radius, spread in [(8, 90), (16, 270), (48, 65), (150, 65), (150, 300)]:
+        before = measure(draw_pie_per_degree, radius, spread)
+        after = measure(engine.draw_pie, radius, spread)
+        print(f"{radius:6} {spread:6} {before:16.1f} {after:14.1f}")
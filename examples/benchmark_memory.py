@@ -0,0 +1,68 @@
+import os
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+from copy import copy
+
+import gc
+import tracemalloc
+import pygame
+import SakuyaEngine as engine
+
+BULLETS = 5000
+
+sprite = pygame.Surface((8, 8))
+hitbox_size = pygame.Vector2(2, 2)
+
+
+def measure(create) -> float:
+    """Returns the amount of bytes allocated per object."""
+    gc.collect()
+    tracemalloc.start()
+    objects = create()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del objects
+    return size / BULLETS
+
+
+def create_bullets() -> list:
+    bullet = engine.Bullet(static_sprite=sprite, custom_hitbox_size=hitbox_size)
+    bullets = []
+    for i in range(BULLETS):
+        b = copy(bullet)
+        b.position = pygame.Vector2(i, i)
+        bullets.append(b)
+    return bullets
+
+
+def create_light_bullets() -> list:
+    bullet = engine.LightBullet(static_sprite=sprite, custom_hitbox_size=hitbox_size)
+    bullets = []
+    for i in range(BULLETS):
+        b = copy(bullet)
+        b.position = pygame.Vector2(i, i)
+        bullets.append(b)
+    return bullets
+
+
+def create_bullet_pool() -> engine.BulletPool:
+    bullet = engine.Bullet(static_sprite=sprite, custom_hitbox_size=hitbox_size)
+    pool = engine.BulletPool(capacity=BULLETS)
+    pool.spawn(bullet, (0, 0), [0] * BULLETS)
+    return pool
+
+
+def create_particles() -> list:
+    return [
+        engine.Particle(pygame.Vector2(i, i), (255, 255, 255), pygame.Vector2(1, 1), 0)
+        for i in range(BULLETS)
+    ]
+
+
+if __name__ == "__main__":
+    print(f"Bullet:      {measure(create_bullets):8.1f} bytes per bullet")
+    print(f"LightBullet: {measure(create_light_bullets):8.1f} bytes per bullet")
+    print(f"BulletPool:  {measure(create_bullet_pool):8.1f} bytes per bullet")
+    print(f"Particle:    {measure(create_particles):8.1f} bytes per particle")